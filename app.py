@@ -1,238 +1,174 @@
-from flask import Flask, request, jsonify, session, send_file, render_template
+from flask import Flask, Response, request, jsonify, session, render_template, make_response, g
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
-import openpyxl
-from openpyxl import Workbook
 import os
 import json
+import atexit
+import base64
+import hashlib
+import hmac
+import time
+import queue
 from datetime import datetime, timedelta
-import io
+from functools import wraps
+from itertools import islice
+from storage import create_repository, empty_data
+from events import EventBroker, format_event
+from exports import FORMATS, chunked, encode, xlsx_chunks
+from metrics import REGISTRY, REQUEST_SECONDS, REQUESTS, REQUESTS_IN_FLIGHT, Gauge
+from roster import read_roster, plan_import
+from schedules import DEFAULT_SCHEDULES, ScheduleRegistry, describe_rule, validate_definition
+from ledger import (COUNTERS, TASK_FIELDS, apply_entry, attendance_entry, new_leaderboard_entry,
+                    opening_entry, rebuild_leaderboard, task_entry, verify_leaderboard)
+import timestamps
+
+class JSONProvider(DefaultJSONProvider):
+    """Clock and break times are datetimes until they leave as ISO strings here"""
+    
+    @staticmethod
+    def default(value):
+        if isinstance(value, datetime):
+            return timestamps.format_timestamp(value)
+        return DefaultJSONProvider.default(value)
 
 app = Flask(__name__)
+app.json = JSONProvider(app)
 app.secret_key = 'workholic-secret-key'  # Change this in production
 CORS(app)
 
-# Excel file path
+# Storage configuration. The workbook stays the live store unless
+# WORKHOLIC_STORAGE=sqlite is set; a new database is seeded from it.
+STORAGE_BACKEND = os.environ.get('WORKHOLIC_STORAGE', 'excel')
 EXCEL_FILE = './data/workholic-data.xlsx'
+SQLITE_FILE = './data/workholic.db'
+
+# Append-only journal used by the Excel backend for single-record changes
+JOURNAL_FILE = './data/workholic-journal.jsonl'
+
+# When a write may return: 'log' once it is committed to the journal (Excel)
+# or the WAL (SQLite), the workbook being saved in the background; 'full'
+# once it is in the saved workbook / fsync'd database.
+DURABILITY = os.environ.get('WORKHOLIC_DURABILITY', 'log')
+
+# Page sizes for /api/admin/attendance
+ATTENDANCE_PAGE_SIZE = 100
+ATTENDANCE_MAX_PAGE_SIZE = 500
+
+# Seconds between keepalive comments on /api/events. Each keepalive also
+# checks the data version so changes made by other processes trigger a sync.
+EVENT_KEEPALIVE = 15
+
+# Seconds before the server ends an /api/events stream; the browser then
+# reconnects, so a stream never holds a worker indefinitely.
+EVENT_STREAM_SECONDS = 300
+
+# Each open stream occupies a worker thread. Set WORKHOLIC_EVENT_STREAMS=0
+# on servers with a few sync workers (wsgi.py does for PythonAnywhere):
+# /api/events then answers 204 and the dashboards poll instead.
+EVENT_STREAMS = os.environ.get('WORKHOLIC_EVENT_STREAMS', '1') != '0'
+
+# Bearer token a Prometheus scraper can send to /api/admin/metrics instead of
+# an admin session; the endpoint is session-only when it is unset.
+METRICS_TOKEN = os.environ.get('WORKHOLIC_METRICS_TOKEN')
+
+repository = create_repository(STORAGE_BACKEND, EXCEL_FILE, JOURNAL_FILE, SQLITE_FILE, DURABILITY)
+atexit.register(repository.flush)
+events = EventBroker()
+REGISTRY.register(Gauge('workholic_event_subscribers', 'Open /api/events streams in this process',
+                        function=events.subscriber_count))
+schedule_registry = ScheduleRegistry(repository)
 
 def read_excel_data():
-    """Read data from Excel file"""
+    """Read all data from the active storage backend"""
     try:
-        if not os.path.exists(EXCEL_FILE):
-            return {'employees': [], 'attendance': [], 'leaderboard': []}
-        
-        workbook = openpyxl.load_workbook(EXCEL_FILE)
-        
-        # Read employees sheet
-        employees = []
-        if 'Employees' in workbook.sheetnames:
-            employees_sheet = workbook['Employees']
-            for row in employees_sheet.iter_rows(min_row=2, values_only=True):
-                if row[0]:  # If email exists
-                    employees.append({
-                        'email': row[0],
-                        'name': row[1] or '',
-                        'role': row[2],
-                        'schedule': row[3],
-                        'password': row[4] or None
-                    })
-        
-        # Read attendance sheet
-        attendance = []
-        if 'Attendance' in workbook.sheetnames:
-            attendance_sheet = workbook['Attendance']
-            for row in attendance_sheet.iter_rows(min_row=2, values_only=True):
-                if row[0]:  # If email exists
-                    breaks_data = row[4] if row[4] else '[]'
-                    try:
-                        breaks = json.loads(breaks_data) if breaks_data else []
-                    except:
-                        breaks = []
-                    
-                    attendance.append({
-                        'email': row[0],
-                        'date': row[1],
-                        'clockIn': row[2],
-                        'clockOut': row[3],
-                        'breaks': breaks,
-                        'status': row[5] or 'A'
-                    })
-        
-        # Read leaderboard sheet
-        leaderboard = []
-        if 'Leaderboard' in workbook.sheetnames:
-            leaderboard_sheet = workbook['Leaderboard']
-            for row in leaderboard_sheet.iter_rows(min_row=2, values_only=True):
-                if row[0]:  # If email exists
-                    leaderboard.append({
-                        'email': row[0],
-                        'name': row[1] or '',
-                        'totalPoints': row[2] or 0,
-                        'attendancePoints': row[3] or 0,
-                        'smallTasks': row[4] or 0,
-                        'regularTasks': row[5] or 0,
-                        'bigTasks': row[6] or 0
-                    })
-        
-        return {'employees': employees, 'attendance': attendance, 'leaderboard': leaderboard}
-    
+        return repository.load()
     except Exception as e:
-        print(f'Error reading Excel file: {e}')
-        return {'employees': [], 'attendance': [], 'leaderboard': []}
+        print(f'Error reading data: {e}')
+        return empty_data()
 
 def write_excel_data(data):
-    """Write data to Excel file"""
-    try:
-        # Create workbook
-        workbook = Workbook()
-        
-        # Remove default sheet
-        workbook.remove(workbook.active)
-        
-        # Create Employees sheet
-        employees_sheet = workbook.create_sheet('Employees')
-        employees_sheet.append(['Email', 'Name', 'Role', 'Schedule', 'Password'])
-        for employee in data['employees']:
-            employees_sheet.append([
-                employee['email'],
-                employee['name'],
-                employee['role'],
-                employee['schedule'],
-                employee['password'] or ''
-            ])
-        
-        # Create Attendance sheet
-        attendance_sheet = workbook.create_sheet('Attendance')
-        attendance_sheet.append(['Email', 'Date', 'Clock In', 'Clock Out', 'Breaks', 'Status'])
-        for record in data['attendance']:
-            attendance_sheet.append([
-                record['email'],
-                record['date'],
-                record['clockIn'] or '',
-                record['clockOut'] or '',
-                json.dumps(record['breaks']),
-                record['status']
-            ])
-        
-        # Create Leaderboard sheet
-        leaderboard_sheet = workbook.create_sheet('Leaderboard')
-        leaderboard_sheet.append(['Email', 'Name', 'Total Points', 'Attendance Points', 'Small Tasks', 'Regular Tasks', 'Big Tasks'])
-        for entry in data['leaderboard']:
-            leaderboard_sheet.append([
-                entry['email'],
-                entry['name'],
-                entry['totalPoints'],
-                entry['attendancePoints'],
-                entry['smallTasks'],
-                entry['regularTasks'],
-                entry['bigTasks']
-            ])
-        
-        # Style headers
-        for sheet in [employees_sheet, attendance_sheet, leaderboard_sheet]:
-            for cell in sheet[1]:
-                cell.font = openpyxl.styles.Font(bold=True)
-                cell.fill = openpyxl.styles.PatternFill(start_color='E0E0E0', end_color='E0E0E0', fill_type='solid')
-        
-        # Save file
-        os.makedirs(os.path.dirname(EXCEL_FILE), exist_ok=True)
-        workbook.save(EXCEL_FILE)
-        return True
-    
-    except Exception as e:
-        print(f'Error writing Excel file: {e}')
-        return False
+    """Replace all data in the active storage backend"""
+    return repository.save(data)
 
 def initialize_excel_file():
-    """Initialize Excel file if it doesn't exist"""
-    if not os.path.exists(EXCEL_FILE):
+    """Initialize the data store if it is empty and ensure the admin user exists"""
+    admin_user = {
+        'email': 'admin@workholic.in',
+        'password': 'admin123',
+        'name': 'Admin',
+        'role': 'admin',
+        'schedule': 'general'
+    }
+    
+    default_schedules = [{'name': name, 'definition': definition}
+                         for name, definition in DEFAULT_SCHEDULES.items()]
+    
+    if repository.is_empty():
         initial_data = {
-            'employees': [
-                {
-                    'email': 'admin@workholic.in',
-                    'password': 'admin123',
-                    'name': 'Admin',
-                    'role': 'admin',
-                    'schedule': 'general'
-                }
-            ],
+            'employees': [admin_user],
             'attendance': [],
-            'leaderboard': []
+            'leaderboard': [],
+            'schedules': default_schedules,
+            'ledger': []
         }
         write_excel_data(initial_data)
-        print('Initial Excel file created')
+        print('Initial data store created')
     else:
-        # Ensure admin user exists in existing file
-        data = read_excel_data()
-        admin_exists = False
-        for user in data['employees']:
-            if user['email'] == 'admin@workholic.in':
-                admin_exists = True
-                break
-        
-        if not admin_exists:
-            admin_user = {
-                'email': 'admin@workholic.in',
-                'password': 'admin123',
-                'name': 'Admin',
-                'role': 'admin',
-                'schedule': 'general'
-            }
-            data['employees'].append(admin_user)
-            try:
-                write_excel_data(data)
-                print('Admin user added to existing database')
-            except:
-                print('Admin user added to memory (Excel file locked)')
+        # Rewrite data stored by older versions, e.g. timestamps kept as text,
+        # and fold any journal left over from the last run into the main store.
+        # If the store cannot be read, both leave it as it is.
+        try:
+            if repository.migrate():
+                print('Data store migrated to the current format')
+            repository.compact()
+        except Exception as e:
+            print(f'Could not compact the data store: {e}')
+        
+        # Ensure admin user exists in existing store
+        try:
+            with repository.transaction():
+                if not repository.get_employee(admin_user['email']):
+                    repository.put_employee(admin_user)
+                    print('Admin user added to existing database')
+                
+                # Stores created before schedules were data get the built-in ones
+                if not repository.list_schedules():
+                    for schedule in default_schedules:
+                        repository.put_schedule(schedule)
+                    print('Default schedules added to existing database')
+                
+                # Stores created before the ledger get opening balances for their counters
+                if not any(True for _ in repository.iter_ledger()):
+                    openings = [opening_entry(entry['email'], counter, entry.get(counter) or 0)
+                                for entry in repository.list_leaderboard()
+                                for counter in COUNTERS if entry.get(counter)]
+                    if openings:
+                        repository.put_many(ledger=openings)
+                        print(f'Opening balances recorded in the points ledger ({len(openings)} entries)')
+        except Exception as e:
+            print(f'Could not add admin user: {e}')
 
 def get_schedule_for_employee(schedule):
     """Get schedule configuration for employee"""
-    schedules = {
-        'general': {
-            'weekdays': {'start': '10:30', 'end': '19:00', 'breakDuration': 60},
-            'saturday': {'start': '10:00', 'end': '13:00', 'breakDuration': 15},
-            'workingSaturdays': [1, 3]
-        },
-        'shreyas': {
-            'weekdays': {'start': '16:30', 'end': '19:00', 'breakDuration': 15},
-            'friday': {'start': '12:00', 'end': '18:00', 'breakDuration': 45},
-            'weekend': 'off'
-        },
-        'srushti': {
-            'weekdays': {'start': '10:30', 'end': '16:30', 'breakDuration': 45},
-            'saturday': {'start': '10:00', 'end': '13:00', 'breakDuration': 15},
-            'workingSaturdays': [1, 3]
-        },
-        'vinay': {
-            'weekdays': {'start': '10:30', 'end': '21:00', 'breakDuration': 60},
-            'saturday': {'start': '10:00', 'end': '13:00', 'breakDuration': 15},
-            'workingSaturdays': [1, 3]
-        }
-    }
-    return schedules.get(schedule, schedules['general'])
+    return schedule_registry.definition(schedule)
 
-def calculate_attendance_status(clock_in, clock_out, schedule, total_break_time):
-    """Calculate attendance status"""
+def calculate_attendance_status(clock_in, clock_out, rule, total_break_time):
+    """Calculate attendance status against the day's compiled schedule rule"""
     if not clock_in:
         return 'A'  # Absent
     
-    clock_in_time = datetime.fromisoformat(clock_in.replace('Z', '+00:00'))
-    expected_start = clock_in_time.replace(hour=int(schedule['start'].split(':')[0]), 
-                                         minute=int(schedule['start'].split(':')[1]), 
-                                         second=0, microsecond=0)
+    clock_in_minutes = clock_in.hour * 60 + clock_in.minute + clock_in.second / 60
     
     # Check if late by more than 15 minutes
-    late_by = (clock_in_time - expected_start).total_seconds() / 60
+    late_by = clock_in_minutes - rule.start
     
     if not clock_out:
         return 'HD' if late_by > 15 else 'HD'  # Incomplete day
     
-    clock_out_time = datetime.fromisoformat(clock_out.replace('Z', '+00:00'))
-    total_worked_minutes = (clock_out_time - clock_in_time).total_seconds() / 60 - (total_break_time or 0)
+    total_worked_minutes = (clock_out - clock_in).total_seconds() / 60 - (total_break_time or 0)
     
     # Calculate expected work hours
-    expected_end = expected_start.replace(hour=int(schedule['end'].split(':')[0]), 
-                                        minute=int(schedule['end'].split(':')[1]))
-    expected_work_minutes = (expected_end - expected_start).total_seconds() / 60 - schedule['breakDuration']
+    expected_work_minutes = rule.end - rule.start - rule.break_duration
     
     if late_by > 15:
         return 'HD'
@@ -243,52 +179,203 @@ def calculate_attendance_status(clock_in, clock_out, schedule, total_break_time)
     
     return 'FD'
 
-def update_leaderboard_points(email, attendance_status, data):
-    """Update leaderboard points for employee"""
-    try:
-        employee_entry = None
-        for entry in data['leaderboard']:
-            if entry['email'] == email:
-                employee_entry = entry
-                break
-        
-        if not employee_entry:
-            # Find employee info
-            employee = None
-            for emp in data['employees']:
-                if emp['email'] == email:
-                    employee = emp
-                    break
+def total_break_minutes(record):
+    """Minutes spent on completed breaks in an attendance record"""
+    total_break_time = 0
+    for brk in record.get('breaks') or []:
+        if brk.get('start') and brk.get('end'):
+            total_break_time += (brk['end'] - brk['start']).total_seconds() / 60
+    return total_break_time
+
+def attendance_status_for(record, schedule):
+    """Status of an attendance record under the rule for its own date"""
+    rule = schedule_registry.rule_for(schedule, datetime.strptime(record['date'], '%Y-%m-%d').date())
+    return calculate_attendance_status(record['clockIn'], record['clockOut'], rule, total_break_minutes(record))
+
+def get_leaderboard_entry_for(email):
+    """Get an employee's leaderboard entry, or a fresh one if they have none"""
+    employee_entry = repository.get_leaderboard_entry(email)
+    
+    if not employee_entry:
+        # Find employee info
+        employee = repository.get_employee(email)
+        employee_entry = new_leaderboard_entry(email, employee['name'] if employee else email)
+    return employee_entry
+
+def score_attendance(employee_entry, record):
+    """Apply the points for an attendance record to a leaderboard entry
+    
+    Returns the ledger entry to store with it. A day that was already
+    scored has its earlier points taken back first, so clocking out twice
+    or over an absence replaces the day's score instead of adding to it.
+    """
+    ledger_entry = attendance_entry(record['email'], record['date'], record['status'])
+    previous = repository.get_ledger_entry(ledger_entry['id'], ledger_entry['date'])
+    if previous:
+        apply_entry(employee_entry, previous, reverse=True)
+    apply_entry(employee_entry, ledger_entry)
+    return ledger_entry
+
+def close_out_day(day, now=None):
+    """End-of-day sweep of every employee against their schedule for a date
+    
+    Working days without a record get an absence ('A'); shifts left open
+    are clocked out (and any open break ended) at the scheduled end, and
+    count as incomplete days. Points are scored and everything is stored
+    in one write. Days that were already closed out have no open shifts or
+    missing records left, so running it again changes nothing.
+    Employees whose scheduled end is still ahead of now (default: the
+    current time) are left alone and listed as pending, so a run during
+    the day never writes a clock out in the future.
+    """
+    now = now or timestamps.now()
+    day_str = day.strftime('%Y-%m-%d')
+    summary = {'date': day_str, 'absent': [], 'closed': [], 'pending': []}
+    
+    with repository.transaction():
+        records = []
+        entries = {}
+        ledger_entries = []
+        
+        for employee in repository.list_employees():
+            if employee['role'] != 'employee':
+                continue
             
-            employee_entry = {
-                'email': email,
-                'name': employee['name'] if employee else email,
-                'totalPoints': 0,
-                'attendancePoints': 0,
-                'smallTasks': 0,
-                'regularTasks': 0,
-                'bigTasks': 0
-            }
-            data['leaderboard'].append(employee_entry)
-        
-        # Update attendance points
-        points_map = {'FD': 2, 'HD': 1, 'A': -1}
-        employee_entry['attendancePoints'] += points_map.get(attendance_status, 0)
-        
-        # Recalculate total points
-        employee_entry['totalPoints'] = (
-            employee_entry['attendancePoints'] +
-            (employee_entry['smallTasks'] * 1) +
-            (employee_entry['regularTasks'] * 2) +
-            (employee_entry['bigTasks'] * 3)
-        )
+            email = employee['email']
+            rule = schedule_registry.rule_for(employee['schedule'], day)
+            scheduled_end = datetime.combine(day, datetime.min.time()) + timedelta(minutes=rule.end)
+            # Only open shifts need their breaks; the rest is decided on the summary
+            record = repository.get_attendance(email, day_str, breaks=False)
+            
+            open_shift = record is not None and record['clockIn'] and not record['clockOut']
+            if scheduled_end > now and (open_shift or (record is None and rule.working)):
+                # The shift is not over yet; a later run picks it up
+                summary['pending'].append(email)
+                continue
+            
+            if record is None:
+                if not rule.working:
+                    continue
+                record = {
+                    'email': email,
+                    'date': day_str,
+                    'clockIn': None,
+                    'clockOut': None,
+                    'breaks': [],
+                    'status': 'A'
+                }
+                summary['absent'].append(email)
+            
+            elif record['clockIn'] and not record['clockOut']:
+                record = repository.get_attendance(email, day_str)
+                
+                # Clock out at the scheduled end, or at clock in for shifts started after it
+                close_at = max(scheduled_end, record['clockIn'])
+                
+                for brk in record['breaks']:
+                    if brk.get('start') and not brk.get('end'):
+                        brk['end'] = close_at
+                
+                # Status is judged before the automatic clock out, like any unfinished day
+                record['status'] = calculate_attendance_status(record['clockIn'], None, rule, total_break_minutes(record))
+                record['clockOut'] = close_at
+                summary['closed'].append(email)
+            
+            else:
+                continue
+            
+            records.append(record)
+            if email not in entries:
+                entries[email] = get_leaderboard_entry_for(email)
+            ledger_entries.append(score_attendance(entries[email], record))
         
-        write_excel_data(data)
-        return True
+        if records:
+            repository.put_many(attendance=records, leaderboard=list(entries.values()), ledger=ledger_entries)
     
+    for record in records:
+        events.publish('attendance', {'action': 'close-out', 'record': record}, audience=record['email'])
+    if entries:
+        publish_leaderboard()
+    
+    return summary
+
+def rebuild_from_ledger(apply=False):
+    """Recompute the leaderboard from the points ledger in one pass
+    
+    Returns the differences between the ledger and the live counters. With
+    apply=True the live leaderboard is then replaced by the recomputed one;
+    entries without any ledger entries are reset to zero.
+    """
+    with repository.transaction():
+        live = repository.list_leaderboard()
+        names = {employee['email']: employee['name'] for employee in repository.list_employees()}
+        names.update({entry['email']: entry['name'] for entry in live})
+        
+        rebuilt = rebuild_leaderboard(repository.iter_ledger(), names)
+        mismatches = verify_leaderboard(rebuilt, live)
+        
+        if apply and mismatches:
+            for entry in live:
+                if entry['email'] not in rebuilt:
+                    rebuilt[entry['email']] = new_leaderboard_entry(entry['email'], entry['name'])
+            repository.put_leaderboard_entries(list(rebuilt.values()))
+    
+    if apply and mismatches:
+        publish_leaderboard()
+    return mismatches
+
+def publish_leaderboard():
+    """Push the current top of the leaderboard to connected dashboards"""
+    try:
+        events.publish('leaderboard', {'leaderboard': repository.leaderboard_top(8)})
     except Exception as e:
-        print(f'Update leaderboard error: {e}')
-        return False
+        print(f'Publish leaderboard error: {e}')
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    REQUESTS_IN_FLIGHT.inc()
+
+@app.after_request
+def record_request_metrics(response):
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    started = g.get('request_started')
+    if started is not None:
+        REQUEST_SECONDS.observe(time.perf_counter() - started, route=route, method=request.method)
+    REQUESTS.inc(route=route, method=request.method, status=response.status_code)
+    return response
+
+@app.teardown_request
+def finish_request(exception=None):
+    if g.pop('request_started', None) is not None:
+        REQUESTS_IN_FLIGHT.dec()
+
+def conditional_get(view):
+    """Serve a GET endpoint with an ETag derived from the global data version
+    
+    The tag covers the endpoint, the data version, the session user and the
+    query string, so If-None-Match can be answered with 304 before the view
+    loads or serializes anything. Only successful responses are tagged.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        user = session.get('user', {}).get('email', '')
+        raw_tag = f'{request.endpoint}|{repository.data_version()}|{user}|{request.query_string.decode()}'
+        etag = hashlib.sha1(raw_tag.encode()).hexdigest()
+        
+        if etag in request.if_none_match:
+            response = Response(status=304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            body = response.get_json(silent=True) if response.is_json else None
+            if response.status_code != 200 or not (body and body.get('success')):
+                return response
+        
+        response.set_etag(etag)
+        # Let browsers keep the body but revalidate it on every fetch
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return wrapper
 
 # Routes
 @app.route('/')
@@ -315,34 +402,33 @@ def login():
     password = data.get('password')
     
     try:
-        excel_data = read_excel_data()
-        employee = None
-        for emp in excel_data['employees']:
-            if emp['email'] == email:
-                employee = emp
-                break
+        employee = repository.get_employee(email)
         
         if not employee:
             return jsonify({'success': False, 'message': 'Invalid credentials'})
         
         # First time login - set password
         if not employee['password']:
-            employee['password'] = password
-            excel_data['employees'] = [emp for emp in excel_data['employees'] if emp['email'] != email]
-            excel_data['employees'].append(employee)
-            write_excel_data(excel_data)
+            with repository.transaction():
+                # Re-read under the lock: a concurrent first login may have set it already
+                employee = repository.get_employee(email)
+                first_login = employee is not None and not employee['password']
+                if first_login:
+                    employee['password'] = password
+                    repository.put_employee(employee)
             
-            session['user'] = {
-                'email': employee['email'],
-                'name': employee['name'],
-                'role': employee['role'],
-                'schedule': employee['schedule']
-            }
-            
-            return jsonify({'success': True, 'firstLogin': True, 'role': employee['role']})
+            if first_login:
+                session['user'] = {
+                    'email': employee['email'],
+                    'name': employee['name'],
+                    'role': employee['role'],
+                    'schedule': employee['schedule']
+                }
+                
+                return jsonify({'success': True, 'firstLogin': True, 'role': employee['role']})
         
         # Regular login
-        if employee['password'] != password:
+        if not employee or employee['password'] != password:
             return jsonify({'success': False, 'message': 'Invalid credentials'})
         
         session['user'] = {
@@ -381,74 +467,67 @@ def clock_action():
     data = request.get_json()
     action = data.get('action')
     email = session['user']['email']
-    now = datetime.now().isoformat()
-    today = datetime.now().strftime('%Y-%m-%d')
+    now = timestamps.now()
+    today = now.strftime('%Y-%m-%d')
+    ledger_entry = None
     
     try:
-        excel_data = read_excel_data()
-        today_record = None
-        
-        for record in excel_data['attendance']:
-            if record['email'] == email and record['date'] == today:
-                today_record = record
-                break
-        
-        if not today_record:
-            today_record = {
-                'email': email,
-                'date': today,
-                'clockIn': None,
-                'clockOut': None,
-                'breaks': [],
-                'status': 'A'
-            }
-            excel_data['attendance'].append(today_record)
-        
-        if action == 'clock-in':
-            if not today_record['clockIn']:
-                today_record['clockIn'] = now
-        
-        elif action == 'break-start':
-            last_break = today_record['breaks'][-1] if today_record['breaks'] else None
-            if not last_break or last_break.get('end'):
-                today_record['breaks'].append({'start': now, 'end': None})
-        
-        elif action == 'break-end':
-            if today_record['breaks']:
-                current_break = today_record['breaks'][-1]
-                if current_break and not current_break.get('end'):
-                    current_break['end'] = now
-        
-        elif action == 'clock-out':
-            if today_record['clockIn']:
-                today_record['clockOut'] = now
-                
-                # End any ongoing break
+        with repository.transaction():
+            today_record = repository.get_attendance(email, today)
+            
+            if not today_record:
+                today_record = {
+                    'email': email,
+                    'date': today,
+                    'clockIn': None,
+                    'clockOut': None,
+                    'breaks': [],
+                    'status': 'A'
+                }
+            
+            if action == 'clock-in':
+                if not today_record['clockIn']:
+                    today_record['clockIn'] = now
+            
+            elif action == 'break-start':
+                last_break = today_record['breaks'][-1] if today_record['breaks'] else None
+                if not last_break or last_break.get('end'):
+                    today_record['breaks'].append({'start': now, 'end': None})
+            
+            elif action == 'break-end':
                 if today_record['breaks']:
-                    ongoing_break = today_record['breaks'][-1]
-                    if ongoing_break and not ongoing_break.get('end'):
-                        ongoing_break['end'] = now
-                
-                # Calculate attendance status
-                schedule = get_schedule_for_employee(session['user']['schedule'])
-                total_break_time = 0
-                for brk in today_record['breaks']:
-                    if brk.get('start') and brk.get('end'):
-                        start_time = datetime.fromisoformat(brk['start'].replace('Z', '+00:00'))
-                        end_time = datetime.fromisoformat(brk['end'].replace('Z', '+00:00'))
-                        total_break_time += (end_time - start_time).total_seconds() / 60
-                
-                today_record['status'] = calculate_attendance_status(
-                    today_record['clockIn'],
-                    today_record['clockOut'],
-                    schedule.get('weekdays', schedule),
-                    total_break_time
-                )
-                
-                # Update leaderboard points
-                update_leaderboard_points(email, today_record['status'], excel_data)
+                    current_break = today_record['breaks'][-1]
+                    if current_break and not current_break.get('end'):
+                        current_break['end'] = now
+            
+            elif action == 'clock-out':
+                if today_record['clockIn']:
+                    today_record['clockOut'] = now
+                    
+                    # End any ongoing break
+                    if today_record['breaks']:
+                        ongoing_break = today_record['breaks'][-1]
+                        if ongoing_break and not ongoing_break.get('end'):
+                            ongoing_break['end'] = now
+                    
+                    # Calculate attendance status with the rule for this date
+                    today_record['status'] = attendance_status_for(today_record, session['user']['schedule'])
+                    
+                    # Score the day; it is stored with the record in one write
+                    employee_entry = get_leaderboard_entry_for(email)
+                    ledger_entry = score_attendance(employee_entry, today_record)
+            
+            if ledger_entry:
+                repository.put_many(attendance=[today_record], leaderboard=[employee_entry],
+                                    ledger=[ledger_entry])
+            else:
+                repository.put_attendance(today_record)
+        
+        # Publish only once the transaction has committed
+        events.publish('attendance', {'action': action, 'record': today_record}, audience=email)
+        if action == 'clock-out':
+            publish_leaderboard()
         
-        write_excel_data(excel_data)
         return jsonify({'success': True, 'record': today_record})
     
     except Exception as e:
@@ -465,13 +544,7 @@ def get_today_attendance():
     today = datetime.now().strftime('%Y-%m-%d')
     
     try:
-        excel_data = read_excel_data()
-        today_record = None
-        
-        for record in excel_data['attendance']:
-            if record['email'] == email and record['date'] == today:
-                today_record = record
-                break
+        today_record = repository.get_attendance(email, today)
         
         return jsonify({'success': True, 'record': today_record})
     
@@ -480,6 +553,7 @@ def get_today_attendance():
         return jsonify({'success': False, 'message': 'Server error'})
 
 @app.route('/api/attendance/history')
+@conditional_get
 def get_attendance_history():
     """Get attendance history"""
     if 'user' not in session:
@@ -488,8 +562,7 @@ def get_attendance_history():
     email = session['user']['email']
     
     try:
-        excel_data = read_excel_data()
-        user_attendance = [record for record in excel_data['attendance'] if record['email'] == email]
+        user_attendance = repository.list_attendance(email=email)
         user_attendance.sort(key=lambda x: x['date'], reverse=True)
         user_attendance = user_attendance[:30]  # Last 30 days
         
@@ -507,31 +580,25 @@ def get_today_schedule():
     
     try:
         schedule = get_schedule_for_employee(session['user']['schedule'])
-        return jsonify({'success': True, 'schedule': schedule})
+        rule = schedule_registry.rule_for(session['user']['schedule'], datetime.now().date())
+        return jsonify({'success': True, 'schedule': schedule, 'today': describe_rule(rule)})
     
     except Exception as e:
         print(f'Schedule error: {e}')
         return jsonify({'success': False, 'message': 'Server error'})
 
 @app.route('/api/leaderboard')
+@conditional_get
 def get_leaderboard():
     """Get leaderboard data"""
     try:
-        excel_data = read_excel_data()
-        leaderboard = sorted(excel_data['leaderboard'], key=lambda x: x['totalPoints'], reverse=True)
-        
-        for i, entry in enumerate(leaderboard):
-            entry['rank'] = i + 1
-        
-        top8 = leaderboard[:8]
+        top8 = repository.leaderboard_top(8)
         user_rank = None
         
         if 'user' in session and session['user']['role'] == 'employee':
-            for entry in leaderboard:
-                if entry['email'] == session['user']['email']:
-                    if entry['rank'] > 8:
-                        user_rank = entry['rank']
-                    break
+            rank = repository.leaderboard_rank(session['user']['email'])
+            if rank and rank > 8:
+                user_rank = rank
         
         return jsonify({'success': True, 'leaderboard': top8, 'userRank': user_rank})
     
@@ -551,65 +618,241 @@ def update_tasks():
     count = int(data.get('count', 0))
     
     try:
-        excel_data = read_excel_data()
-        employee_entry = None
-        
-        for entry in excel_data['leaderboard']:
-            if entry['email'] == email:
-                employee_entry = entry
-                break
-        
-        if not employee_entry:
-            # Find employee info
-            employee = None
-            for emp in excel_data['employees']:
-                if emp['email'] == email:
-                    employee = emp
-                    break
-            
-            employee_entry = {
-                'email': email,
-                'name': employee['name'] if employee else email,
-                'totalPoints': 0,
-                'smallTasks': 0,
-                'regularTasks': 0,
-                'bigTasks': 0,
-                'attendancePoints': 0
-            }
-            excel_data['leaderboard'].append(employee_entry)
-        
-        # Update task count
-        task_counts = {'small': 'smallTasks', 'regular': 'regularTasks', 'big': 'bigTasks'}
-        if task_type in task_counts:
-            old_count = employee_entry.get(task_counts[task_type], 0)
-            new_count = old_count + count
-            employee_entry[task_counts[task_type]] = max(0, new_count)
+        with repository.transaction():
+            employee_entry = get_leaderboard_entry_for(email)
             
-            # Recalculate total points
-            employee_entry['totalPoints'] = (
-                (employee_entry.get('attendancePoints', 0)) +
-                (employee_entry.get('smallTasks', 0) * 1) +
-                (employee_entry.get('regularTasks', 0) * 2) +
-                (employee_entry.get('bigTasks', 0) * 3)
-            )
-        
-        write_excel_data(excel_data)
+            # Update task count and record the award in the ledger
+            if task_type in TASK_FIELDS:
+                ledger_entry = task_entry(email, task_type, count)
+                apply_entry(employee_entry, ledger_entry)
+                repository.put_many(leaderboard=[employee_entry], ledger=[ledger_entry])
+            else:
+                repository.put_leaderboard_entry(employee_entry)
+        
+        events.publish('tasks', {'email': email, 'taskType': task_type, 'count': count, 'entry': employee_entry})
+        publish_leaderboard()
+        
         return jsonify({'success': True})
     
     except Exception as e:
         print(f'Update tasks error: {e}')
         return jsonify({'success': False, 'message': 'Server error'})
 
+@app.route('/api/admin/update-tasks/batch', methods=['POST'])
+def update_tasks_batch():
+    """Apply many task awards in one transaction (admin only)
+    
+    Body: {"awards": [{"email", "taskType", "count"}, ...]}. Invalid awards
+    are reported in results and skipped; the rest are applied in order,
+    each award is recorded in the points ledger and every changed entry is
+    persisted with those ledger entries in a single write.
+    """
+    if 'user' not in session or session['user']['role'] != 'admin':
+        return jsonify({'success': False, 'message': 'Unauthorized'})
+    
+    data = request.get_json(silent=True) or {}
+    awards = data.get('awards')
+    if not isinstance(awards, list) or not awards:
+        return jsonify({'success': False, 'message': 'awards must be a non-empty list'})
+    
+    try:
+        with repository.transaction():
+            entries = {}
+            ledger_entries = []
+            results = []
+            
+            for award in awards:
+                award = award if isinstance(award, dict) else {}
+                email = award.get('email')
+                task_type = award.get('taskType')
+                result = {'email': email, 'taskType': task_type, 'success': False}
+                results.append(result)
+                
+                try:
+                    count = int(award.get('count', 0))
+                except (TypeError, ValueError):
+                    result['message'] = 'Invalid count'
+                    continue
+                result['count'] = count
+                
+                if not isinstance(email, str) or not email:
+                    result['message'] = 'Invalid email'
+                    continue
+                
+                if task_type not in TASK_FIELDS:
+                    result['message'] = 'Invalid task type'
+                    continue
+                
+                if email not in entries:
+                    employee_entry = repository.get_leaderboard_entry(email)
+                    if not employee_entry:
+                        employee = repository.get_employee(email)
+                        if not employee:
+                            result['message'] = 'Employee not found'
+                            continue
+                        
+                        employee_entry = new_leaderboard_entry(email, employee['name'])
+                    entries[email] = employee_entry
+                
+                # Same clamping as update-tasks, applied award by award
+                ledger_entry = task_entry(email, task_type, count)
+                apply_entry(entries[email], ledger_entry)
+                ledger_entries.append(ledger_entry)
+                result['success'] = True
+            
+            if entries:
+                repository.put_many(leaderboard=list(entries.values()), ledger=ledger_entries)
+        
+        for result in results:
+            if result['success']:
+                events.publish('tasks', {'email': result['email'], 'taskType': result['taskType'],
+                                         'count': result['count'], 'entry': entries[result['email']]})
+        if entries:
+            publish_leaderboard()
+        
+        applied = sum(1 for result in results if result['success'])
+        return jsonify({'success': True, 'applied': applied, 'failed': len(results) - applied,
+                        'results': results})
+    
+    except Exception as e:
+        print(f'Batch update tasks error: {e}')
+        return jsonify({'success': False, 'message': 'Server error'})
+
+@app.route('/api/admin/close-out', methods=['POST'])
+def close_out():
+    """Run the end-of-day close-out for a date (admin only)
+    
+    Body: {"date": "YYYY-MM-DD"}, defaulting to today. Future dates are
+    rejected since nobody could have clocked in yet.
+    """
+    if 'user' not in session or session['user']['role'] != 'admin':
+        return jsonify({'success': False, 'message': 'Unauthorized'})
+    
+    data = request.get_json(silent=True) or {}
+    
+    try:
+        day = datetime.strptime(data['date'], '%Y-%m-%d').date() if data.get('date') else datetime.now().date()
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'Invalid date'})
+    
+    if day > datetime.now().date():
+        return jsonify({'success': False, 'message': 'Cannot close out a future date'})
+    
+    try:
+        return jsonify({'success': True, **close_out_day(day)})
+    
+    except Exception as e:
+        print(f'Close out error: {e}')
+        return jsonify({'success': False, 'message': 'Server error'})
+
+@app.route('/api/admin/ledger/verify')
+def verify_ledger():
+    """Check the live leaderboard against the points ledger (admin only)"""
+    if 'user' not in session or session['user']['role'] != 'admin':
+        return jsonify({'success': False, 'message': 'Unauthorized'})
+    
+    try:
+        mismatches = rebuild_from_ledger()
+        return jsonify({'success': True, 'consistent': not mismatches, 'mismatches': mismatches})
+    
+    except Exception as e:
+        print(f'Verify ledger error: {e}')
+        return jsonify({'success': False, 'message': 'Server error'})
+
+@app.route('/api/admin/ledger/rebuild', methods=['POST'])
+def rebuild_ledger():
+    """Replace the live leaderboard with one rebuilt from the ledger (admin only)"""
+    if 'user' not in session or session['user']['role'] != 'admin':
+        return jsonify({'success': False, 'message': 'Unauthorized'})
+    
+    try:
+        mismatches = rebuild_from_ledger(apply=True)
+        return jsonify({'success': True, 'corrected': mismatches})
+    
+    except Exception as e:
+        print(f'Rebuild ledger error: {e}')
+        return jsonify({'success': False, 'message': 'Server error'})
+
+@app.route('/api/admin/metrics')
+def get_metrics():
+    """Request and storage metrics in Prometheus text format (admin only)
+    
+    Metrics are per process; with several workers, scrape each of them.
+    """
+    authorization = request.headers.get('Authorization', '')
+    token_ok = bool(METRICS_TOKEN) and hmac.compare_digest(authorization, f'Bearer {METRICS_TOKEN}')
+    if not token_ok and ('user' not in session or session['user']['role'] != 'admin'):
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
+    
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/events')
+def event_stream():
+    """Stream leaderboard, attendance and task updates as Server-Sent Events
+    
+    Events: attendance (clock actions; employees only receive their own),
+    tasks, leaderboard (top 8, plus userRank for employees) and sync, which
+    asks the client to re-fetch because it missed changes made elsewhere.
+    The stream ends after EVENT_STREAM_SECONDS and the client reconnects.
+    """
+    if 'user' not in session:
+        return jsonify({'success': False, 'message': 'Unauthorized'})
+    
+    if not EVENT_STREAMS:
+        # EventSource does not retry a 204; the dashboards fall back to polling
+        return Response(status=204)
+    
+    email = session['user']['email']
+    is_admin = session['user']['role'] == 'admin'
+    
+    def generate():
+        subscriber = events.subscribe()
+        try:
+            version = repository.data_version()
+            yield 'retry: 5000\n\n'
+            
+            deadline = time.monotonic() + EVENT_STREAM_SECONDS
+            while time.monotonic() < deadline:
+                try:
+                    event, data, audience = subscriber.get(
+                        timeout=min(EVENT_KEEPALIVE, max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    # Nothing published here; pick up commits from other workers
+                    current = repository.data_version()
+                    if current != version:
+                        version = current
+                        yield format_event('sync', {})
+                    else:
+                        yield ': keepalive\n\n'
+                    continue
+                
+                if audience and audience != email and not is_admin:
+                    continue
+                
+                if event == 'leaderboard' and not is_admin:
+                    rank = repository.leaderboard_rank(email)
+                    data = dict(data, userRank=rank if rank and rank > 8 else None)
+                
+                version = repository.data_version()
+                yield format_event(event, data)
+        finally:
+            events.unsubscribe(subscriber)
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 @app.route('/api/admin/employees')
+@conditional_get
 def get_employees():
     """Get employee list (admin only)"""
     if 'user' not in session or session['user']['role'] != 'admin':
         return jsonify({'success': False, 'message': 'Unauthorized'})
     
     try:
-        excel_data = read_excel_data()
         employees = [{'email': emp['email'], 'name': emp['name']} 
-                    for emp in excel_data['employees'] if emp['role'] == 'employee']
+                    for emp in repository.list_employees() if emp['role'] == 'employee']
         
         return jsonify({'success': True, 'employees': employees})
     
@@ -617,44 +860,101 @@ def get_employees():
         print(f'Get employees error: {e}')
         return jsonify({'success': False, 'message': 'Server error'})
 
+def encode_cursor(key):
+    """Encode a (date, email) key as an opaque pagination cursor"""
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode()).decode()
+
+def decode_cursor(cursor):
+    """Decode a pagination cursor, raising ValueError if it is malformed"""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if not (isinstance(key, list) and len(key) == 2 and all(isinstance(part, str) for part in key)):
+        raise ValueError('Invalid cursor')
+    return tuple(key)
+
+def invalid_day_arg(args, names=('start', 'end', 'date')):
+    """Return the first of the named query parameters that is set but not a YYYY-MM-DD date, or None"""
+    for name in names:
+        value = args.get(name)
+        if not value:
+            continue
+        try:
+            # Dates are compared as text, so only the zero-padded form will do
+            if len(value) != 10:
+                raise ValueError(value)
+            datetime.strptime(value, '%Y-%m-%d')
+        except ValueError:
+            return name
+    return None
+
 @app.route('/api/admin/attendance')
+@conditional_get
 def get_admin_attendance():
-    """Get all attendance records (admin only)"""
+    """Get a page of attendance records (admin only)
+    
+    Query parameters: start and end (YYYY-MM-DD, inclusive) or date for a
+    single day, email, status, order ('desc' by default or 'asc'), limit
+    (capped at ATTENDANCE_MAX_PAGE_SIZE) and cursor, taken from the previous
+    page's nextCursor.
+    """
     if 'user' not in session or session['user']['role'] != 'admin':
         return jsonify({'success': False, 'message': 'Unauthorized'})
     
+    args = request.args
+    invalid = invalid_day_arg(args)
+    if invalid:
+        return jsonify({'success': False, 'message': f'Invalid {invalid}: expected a YYYY-MM-DD date'})
     try:
-        excel_data = read_excel_data()
-        
-        attendance_with_names = []
-        for record in excel_data['attendance']:
-            employee = None
-            for emp in excel_data['employees']:
-                if emp['email'] == record['email']:
-                    employee = emp
-                    break
-            
-            attendance_with_names.append({
-                **record,
-                'name': employee['name'] if employee else record['email']
-            })
+        limit = min(max(int(args.get('limit', ATTENDANCE_PAGE_SIZE)), 1), ATTENDANCE_MAX_PAGE_SIZE)
+        after = decode_cursor(args['cursor']) if args.get('cursor') else None
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Invalid query parameters'})
+    
+    try:
+        rows = repository.iter_attendance(
+            email=args.get('email') or None,
+            start=args.get('start') or args.get('date') or None,
+            end=args.get('end') or args.get('date') or None,
+            status=args.get('status') or None,
+            descending=args.get('order', 'desc') != 'asc',
+            after=after
+        )
+        try:
+            records = list(islice(rows, limit + 1))
+        finally:
+            rows.close()
         
-        return jsonify({'success': True, 'attendance': attendance_with_names})
+        next_cursor = None
+        if len(records) > limit:
+            records = records[:limit]
+            next_cursor = encode_cursor((records[-1]['date'], records[-1]['email']))
+        
+        # Only look up the employees that appear on this page
+        names = {}
+        for email in {record['email'] for record in records}:
+            employee = repository.get_employee(email)
+            names[email] = employee['name'] if employee else email
+        
+        attendance_with_names = [{**record, 'name': names[record['email']]} for record in records]
+        
+        return jsonify({'success': True, 'attendance': attendance_with_names, 'nextCursor': next_cursor})
     
     except Exception as e:
         print(f'Admin attendance error: {e}')
         return jsonify({'success': False, 'message': 'Server error'})
 
 @app.route('/api/admin/users')
+@conditional_get
 def get_users():
     """Get all users (admin only)"""
     if 'user' not in session or session['user']['role'] != 'admin':
         return jsonify({'success': False, 'message': 'Unauthorized'})
     
     try:
-        excel_data = read_excel_data()
         users = [{'email': emp['email'], 'name': emp['name'], 'role': emp['role'], 'schedule': emp['schedule']} 
-                for emp in excel_data['employees']]
+                for emp in repository.list_employees()]
         
         return jsonify({'success': True, 'users': users})
     
@@ -662,6 +962,72 @@ def get_users():
         print(f'Get users error: {e}')
         return jsonify({'success': False, 'message': 'Server error'})
 
+@app.route('/api/admin/schedules')
+@conditional_get
+def get_schedules():
+    """Get all schedule definitions (admin only)"""
+    if 'user' not in session or session['user']['role'] != 'admin':
+        return jsonify({'success': False, 'message': 'Unauthorized'})
+    
+    try:
+        return jsonify({'success': True, 'schedules': repository.list_schedules()})
+    
+    except Exception as e:
+        print(f'Get schedules error: {e}')
+        return jsonify({'success': False, 'message': 'Server error'})
+
+@app.route('/api/admin/schedules/update', methods=['POST'])
+def update_schedule():
+    """Create or replace a schedule definition (admin only)"""
+    if 'user' not in session or session['user']['role'] != 'admin':
+        return jsonify({'success': False, 'message': 'Unauthorized'})
+    
+    data = request.get_json(silent=True) or {}
+    name = data.get('name')
+    definition = data.get('definition')
+    
+    if not isinstance(name, str) or not name.strip():
+        return jsonify({'success': False, 'message': 'Schedule name is required'})
+    
+    try:
+        validate_definition(definition)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)})
+    
+    try:
+        repository.put_schedule({'name': name.strip(), 'definition': definition})
+        return jsonify({'success': True})
+    
+    except Exception as e:
+        print(f'Update schedule error: {e}')
+        return jsonify({'success': False, 'message': 'Server error'})
+
+@app.route('/api/admin/schedules/delete', methods=['POST'])
+def delete_schedule():
+    """Delete a schedule no user is assigned to (admin only)"""
+    if 'user' not in session or session['user']['role'] != 'admin':
+        return jsonify({'success': False, 'message': 'Unauthorized'})
+    
+    data = request.get_json(silent=True) or {}
+    name = data.get('name')
+    
+    if name == 'general':
+        return jsonify({'success': False, 'message': 'The general schedule cannot be deleted'})
+    
+    try:
+        with repository.transaction():
+            if any(emp['schedule'] == name for emp in repository.list_employees()):
+                return jsonify({'success': False, 'message': 'Schedule is assigned to users'})
+            
+            if not repository.delete_schedule(name):
+                return jsonify({'success': False, 'message': 'Schedule not found'})
+            
+            return jsonify({'success': True})
+    
+    except Exception as e:
+        print(f'Delete schedule error: {e}')
+        return jsonify({'success': False, 'message': 'Server error'})
+
 @app.route('/api/admin/users/<email>')
 def get_user_by_email(email):
     """Get specific user (admin only)"""
@@ -669,13 +1035,7 @@ def get_user_by_email(email):
         return jsonify({'success': False, 'message': 'Unauthorized'})
     
     try:
-        excel_data = read_excel_data()
-        user = None
-        
-        for emp in excel_data['employees']:
-            if emp['email'] == email:
-                user = emp
-                break
+        user = repository.get_employee(email)
         
         if not user:
             return jsonify({'success': False, 'message': 'User not found'})
@@ -705,28 +1065,73 @@ def create_user():
     password = data.get('password')
     
     try:
-        excel_data = read_excel_data()
-        
-        # Check if user already exists
-        for emp in excel_data['employees']:
-            if emp['email'] == email:
+        with repository.transaction():
+            # Check if user already exists
+            if repository.get_employee(email):
                 return jsonify({'success': False, 'message': 'User already exists'})
+            
+            new_user = {
+                'email': email,
+                'name': name or '',
+                'role': role,
+                'schedule': schedule,
+                'password': password or None
+            }
+            
+            repository.put_employee(new_user)
+            
+            return jsonify({'success': True})
+    
+    except Exception as e:
+        print(f'Create user error: {e}')
+        return jsonify({'success': False, 'message': 'Server error'})
+
+@app.route('/api/admin/users/import', methods=['POST'])
+def import_users():
+    """Create or update many users from a CSV/XLSX roster (admin only)
+    
+    Multipart form: file (the roster), update=true to update existing users
+    instead of reporting them as conflicts, dryRun=true to only validate.
+    Every row is checked first; if any row fails nothing is written,
+    otherwise all users are stored in a single write.
+    """
+    if 'user' not in session or session['user']['role'] != 'admin':
+        return jsonify({'success': False, 'message': 'Unauthorized'})
+    
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        return jsonify({'success': False, 'message': 'No roster file uploaded'})
+    
+    update_existing = request.form.get('update') == 'true'
+    dry_run = request.form.get('dryRun') == 'true'
+    
+    try:
+        rows = read_roster(upload.stream, upload.filename)
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Could not read roster: {e}'})
+    
+    try:
+        with repository.transaction():
+            users, results = plan_import(rows, repository, schedule_registry.names(), update_existing)
+            errors = sum(1 for result in results if result['action'] == 'error')
+            
+            if not errors and users and not dry_run:
+                repository.put_employees(users)
         
-        new_user = {
-            'email': email,
-            'name': name or '',
-            'role': role,
-            'schedule': schedule,
-            'password': password or None
+        summary = {
+            'created': sum(1 for result in results if result['action'] == 'create'),
+            'updated': sum(1 for result in results if result['action'] == 'update'),
+            'errors': errors,
+            'dryRun': dry_run,
+            'results': results
         }
         
-        excel_data['employees'].append(new_user)
-        write_excel_data(excel_data)
-        
-        return jsonify({'success': True})
+        if errors:
+            return jsonify({'success': False, 'message': f'{errors} row(s) failed validation; nothing was imported', **summary})
+        return jsonify({'success': True, **summary})
     
     except Exception as e:
-        print(f'Create user error: {e}')
+        print(f'Import users error: {e}')
         return jsonify({'success': False, 'message': 'Server error'})
 
 @app.route('/api/admin/users/update', methods=['POST'])
@@ -743,21 +1148,21 @@ def update_user():
     password = data.get('password')
     
     try:
-        excel_data = read_excel_data()
-        
-        for i, emp in enumerate(excel_data['employees']):
-            if emp['email'] == email:
-                excel_data['employees'][i]['name'] = name or ''
-                excel_data['employees'][i]['role'] = role
-                excel_data['employees'][i]['schedule'] = schedule
-                
-                if password:
-                    excel_data['employees'][i]['password'] = password
-                
-                write_excel_data(excel_data)
-                return jsonify({'success': True})
-        
-        return jsonify({'success': False, 'message': 'User not found'})
+        with repository.transaction():
+            user = repository.get_employee(email)
+            
+            if not user:
+                return jsonify({'success': False, 'message': 'User not found'})
+            
+            user['name'] = name or ''
+            user['role'] = role
+            user['schedule'] = schedule
+            
+            if password:
+                user['password'] = password
+            
+            repository.put_employee(user)
+            return jsonify({'success': True})
     
     except Exception as e:
         print(f'Update user error: {e}')
@@ -773,15 +1178,9 @@ def delete_user():
     email = data.get('email')
     
     try:
-        excel_data = read_excel_data()
-        original_length = len(excel_data['employees'])
-        
-        excel_data['employees'] = [emp for emp in excel_data['employees'] if emp['email'] != email]
-        
-        if len(excel_data['employees']) == original_length:
+        if not repository.delete_employee(email):
             return jsonify({'success': False, 'message': 'User not found'})
         
-        write_excel_data(excel_data)
         return jsonify({'success': True})
     
     except Exception as e:
@@ -790,79 +1189,130 @@ def delete_user():
 
 @app.route('/api/admin/export-excel')
 def export_excel():
-    """Export attendance data to Excel (admin only)"""
+    """Export attendance data to Excel (admin only)
+    
+    Optional query parameters: start and end (YYYY-MM-DD, inclusive) and
+    email to export a single employee.
+    """
     if 'user' not in session or session['user']['role'] != 'admin':
         return jsonify({'success': False, 'message': 'Unauthorized'})
     
-    try:
-        excel_data = read_excel_data()
-        
-        # Create workbook
-        workbook = Workbook()
-        worksheet = workbook.active
-        worksheet.title = 'Attendance Data'
-        
-        # Add headers
-        headers = ['Employee Name', 'Email', 'Date', 'Clock In', 'Clock Out', 'Status', 'Break Duration (min)', 'Total Breaks']
-        for col, header in enumerate(headers, 1):
-            worksheet.cell(row=1, column=col, value=header)
-        
-        # Add data
-        row = 2
-        for record in excel_data['attendance']:
-            # Find employee name
-            employee = None
-            for emp in excel_data['employees']:
-                if emp['email'] == record['email']:
-                    employee = emp
-                    break
-            
-            name = employee['name'] if employee else record['email']
-            
-            # Calculate break duration
-            break_duration = 0
-            total_breaks = len(record.get('breaks', []))
-            for brk in record.get('breaks', []):
-                if brk.get('start') and brk.get('end'):
-                    start_time = datetime.fromisoformat(brk['start'].replace('Z', '+00:00'))
-                    end_time = datetime.fromisoformat(brk['end'].replace('Z', '+00:00'))
-                    break_duration += (end_time - start_time).total_seconds() / 60
-            
-            clock_in = record['clockIn'].replace('T', ' ').replace('Z', '') if record['clockIn'] else 'N/A'
-            clock_out = record['clockOut'].replace('T', ' ').replace('Z', '') if record['clockOut'] else 'N/A'
-            
-            worksheet.cell(row=row, column=1, value=name)
-            worksheet.cell(row=row, column=2, value=record['email'])
-            worksheet.cell(row=row, column=3, value=record['date'])
-            worksheet.cell(row=row, column=4, value=clock_in)
-            worksheet.cell(row=row, column=5, value=clock_out)
-            worksheet.cell(row=row, column=6, value=record['status'])
-            worksheet.cell(row=row, column=7, value=int(break_duration))
-            worksheet.cell(row=row, column=8, value=total_breaks)
-            
-            row += 1
-        
-        # Style header row
-        for col in range(1, len(headers) + 1):
-            cell = worksheet.cell(row=1, column=col)
-            cell.font = openpyxl.styles.Font(bold=True)
-            cell.fill = openpyxl.styles.PatternFill(start_color='E0E0E0', end_color='E0E0E0', fill_type='solid')
-        
-        # Save to bytes
-        output = io.BytesIO()
-        workbook.save(output)
-        output.seek(0)
-        
-        return send_file(
-            output,
-            as_attachment=True,
-            download_name=f'attendance-export-{datetime.now().strftime("%Y-%m-%d")}.xlsx',
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
+    invalid = invalid_day_arg(request.args, ('start', 'end'))
+    if invalid:
+        return jsonify({'success': False, 'message': f'Invalid {invalid}: expected a YYYY-MM-DD date'}), 400
     
+    start = request.args.get('start') or None
+    end = request.args.get('end') or None
+    email = request.args.get('email') or None
+    
+    try:
+        names = {emp['email']: emp['name'] for emp in repository.list_employees()}
     except Exception as e:
         print(f'Excel export error: {e}')
         return jsonify({'success': False, 'message': 'Server error'})
+    
+    headers = ['Employee Name', 'Email', 'Date', 'Clock In', 'Clock Out', 'Status', 'Break Duration (min)', 'Total Breaks']
+    
+    def generate():
+        records = repository.iter_attendance(email=email, start=start, end=end)
+        rows = ([
+            names.get(record['email'], record['email']),
+            record['email'],
+            record['date'],
+            record['clockIn'] or 'N/A',
+            record['clockOut'] or 'N/A',
+            record['status'],
+            int(total_break_minutes(record)),
+            len(record['breaks'])
+        ] for record in records)
+        try:
+            # Each row is encoded and compressed as soon as it is read
+            yield from xlsx_chunks('Attendance Data', headers, rows)
+        except Exception as e:
+            # The status line is already sent; aborting the stream tells the client it is incomplete
+            print(f'Excel export error: {e}')
+            raise
+        finally:
+            records.close()
+    
+    return Response(
+        generate(),
+        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        headers={
+            'Content-Disposition': f'attachment; filename=attendance-export-{datetime.now().strftime("%Y-%m-%d")}.xlsx',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+# Columns of the CSV / JSON Lines exports, in order
+EXPORT_FIELDS = {
+    'attendance': ['name', 'email', 'date', 'clockIn', 'clockOut', 'status', 'breakMinutes', 'totalBreaks'],
+    'leaderboard': ['email', 'name', 'totalPoints', 'attendancePoints', 'smallTasks', 'regularTasks', 'bigTasks'],
+    'users': ['email', 'name', 'role', 'schedule']
+}
+
+def export_rows(dataset, email=None, start=None, end=None, status=None):
+    """Yield the rows of an export one at a time, straight from the store"""
+    if dataset == 'attendance':
+        names = {emp['email']: emp['name'] for emp in repository.list_employees()}
+        rows = repository.iter_attendance(email=email, start=start, end=end, status=status)
+        try:
+            for record in rows:
+                yield {
+                    **record,
+                    'name': names.get(record['email'], record['email']),
+                    'breakMinutes': int(total_break_minutes(record)),
+                    'totalBreaks': len(record['breaks'])
+                }
+        finally:
+            rows.close()
+    else:
+        rows = repository.iter_leaderboard(email) if dataset == 'leaderboard' else repository.iter_employees(email)
+        try:
+            yield from rows
+        finally:
+            rows.close()
+
+@app.route('/api/admin/export/<dataset>')
+def export_data(dataset):
+    """Stream attendance, leaderboard or users as CSV or JSON Lines (admin only)
+    
+    Query parameters: format ('csv' by default or 'jsonl') and email; for
+    attendance also start and end (YYYY-MM-DD, inclusive) or date for a
+    single day, and status. Rows are read and sent one at a time.
+    """
+    if 'user' not in session or session['user']['role'] != 'admin':
+        return jsonify({'success': False, 'message': 'Unauthorized'})
+    
+    args = request.args
+    fmt = args.get('format', 'csv')
+    start = args.get('start') or args.get('date') or None
+    end = args.get('end') or args.get('date') or None
+    # A download client only sees the status, so bad requests are not 200s
+    if dataset not in EXPORT_FIELDS or fmt not in FORMATS:
+        return jsonify({'success': False, 'message': 'Unknown export'}), 400
+    invalid = invalid_day_arg(args)
+    if invalid:
+        return jsonify({'success': False, 'message': f'Invalid {invalid}: expected a YYYY-MM-DD date'}), 400
+    
+    rows = export_rows(dataset, email=args.get('email') or None, start=start, end=end,
+                       status=args.get('status') or None)
+    
+    def generate():
+        try:
+            yield from chunked(encode(fmt, EXPORT_FIELDS[dataset], rows))
+        except Exception as e:
+            # The status line is already sent; aborting the stream tells the client it is incomplete
+            print(f'{dataset.capitalize()} export error: {e}')
+            raise
+        finally:
+            rows.close()
+    
+    mimetype, extension = FORMATS[fmt]
+    return Response(generate(), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename={dataset}-export-{datetime.now().strftime("%Y-%m-%d")}.{extension}',
+        'X-Accel-Buffering': 'no'
+    })
 
 if __name__ == '__main__':
     # Initialize Excel file
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Storage Benchmark Suite
+Time the storage and scoring hot paths on generated data sets of growing size
+
+Usage:
+    python benchmark.py [--employees 10,100,1000,5000] [--months 1,12,36]
+                        [--backends excel,sqlite] [--repeat 3] [--seed 0]
+                        [--output results.json]
+                        [--compare baseline.json] [--tolerance 0.25]
+
+For every backend, employee count and month count a data set is generated
+(see generate_dataset.py) in a scratch directory and these are timed:
+write_excel_data, read_excel_data (cold), calculate_attendance_status over
+every record, leaderboard ranking for every employee and a full
+export_excel download. Results are written as JSON; with --compare, any
+median more than --tolerance slower than the baseline's is reported and the
+exit code is 1, so a CI job can fail on regressions.
+
+The largest sizes hold millions of records and take a long time and several
+GB of memory; pick smaller lists for quick runs.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from generate_dataset import generate_dataset
+from schedules import ScheduleRegistry
+from storage import create_repository
+
+EMPLOYEE_SIZES = (10, 100, 1000, 5000)
+MONTH_SIZES = (1, 12, 36)
+
+# Slowdowns smaller than this are treated as noise when comparing
+NOISE_FLOOR = 0.005
+
+def _sizes(value):
+    return [int(size) for size in value.split(',') if size]
+
+def _time(function, repeat, setup=None):
+    """Run function repeat times and return the wall-clock seconds of each run"""
+    runs = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        function()
+        runs.append(time.perf_counter() - started)
+    return runs
+
+def run_size(workholic, backend, employees, months, args, directory):
+    """Benchmark one backend on one generated data set; returns result dicts"""
+    data = generate_dataset(employees, months, args.seed)
+    repository = create_repository(backend, os.path.join(directory, 'workholic-data.xlsx'),
+                                   os.path.join(directory, 'workholic-journal.jsonl'),
+                                   os.path.join(directory, 'workholic.db'))
+
+    # Point the app's routes and helpers at this data set
+    workholic.repository = repository
+    workholic.schedule_registry = ScheduleRegistry(repository)
+    workholic.write_excel_data(data)
+
+    schedules = {employee['email']: employee['schedule'] for employee in data['employees']}
+    records = data['attendance']
+    emails = [entry['email'] for entry in data['leaderboard']]
+
+    def score_all():
+        for record in records:
+            workholic.attendance_status_for(record, schedules[record['email']])
+
+    def rank_all():
+        repository.leaderboard_top(8)
+        for email in emails:
+            repository.leaderboard_rank(email)
+
+    client = workholic.app.test_client()
+    with client.session_transaction() as session:
+        session['user'] = {'email': 'admin@workholic.in', 'name': 'Admin', 'role': 'admin', 'schedule': 'general'}
+
+    def export():
+        response = client.get('/api/admin/export-excel')
+        if not response.data.startswith(b'PK'):
+            raise RuntimeError('export_excel did not return a workbook')
+
+    cases = [
+        ('write_excel_data', lambda: workholic.write_excel_data(data), None, len(records)),
+        ('read_excel_data', workholic.read_excel_data, repository.invalidate, len(records)),
+        ('calculate_attendance_status', score_all, None, len(records)),
+        ('leaderboard_ranking', rank_all, None, len(emails)),
+        ('export_excel', export, None, len(records)),
+    ]
+
+    results = []
+    for name, function, setup, items in cases:
+        runs = _time(function, args.repeat, setup)
+        result = {
+            'benchmark': name,
+            'backend': backend,
+            'employees': employees,
+            'months': months,
+            'records': len(records),
+            'items': items,
+            'runs': runs,
+            'min': min(runs),
+            'median': statistics.median(runs),
+            'max': max(runs)
+        }
+        results.append(result)
+        print(f"{backend:7} {employees:>5} x {months:<3} {name:28} "
+              f"median {result['median']:9.4f}s  ({result['median'] / max(items, 1) * 1e6:.1f} µs/item)")
+        sys.stdout.flush()
+    return results
+
+def compare(results, baseline, tolerance):
+    """Return the results whose median regressed against a baseline run"""
+    previous = {(item['benchmark'], item['backend'], item['employees'], item['months']): item
+                for item in baseline['results']}
+    regressions = []
+    for result in results:
+        before = previous.get((result['benchmark'], result['backend'], result['employees'], result['months']))
+        if not before:
+            continue
+        slowdown = result['median'] - before['median']
+        if slowdown > NOISE_FLOOR and result['median'] > before['median'] * (1 + tolerance):
+            regressions.append({**result, 'baseline': before['median']})
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='WorkoHolic storage benchmarks')
+    parser.add_argument('--employees', type=_sizes, default=list(EMPLOYEE_SIZES))
+    parser.add_argument('--months', type=_sizes, default=list(MONTH_SIZES))
+    parser.add_argument('--backends', type=lambda value: value.split(','), default=['excel', 'sqlite'])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='benchmark-results.json')
+    parser.add_argument('--compare')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    baseline_path = os.path.abspath(args.compare) if args.compare else None
+
+    # app creates its store relative to the working directory; keep it in scratch space
+    scratch = tempfile.mkdtemp(prefix='workholic-bench-')
+    os.chdir(scratch)
+    import app as workholic
+
+    results = []
+    try:
+        for backend in args.backends:
+            for employees in args.employees:
+                for months in args.months:
+                    directory = os.path.join(scratch, f'{backend}-{employees}x{months}')
+                    os.makedirs(directory)
+                    results.extend(run_size(workholic, backend, employees, months, args, directory))
+                    shutil.rmtree(directory, ignore_errors=True)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    report = {
+        'generated': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': args.seed,
+        'repeat': args.repeat,
+        'results': results
+    }
+    with open(output, 'w', encoding='utf-8') as results_file:
+        json.dump(report, results_file, indent=2)
+    print(f"\n✅ Results written to {output}")
+
+    if baseline_path:
+        with open(baseline_path, encoding='utf-8') as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance)
+        for item in regressions:
+            print(f"❌ {item['benchmark']} ({item['backend']}, {item['employees']} x {item['months']}): "
+                  f"{item['median']:.4f}s vs {item['baseline']:.4f}s")
+        if regressions:
+            return 1
+        print(f"✅ No regressions beyond {args.tolerance:.0%} against {baseline_path}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+End-of-Day Close-Out Script
+Mark absences and clock out open shifts for one or more days
+
+Usage:
+    python close_out.py                 # today
+    python close_out.py 2025-03-14 ...  # specific dates
+
+Run it as a daily scheduled task shortly before midnight. Re-running it for
+a day that was already closed out changes nothing.
+"""
+
+import sys
+from datetime import datetime
+from app import close_out_day
+
+def main():
+    try:
+        days = [datetime.strptime(arg, '%Y-%m-%d').date() for arg in sys.argv[1:]] or [datetime.now().date()]
+    except ValueError:
+        print(__doc__)
+        return 1
+
+    for day in days:
+        summary = close_out_day(day)
+        print(f"✅ Closed out {summary['date']}: {len(summary['absent'])} absent, "
+              f"{len(summary['closed'])} open shift(s) clocked out")
+        for email in summary['absent']:
+            print(f"   absent: {email}")
+        for email in summary['closed']:
+            print(f"   clocked out: {email}")
+        for email in summary['pending']:
+            print(f"   shift not over yet: {email}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+"""
+Columnar attendance for WorkoHolic
+Archived attendance is held as parallel arrays instead of one dict per
+record; a record is only turned back into a dict when a query returns it
+"""
+
+import bisect
+import copy
+from array import array
+from datetime import date
+
+from timestamps import from_epoch, to_epoch
+
+# Timestamps are microseconds since the epoch; this marks None
+MISSING = -2 ** 63
+
+def encode_time(value):
+    return MISSING if value is None else to_epoch(value)
+
+def decode_time(value):
+    return None if value == MISSING else from_epoch(value)
+
+class AttendanceColumns:
+    """Immutable attendance records stored column by column
+
+    Rows are sorted by (date, email). Emails and statuses are interned into
+    small tables and referenced by id, dates are day ordinals, and clock
+    and break times are integers; the breaks of row i are pairs
+    break_offset[i]:break_offset[i + 1] of the shared break_times buffer.
+    Records whose values would not come back exactly as they went in (say
+    a break with extra fields) are kept as they are in `exceptions` and
+    returned from there; their key and status columns are still filled.
+    """
+
+    def __init__(self, records):
+        unique = {}
+        for record in records:
+            unique.setdefault((record['date'], record['email']), record)
+        ordered = [unique[key] for key in sorted(unique)]
+
+        self.emails = sorted({record['email'] for record in ordered})
+        self._email_ids = {email: i for i, email in enumerate(self.emails)}
+        self.statuses = []
+        self._status_ids = {}
+
+        self.email_id = array('I')
+        self.day = array('i')
+        self.status = array('H')
+        self.clock_in = array('q')
+        self.clock_out = array('q')
+        self.break_offset = array('I', [0])
+        self.break_times = array('q')
+        self.exceptions = {}
+
+        for row, record in enumerate(ordered):
+            self.email_id.append(self._email_ids[record['email']])
+            self.day.append(date.fromisoformat(record['date']).toordinal())
+            self.status.append(self._status_id(record['status']))
+            try:
+                self._append_times(record)
+                exact = self.record(row) == record
+            except (TypeError, ValueError, KeyError, AttributeError):
+                exact = False
+            if not exact:
+                self._truncate_times(row)
+                self.clock_in.append(MISSING)
+                self.clock_out.append(MISSING)
+                self.break_offset.append(self.break_offset[row])
+                self.exceptions[row] = record
+
+        self.rows_by_email = {}
+        for row, email_id in enumerate(self.email_id):
+            self.rows_by_email.setdefault(email_id, array('I')).append(row)
+
+    def _status_id(self, status):
+        if status not in self._status_ids:
+            self._status_ids[status] = len(self.statuses)
+            self.statuses.append(status)
+        return self._status_ids[status]
+
+    def _append_times(self, record):
+        clock_in = encode_time(record['clockIn'])
+        clock_out = encode_time(record['clockOut'])
+        times = []
+        for brk in record['breaks']:
+            times.append(encode_time(brk['start']))
+            times.append(encode_time(brk['end']))
+        self.clock_in.append(clock_in)
+        self.clock_out.append(clock_out)
+        self.break_times.extend(times)
+        self.break_offset.append(len(self.break_times))
+
+    def _truncate_times(self, row):
+        """Drop whatever _append_times managed to add for a row"""
+        del self.clock_in[row:]
+        del self.clock_out[row:]
+        del self.break_offset[row + 1:]
+        del self.break_times[self.break_offset[row]:]
+
+    def __len__(self):
+        return len(self.day)
+
+    def key(self, row):
+        """The (date, email) key of a row"""
+        return date.fromordinal(self.day[row]).isoformat(), self.emails[self.email_id[row]]
+
+    def record(self, row, breaks=True):
+        """Materialize one row as a fresh attendance dict, without 'breaks' if breaks is False"""
+        if row in self.exceptions:
+            record = copy.deepcopy(self.exceptions[row])
+            if not breaks:
+                record.pop('breaks', None)
+            return record
+
+        day, email = self.key(row)
+        record = {
+            'email': email,
+            'date': day,
+            'clockIn': decode_time(self.clock_in[row]),
+            'clockOut': decode_time(self.clock_out[row]),
+            'status': self.statuses[self.status[row]]
+        }
+        if breaks:
+            times = self.break_times[self.break_offset[row]:self.break_offset[row + 1]]
+            record['breaks'] = [{'start': decode_time(times[i]), 'end': decode_time(times[i + 1])}
+                                for i in range(0, len(times), 2)]
+        return record
+
+    def records(self):
+        return [self.record(row) for row in range(len(self))]
+
+    def find(self, email, day):
+        """Return the row of (email, day), or None"""
+        rows = self.rows_by_email.get(self._email_ids.get(email))
+        if rows is None:
+            return None
+        ordinal = date.fromisoformat(day).toordinal()
+        i = bisect.bisect_left(rows, ordinal, key=self.day.__getitem__)
+        return rows[i] if i < len(rows) and self.day[rows[i]] == ordinal else None
+
+    def _sort_key(self, row):
+        return self.day[row], self.emails[self.email_id[row]]
+
+    def rows(self, email=None, start=None, end=None, after=None, descending=False, status=None):
+        """Yield row numbers matching a query in (date, email) order
+
+        Same arguments as Repository.iter_attendance; the status filter is
+        applied to the status column, so skipped rows are never built.
+        """
+        if email is not None:
+            rows = self.rows_by_email.get(self._email_ids.get(email), ())
+        else:
+            rows = range(len(self))
+        if status is not None and status not in self._status_ids:
+            return
+
+        lo = bisect.bisect_left(rows, date.fromisoformat(start).toordinal(), key=self.day.__getitem__) if start else 0
+        hi = bisect.bisect_right(rows, date.fromisoformat(end).toordinal(), key=self.day.__getitem__) if end else len(rows)
+        if after is not None:
+            after_key = (date.fromisoformat(after[0]).toordinal(), after[1])
+            if descending:
+                hi = min(hi, bisect.bisect_left(rows, after_key, key=self._sort_key))
+            else:
+                lo = max(lo, bisect.bisect_right(rows, after_key, key=self._sort_key))
+
+        status_id = self._status_ids.get(status)
+        for i in range(hi - 1, lo - 1, -1) if descending else range(lo, hi):
+            row = rows[i]
+            if status_id is None or self.status[row] == status_id:
+                yield row
@@ -0,0 +1,63 @@
+"""
+Event broker for the WorkoHolic live dashboards
+Routes publish committed changes here and /api/events fans them out to
+every connected Server-Sent Events client in this process
+"""
+
+import json
+import queue
+import threading
+from timestamps import json_default
+
+class EventBroker:
+    """In-process publish/subscribe hub with one bounded queue per client"""
+
+    def __init__(self, max_queued=64):
+        self.max_queued = max_queued
+        self._lock = threading.Lock()
+        self._subscribers = set()
+
+    def subscribe(self):
+        """Register a client and return the queue its events arrive on"""
+        subscriber = queue.Queue(maxsize=self.max_queued)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        """Forget a client once its stream has closed"""
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def subscriber_count(self):
+        """Number of clients currently connected"""
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, event, data, audience=None):
+        """Queue an event for every client
+
+        audience limits delivery to one employee's email (admins still see
+        it). A client that has fallen too far behind loses its backlog and
+        gets a single 'sync' event telling it to re-fetch instead.
+        """
+        with self._lock:
+            subscribers = list(self._subscribers)
+
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait((event, data, audience))
+            except queue.Full:
+                try:
+                    while True:
+                        subscriber.get_nowait()
+                except queue.Empty:
+                    pass
+                try:
+                    subscriber.put_nowait(('sync', {}, None))
+                except queue.Full:
+                    pass
+
+def format_event(event, data):
+    """Serialize one event in the text/event-stream wire format"""
+    return f'event: {event}\ndata: {json.dumps(data, default=json_default)}\n\n'
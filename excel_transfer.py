@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Excel Import/Export Script
+Copy all data between a WorkoHolic workbook and the active storage backend
+
+Usage:
+    python excel_transfer.py import [workbook.xlsx]
+    python excel_transfer.py export [workbook.xlsx]
+"""
+
+import sys
+from app import repository, EXCEL_FILE, STORAGE_BACKEND
+from storage import read_workbook, write_workbook
+
+def import_workbook(path):
+    """Replace the active store's data with the contents of a workbook"""
+    data = read_workbook(path)
+    if not repository.save(data):
+        print(f"❌ Failed to import {path}")
+        return False
+
+    print(f"✅ Imported {path} into the {STORAGE_BACKEND} store")
+    print(f"   {len(data['employees'])} users, {len(data['attendance'])} attendance records, "
+          f"{len(data['leaderboard'])} leaderboard entries")
+    return True
+
+def export_workbook(path):
+    """Write everything in the active store to a workbook"""
+    data = repository.load()
+    write_workbook(data, path)
+
+    print(f"✅ Exported the {STORAGE_BACKEND} store to {path}")
+    print(f"   {len(data['employees'])} users, {len(data['attendance'])} attendance records, "
+          f"{len(data['leaderboard'])} leaderboard entries")
+    return True
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ('import', 'export'):
+        print(__doc__)
+        return 1
+
+    path = sys.argv[2] if len(sys.argv) > 2 else EXCEL_FILE
+    if sys.argv[1] == 'import':
+        return 0 if import_workbook(path) else 1
+    return 0 if export_workbook(path) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
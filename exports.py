@@ -0,0 +1,204 @@
+"""
+Streaming exports for WorkoHolic
+Rows are encoded as CSV, JSON Lines or .xlsx one at a time and handed to
+the response in small chunks, so an extract of any size is sent in
+constant memory and its first bytes go out before the last row has been
+read.
+"""
+
+import csv
+import io
+import json
+import re
+import zipfile
+from datetime import datetime
+from xml.sax.saxutils import escape
+
+from timestamps import format_timestamp, json_default
+
+# Output formats: name -> (mimetype, file extension)
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+}
+
+def _csv_value(value):
+    return format_timestamp(value) if isinstance(value, datetime) else value
+
+def csv_lines(fields, rows):
+    """Yield a header line and then one CSV line per row dict"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    yield buffer.getvalue()
+    for row in rows:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow([_csv_value(row.get(field)) for field in fields])
+        yield buffer.getvalue()
+
+def json_lines(fields, rows):
+    """Yield one JSON object per row dict, with the given fields in order"""
+    for row in rows:
+        yield json.dumps({field: row.get(field) for field in fields}, default=json_default) + '\n'
+
+def encode(fmt, fields, rows):
+    """Yield rows in the given format (a key of FORMATS)"""
+    return csv_lines(fields, rows) if fmt == 'csv' else json_lines(fields, rows)
+
+def chunked(lines, chunk_size=64 * 1024):
+    """Join encoded lines into UTF-8 chunks of about chunk_size bytes
+
+    The first line (a CSV header or the first record) is sent on its own
+    so the client sees the download start straight away.
+    """
+    buffer = []
+    size = 0
+    first = True
+    for line in lines:
+        data = line.encode('utf-8')
+        if first:
+            first = False
+            yield data
+            continue
+        buffer.append(data)
+        size += len(data)
+        if size >= chunk_size:
+            yield b''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+# The fixed parts of a one-sheet .xlsx; only the sheet itself is streamed
+_XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '<Relationship Id="rId2" Target="styles.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles"/>'
+        '</Relationships>'),
+    # Cell styles: 0 plain, 1 bold on grey (headers), 2 date and time
+    'xl/styles.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<numFmts count="1"><numFmt numFmtId="164" formatCode="yyyy-mm-dd h:mm:ss"/></numFmts>'
+        '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+        '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="3"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill>'
+        '<fill><patternFill patternType="solid"><fgColor rgb="FFE0E0E0"/><bgColor rgb="FFE0E0E0"/></patternFill></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="3"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="0" fontId="1" fillId="2" borderId="0" xfId="0" applyFont="1" applyFill="1"/>'
+        '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'),
+}
+
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{}" sheetId="1" r:id="rId1"/></sheets></workbook>')
+
+_SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+_SHEET_END = '</sheetData></worksheet>'
+
+# Characters XML 1.0 cannot hold at all
+_ILLEGAL_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+_EXCEL_EPOCH = datetime(1899, 12, 30)
+
+def _column(index):
+    """0 -> 'A', 26 -> 'AA'"""
+    letters = ''
+    index += 1
+    while index:
+        index, rest = divmod(index - 1, 26)
+        letters = chr(65 + rest) + letters
+    return letters
+
+def _xlsx_cell(ref, value, style=0):
+    style_attr = f' s="{style}"' if style else ''
+    if isinstance(value, datetime):
+        days = (value - _EXCEL_EPOCH).total_seconds() / 86400
+        return f'<c r="{ref}" s="2"><v>{days!r}</v></c>'
+    if isinstance(value, bool):
+        return f'<c r="{ref}" t="b"{style_attr}><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c r="{ref}"{style_attr}><v>{value!r}</v></c>'
+    text = escape(_ILLEGAL_XML.sub('', str(value)))
+    return f'<c r="{ref}" t="inlineStr"{style_attr}><is><t xml:space="preserve">{text}</t></is></c>'
+
+def _xlsx_row(number, values, style=0):
+    cells = ''.join(_xlsx_cell(f'{_column(i)}{number}', value, style)
+                    for i, value in enumerate(values) if value is not None)
+    return f'<row r="{number}">{cells}</row>'
+
+class _Pipe(io.RawIOBase):
+    """Write-only stream that collects what zipfile writes until it is drained
+
+    It cannot seek or tell, so zipfile writes each entry's sizes after its
+    data instead of going back to patch the header.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.buffer += data
+        return len(data)
+
+    def drain(self):
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+def xlsx_chunks(title, headers, rows, chunk_size=64 * 1024):
+    """Yield a one-sheet .xlsx with a styled header row, encoding rows as they are read
+
+    rows yields lists of values: str, numbers or datetimes (written as
+    date/time cells); None leaves the cell empty.
+    """
+    pipe = _Pipe()
+    with zipfile.ZipFile(pipe, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in _XLSX_PARTS.items():
+            archive.writestr(name, content)
+        archive.writestr('xl/workbook.xml', _WORKBOOK.format(escape(title, {'"': '&quot;'})))
+        with archive.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+            sheet.write((_SHEET_START + _xlsx_row(1, headers, style=1)).encode('utf-8'))
+            yield pipe.drain()
+            for number, values in enumerate(rows, start=2):
+                sheet.write(_xlsx_row(number, values).encode('utf-8'))
+                if len(pipe.buffer) >= chunk_size:
+                    yield pipe.drain()
+            sheet.write(_SHEET_END.encode('utf-8'))
+    yield pipe.drain()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Synthetic Dataset Generator
+Build a realistic WorkoHolic workbook of any size for testing and benchmarks
+
+Usage:
+    python generate_dataset.py EMPLOYEES MONTHS [output.xlsx] [--seed N]
+
+Employees get one of the built-in schedules and an attendance record for
+every working day of the last MONTHS months (late arrivals, early leavers,
+absences and one to three breaks a day), plus occasional task awards.
+Points are recorded in the ledger and the leaderboard is derived from it,
+so the generated store verifies cleanly. The same seed gives the same data.
+"""
+
+import random
+import sys
+from datetime import date, datetime, timedelta
+from ledger import TASK_FIELDS, attendance_entry, rebuild_leaderboard, task_entry
+from schedules import DEFAULT_SCHEDULES, CompiledSchedule
+from storage import write_workbook
+
+ADMIN_USER = {
+    'email': 'admin@workholic.in',
+    'password': 'admin123',
+    'name': 'Admin',
+    'role': 'admin',
+    'schedule': 'general'
+}
+
+# Share of working days with each outcome; the rest are ordinary full days
+ABSENT_RATE = 0.04
+LATE_RATE = 0.06
+EARLY_LEAVE_RATE = 0.08
+TASK_RATE = 0.1
+
+def _status(clock_in, clock_out, rule, break_minutes):
+    """Same thresholds as calculate_attendance_status in app.py"""
+    late_by = clock_in.hour * 60 + clock_in.minute + clock_in.second / 60 - rule.start
+    worked = (clock_out - clock_in).total_seconds() / 60 - break_minutes
+    if late_by > 15 or worked < (rule.end - rule.start - rule.break_duration) * 0.8:
+        return 'HD'
+    return 'FD'
+
+def _attendance_record(rng, email, day, rule):
+    record = {'email': email, 'date': day.isoformat(), 'clockIn': None, 'clockOut': None,
+              'breaks': [], 'status': 'A'}
+    outcome = rng.random()
+    if outcome < ABSENT_RATE:
+        return record
+
+    midnight = datetime.combine(day, datetime.min.time())
+    arrival = rule.start + rng.uniform(20, 90) if outcome < ABSENT_RATE + LATE_RATE else rule.start + rng.gauss(0, 6)
+    if outcome > 1 - EARLY_LEAVE_RATE:
+        departure = arrival + (rule.end - rule.start) * rng.uniform(0.4, 0.75)
+    else:
+        departure = max(arrival + 30, rule.end + rng.gauss(10, 10))
+    # Whole seconds, so the stores keep the times exactly
+    clock_in = (midnight + timedelta(minutes=arrival, seconds=rng.randrange(60))).replace(microsecond=0)
+    clock_out = (midnight + timedelta(minutes=departure, seconds=rng.randrange(60))).replace(microsecond=0)
+
+    # Split the allowed break time into one to three breaks spread over the shift
+    break_minutes = 0
+    count = rng.randint(1, 3)
+    span = (clock_out - clock_in).total_seconds() / 60
+    for n in range(count):
+        length = max(5, rule.break_duration / count + rng.gauss(0, 3))
+        start = (clock_in + timedelta(minutes=span * (n + 1) / (count + 1))).replace(microsecond=0)
+        end = (start + timedelta(minutes=length)).replace(microsecond=0)
+        if end >= clock_out:
+            break
+        record['breaks'].append({'start': start, 'end': end})
+        break_minutes += (end - start).total_seconds() / 60
+
+    record['clockIn'] = clock_in
+    record['clockOut'] = clock_out
+    record['status'] = _status(clock_in, clock_out, rule, break_minutes)
+    return record
+
+def generate_dataset(employees, months, seed=0, end=None):
+    """Return a full data set with the given number of employees and months
+
+    Records run up to end (default yesterday) in (date, email) order, the
+    order the stores keep them in.
+    """
+    rng = random.Random(seed)
+    end = end or date.today() - timedelta(days=1)
+    start = end - timedelta(days=round(months * 30.44) - 1)
+
+    compiled = {name: CompiledSchedule(definition) for name, definition in DEFAULT_SCHEDULES.items()}
+    users = [{
+        'email': f'employee{n:05d}@workholic.in',
+        'password': 'password',
+        'name': f'Employee {n}',
+        'role': 'employee',
+        'schedule': rng.choice(list(DEFAULT_SCHEDULES))
+    } for n in range(1, employees + 1)]
+
+    attendance = []
+    ledger = []
+    task_types = list(TASK_FIELDS)
+    for offset in range((end - start).days + 1):
+        day = start + timedelta(days=offset)
+        for user in users:
+            rule = compiled[user['schedule']].rule_for(day)
+            if not rule.working:
+                continue
+
+            record = _attendance_record(rng, user['email'], day, rule)
+            attendance.append(record)
+            ledger.append(dict(attendance_entry(user['email'], record['date'], record['status']),
+                               ts=record['clockOut'].isoformat() if record['clockOut'] else f"{record['date']}T23:55:00"))
+
+            if rng.random() < TASK_RATE:
+                award = task_entry(user['email'], rng.choice(task_types), rng.randint(1, 3))
+                ledger.append(dict(award, id=f'task:{seed}-{len(ledger)}', date=record['date'],
+                                   ts=f"{record['date']}T18:00:00"))
+
+    names = {user['email']: user['name'] for user in users}
+    return {
+        'employees': [dict(ADMIN_USER)] + users,
+        'attendance': attendance,
+        'leaderboard': list(rebuild_leaderboard(ledger, names).values()),
+        'schedules': [{'name': name, 'definition': definition} for name, definition in DEFAULT_SCHEDULES.items()],
+        'ledger': ledger
+    }
+
+def main():
+    args = sys.argv[1:]
+    seed = '0'
+    if '--seed' in args:
+        position = args.index('--seed')
+        seed = args[position + 1] if position + 1 < len(args) else ''
+        del args[position:position + 2]
+
+    if (len(args) not in (2, 3) or not args[0].isdigit() or not args[1].isdigit()
+            or not seed.isdigit()):
+        print(__doc__)
+        return 1
+
+    path = args[2] if len(args) == 3 else f'workholic-{args[0]}x{args[1]}.xlsx'
+    data = generate_dataset(int(args[0]), int(args[1]), int(seed))
+    write_workbook(data, path)
+
+    print(f"✅ Generated {path}")
+    print(f"   {len(data['employees'])} users, {len(data['attendance'])} attendance records, "
+          f"{len(data['ledger'])} ledger entries")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
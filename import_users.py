@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Bulk User Import Script
+Create or update users from a CSV or XLSX roster in a single write
+
+Usage:
+    python import_users.py roster.csv [--update] [--dry-run]
+
+The roster needs an Email column; Name, Role (employee/admin), Schedule and
+Password are optional. Existing users are reported as conflicts unless
+--update is given. Nothing is written if any row fails validation.
+"""
+
+import sys
+from app import repository, schedule_registry
+from roster import read_roster, plan_import
+
+def import_users(path, update_existing=False, dry_run=False):
+    """Validate a roster and store its users, returning True on success"""
+    try:
+        with open(path, 'rb') as roster:
+            rows = read_roster(roster, path)
+    except Exception as e:
+        print(f"❌ Could not read {path}: {e}")
+        return False
+
+    with repository.transaction():
+        users, results = plan_import(rows, repository, schedule_registry.names(), update_existing)
+        errors = [result for result in results if result['action'] == 'error']
+
+        if errors:
+            for result in errors:
+                print(f"❌ Row {result['row']} ({result['email'] or 'no email'}): {result['message']}")
+            print(f"\n{len(errors)} row(s) failed validation; nothing was imported")
+            return False
+
+        if users and not dry_run and not repository.put_employees(users):
+            print("❌ Failed to save users")
+            return False
+
+    created = sum(1 for result in results if result['action'] == 'create')
+    updated = sum(1 for result in results if result['action'] == 'update')
+    prefix = "Would import" if dry_run else "✅ Imported"
+    print(f"{prefix} {path}: {created} created, {updated} updated")
+    return True
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    if len(args) != 1:
+        print(__doc__)
+        return 1
+
+    ok = import_users(args[0], '--update' in sys.argv, '--dry-run' in sys.argv)
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
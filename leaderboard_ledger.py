@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Points Ledger Script
+Check the leaderboard against the points ledger, or rebuild it from there
+
+Usage:
+    python leaderboard_ledger.py verify    # report counters that differ
+    python leaderboard_ledger.py rebuild   # replace them with the ledger's
+
+Run rebuild after changing a scoring rule in ledger.py to rescore everyone.
+"""
+
+import sys
+from app import rebuild_from_ledger
+
+def main():
+    if len(sys.argv) != 2 or sys.argv[1] not in ('verify', 'rebuild'):
+        print(__doc__)
+        return 1
+
+    rebuild = sys.argv[1] == 'rebuild'
+    mismatches = rebuild_from_ledger(apply=rebuild)
+
+    for mismatch in mismatches:
+        print(f"   {mismatch['email']} {mismatch['field']}: "
+              f"ledger {mismatch['expected']}, leaderboard {mismatch['actual']}")
+
+    if not mismatches:
+        print("✅ Leaderboard matches the points ledger")
+        return 0
+    if rebuild:
+        print(f"✅ Rebuilt the leaderboard from the ledger ({len(mismatches)} counter(s) corrected)")
+        return 0
+    print(f"❌ {len(mismatches)} counter(s) differ from the ledger; run 'rebuild' to correct them")
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""
+Points ledger for WorkoHolic
+Every point-affecting event (an attendance status, a task award) is stored
+as a ledger entry. Leaderboard entries are a view over the ledger: live
+counters are updated with the same apply_entry() the rebuild uses, so a
+rebuild can always be checked against them.
+"""
+
+import uuid
+from datetime import datetime
+
+# Scoring rules
+ATTENDANCE_POINTS = {'FD': 2, 'HD': 1, 'A': -1}
+TASK_FIELDS = {'small': 'smallTasks', 'regular': 'regularTasks', 'big': 'bigTasks'}
+TASK_POINTS = {'smallTasks': 1, 'regularTasks': 2, 'bigTasks': 3}
+COUNTERS = ('attendancePoints', 'smallTasks', 'regularTasks', 'bigTasks')
+
+def _entry(entry_id, email, kind, detail, count, day=None):
+    return {
+        'id': entry_id,
+        'email': email,
+        'kind': kind,
+        'detail': detail,
+        'count': count,
+        'date': day or datetime.now().strftime('%Y-%m-%d'),
+        'ts': datetime.now().isoformat()
+    }
+
+def attendance_entry(email, day, status):
+    """Ledger entry scoring one attendance day
+
+    The id is derived from (email, date), so scoring a day again replaces the
+    earlier entry instead of adding a second one.
+    """
+    return _entry(f'attendance:{email}:{day}', email, 'attendance', status, 1, day)
+
+def task_entry(email, task_type, count):
+    """Ledger entry for one task award"""
+    return _entry(f'task:{uuid.uuid4().hex}', email, 'task', task_type, count)
+
+def opening_entry(email, counter, value):
+    """Ledger entry carrying a counter's value from before the ledger existed"""
+    return _entry(f'opening:{email}:{counter}', email, 'opening', counter, value)
+
+def new_leaderboard_entry(email, name):
+    return {
+        'email': email,
+        'name': name,
+        'totalPoints': 0,
+        'attendancePoints': 0,
+        'smallTasks': 0,
+        'regularTasks': 0,
+        'bigTasks': 0
+    }
+
+def total_points(board_entry):
+    return board_entry.get('attendancePoints', 0) + sum(
+        board_entry.get(counter, 0) * points for counter, points in TASK_POINTS.items())
+
+def apply_entry(board_entry, ledger_entry, reverse=False):
+    """Apply one ledger entry to a leaderboard entry in place
+
+    reverse=True takes an attendance entry back out, for re-scoring a day.
+    Task awards are applied in ledger order and clamp each count at zero,
+    exactly as update-tasks always has.
+    """
+    kind = ledger_entry['kind']
+    detail = ledger_entry['detail']
+
+    if kind == 'attendance':
+        points = ATTENDANCE_POINTS.get(detail, 0)
+        board_entry['attendancePoints'] = board_entry.get('attendancePoints', 0) + (-points if reverse else points)
+    elif kind == 'task' and detail in TASK_FIELDS:
+        field = TASK_FIELDS[detail]
+        board_entry[field] = max(0, board_entry.get(field, 0) + ledger_entry['count'])
+    elif kind == 'opening' and detail in COUNTERS:
+        board_entry[detail] = board_entry.get(detail, 0) + ledger_entry['count']
+
+    board_entry['totalPoints'] = total_points(board_entry)
+    return board_entry
+
+def rebuild_leaderboard(ledger_entries, names):
+    """Recompute every leaderboard entry from the ledger in one pass
+
+    ledger_entries is consumed as a stream in ledger order; names maps email
+    to display name. Returns a dict of email -> leaderboard entry.
+    """
+    board = {}
+    for ledger_entry in ledger_entries:
+        email = ledger_entry['email']
+        if email not in board:
+            board[email] = new_leaderboard_entry(email, names.get(email, email))
+        apply_entry(board[email], ledger_entry)
+    return board
+
+def verify_leaderboard(rebuilt, live_entries):
+    """Compare rebuilt entries with the live counters
+
+    Returns a list of {'email', 'field', 'expected', 'actual'} mismatches;
+    an empty list means the live leaderboard matches the ledger.
+    """
+    mismatches = []
+    live = {entry['email']: entry for entry in live_entries}
+    for email in sorted(set(rebuilt) | set(live)):
+        expected = rebuilt.get(email) or new_leaderboard_entry(email, '')
+        actual = live.get(email) or new_leaderboard_entry(email, '')
+        for field in COUNTERS + ('totalPoints',):
+            if (expected.get(field) or 0) != (actual.get(field) or 0):
+                mismatches.append({'email': email, 'field': field,
+                                   'expected': expected.get(field) or 0, 'actual': actual.get(field) or 0})
+    return mismatches
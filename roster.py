@@ -0,0 +1,110 @@
+"""
+Roster import for WorkoHolic
+Parse a CSV or XLSX list of users and validate it against the employee
+store so a whole department can be onboarded in one write
+"""
+
+import csv
+import io
+import re
+import openpyxl
+
+ROSTER_COLUMNS = ('email', 'name', 'role', 'schedule', 'password')
+ROLES = ('employee', 'admin')
+
+# One '@' between a non-empty name and domain, no whitespace
+EMAIL = re.compile(r'[^@\s]+@[^@\s]+')
+
+def _cell(value):
+    """Normalise a roster cell to a stripped string ('' for blanks)"""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+def _rows_from_table(rows):
+    """Yield (row number, dict) pairs from a header row followed by data rows"""
+    rows = iter(rows)
+    header = next(rows, None)
+    if header is None:
+        raise ValueError('Roster is empty')
+
+    columns = [_cell(name).lower() for name in header]
+    if 'email' not in columns:
+        raise ValueError('Roster needs an Email column')
+
+    for number, row in enumerate(rows, 2):
+        values = {column: _cell(value) for column, value in zip(columns, row) if column in ROSTER_COLUMNS}
+        if any(values.values()):
+            yield number, values
+
+def read_roster(stream, filename):
+    """Read roster rows from a CSV or XLSX file object
+
+    The first row holds the column names (Email, Name, Role, Schedule,
+    Password; case-insensitive, extra columns ignored). For workbooks the
+    Employees sheet is used if present, so a WorkoHolic export works as is.
+    """
+    if filename.lower().endswith('.xlsx'):
+        workbook = openpyxl.load_workbook(io.BytesIO(stream.read()), read_only=True, data_only=True)
+        try:
+            sheet = workbook['Employees'] if 'Employees' in workbook.sheetnames else workbook.worksheets[0]
+            return list(_rows_from_table(sheet.iter_rows(values_only=True)))
+        finally:
+            workbook.close()
+
+    if filename.lower().endswith('.csv'):
+        text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+        return list(_rows_from_table(csv.reader(text)))
+
+    raise ValueError('Roster must be a .csv or .xlsx file')
+
+def plan_import(rows, repository, schedules, update_existing=False):
+    """Validate roster rows and work out the employee records to write
+
+    Returns (users, results): users are the records to store and results has
+    one entry per row with its action ('create', 'update' or 'error').
+    Existing employees are conflicts unless update_existing is set, in which
+    case the columns filled in for them are replaced.
+    """
+    users = []
+    results = []
+    seen = {}
+
+    for number, row in rows:
+        email = row.get('email', '')
+        result = {'row': number, 'email': email, 'action': 'error'}
+        results.append(result)
+
+        if not EMAIL.fullmatch(email):
+            result['message'] = 'Invalid email'
+            continue
+        if email in seen:
+            result['message'] = f'Duplicate of row {seen[email]}'
+            continue
+        seen[email] = number
+
+        existing = repository.get_employee(email)
+        if existing and not update_existing:
+            result['message'] = 'User already exists'
+            continue
+
+        if row.get('role') and row['role'] not in ROLES:
+            result['message'] = f"Unknown role: {row['role']}"
+            continue
+        if row.get('schedule') and row['schedule'] not in schedules:
+            result['message'] = f"Unknown schedule: {row['schedule']}"
+            continue
+
+        # Blank cells keep an existing user's values, or take the defaults
+        user = existing or {'email': email, 'name': '', 'role': 'employee',
+                            'schedule': 'general', 'password': None}
+        for column in ('name', 'role', 'schedule', 'password'):
+            if row.get(column):
+                user[column] = row[column]
+
+        result['action'] = 'update' if existing else 'create'
+        users.append(user)
+
+    return users, results
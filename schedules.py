@@ -0,0 +1,188 @@
+"""
+Work schedules for WorkoHolic
+Schedule definitions are stored data; each one is compiled into per-year
+lookup tables so the rule for any date is a single list index
+"""
+
+import json
+import re
+import threading
+from collections import namedtuple
+from datetime import date
+
+DAY_NAMES = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+
+# Built-in schedules, stored into the registry on first start
+DEFAULT_SCHEDULES = {
+    'general': {
+        'weekdays': {'start': '10:30', 'end': '19:00', 'breakDuration': 60},
+        'saturday': {'start': '10:00', 'end': '13:00', 'breakDuration': 15},
+        'workingSaturdays': [1, 3]
+    },
+    'shreyas': {
+        'weekdays': {'start': '16:30', 'end': '19:00', 'breakDuration': 15},
+        'friday': {'start': '12:00', 'end': '18:00', 'breakDuration': 45},
+        'weekend': 'off'
+    },
+    'srushti': {
+        'weekdays': {'start': '10:30', 'end': '16:30', 'breakDuration': 45},
+        'saturday': {'start': '10:00', 'end': '13:00', 'breakDuration': 15},
+        'workingSaturdays': [1, 3]
+    },
+    'vinay': {
+        'weekdays': {'start': '10:30', 'end': '21:00', 'breakDuration': 60},
+        'saturday': {'start': '10:00', 'end': '13:00', 'breakDuration': 15},
+        'workingSaturdays': [1, 3]
+    }
+}
+
+# Expected hours for one date. start and end are minutes after midnight.
+# Days off keep the weekday hours as a reference but have working=False.
+DayRule = namedtuple('DayRule', 'working start end break_duration')
+
+_TIME = re.compile(r'([01]\d|2[0-3]):([0-5]\d)')
+
+def _minutes(value):
+    """'HH:MM' -> minutes after midnight"""
+    match = _TIME.fullmatch(value) if isinstance(value, str) else None
+    if match is None:
+        raise ValueError(f'{value!r} is not a time of day in HH:MM format (00:00 to 23:59)')
+    return int(match.group(1)) * 60 + int(match.group(2))
+
+def _format_minutes(value):
+    return f'{value // 60:02d}:{value % 60:02d}'
+
+def _compile_hours(hours, day_name='weekdays'):
+    """Working hours of one day -> DayRule; errors name the day"""
+    if not isinstance(hours, dict) or 'start' not in hours or 'end' not in hours:
+        raise ValueError(f"{day_name}: working hours need start, end and breakDuration"
+                         + (' (weekdays is required)' if day_name == 'weekdays' else " or 'off'"))
+    try:
+        start, end = _minutes(hours['start']), _minutes(hours['end'])
+    except ValueError as e:
+        raise ValueError(f'{day_name}: {e}')
+    if end <= start:
+        raise ValueError(f"{day_name}: end {hours['end']} is not after start {hours['start']}")
+    try:
+        break_duration = int(hours.get('breakDuration', 0))
+    except (TypeError, ValueError):
+        raise ValueError(f"{day_name}: breakDuration {hours['breakDuration']!r} is not a number of minutes")
+    return DayRule(True, start, end, break_duration)
+
+def validate_definition(definition):
+    """Raise ValueError if a schedule definition cannot be compiled"""
+    if not isinstance(definition, dict):
+        raise ValueError('A schedule must be an object')
+    saturdays = definition.get('workingSaturdays') or []
+    if not isinstance(saturdays, list) or not all(isinstance(n, int) and 1 <= n <= 5 for n in saturdays):
+        raise ValueError('workingSaturdays must list week numbers from 1 to 5')
+    try:
+        CompiledSchedule(definition)
+    except (KeyError, TypeError, AttributeError) as e:
+        raise ValueError(f'Invalid schedule: {e}')
+
+class CompiledSchedule:
+    """A schedule definition resolved into per-date DayRules
+
+    Definitions use the keys the dashboards already understand: 'weekdays'
+    for Monday-Friday, optional per-day overrides ('friday', 'saturday',
+    ... ; a day set to 'off' is not worked), and 'workingSaturdays' to only
+    work the nth Saturdays of the month. Saturdays without a rule and
+    Sundays are off. Hours are parsed once here; the per-day table for a
+    year is built on first use and then only indexed.
+    """
+
+    def __init__(self, definition):
+        self.definition = definition
+        weekdays = _compile_hours(definition.get('weekdays'))
+        self._off = weekdays._replace(working=False)
+
+        self._by_weekday = []
+        for day_name in DAY_NAMES:
+            hours = definition.get(day_name)
+            if hours == 'off':
+                self._by_weekday.append(self._off)
+            elif hours is not None:
+                self._by_weekday.append(_compile_hours(hours, day_name))
+            elif day_name in ('saturday', 'sunday'):
+                self._by_weekday.append(self._off)
+            else:
+                self._by_weekday.append(weekdays)
+
+        self._working_saturdays = set(definition.get('workingSaturdays') or ())
+        self._years = {}
+        self._lock = threading.Lock()
+
+    def _build_year(self, year):
+        first = date(year, 1, 1).toordinal()
+        last = date(year, 12, 31).toordinal()
+        table = []
+        for ordinal in range(first, last + 1):
+            day = date.fromordinal(ordinal)
+            rule = self._by_weekday[day.weekday()]
+            if (day.weekday() == 5 and self._working_saturdays
+                    and (day.day + 6) // 7 not in self._working_saturdays):
+                rule = self._off
+            table.append(rule)
+        return first, table
+
+    def rule_for(self, day):
+        """Return the DayRule for a date"""
+        entry = self._years.get(day.year)
+        if entry is None:
+            with self._lock:
+                entry = self._years.get(day.year)
+                if entry is None:
+                    entry = self._years[day.year] = self._build_year(day.year)
+        first, table = entry
+        return table[day.toordinal() - first]
+
+def describe_rule(rule):
+    """Serialize a DayRule for the API"""
+    return {
+        'working': rule.working,
+        'start': _format_minutes(rule.start),
+        'end': _format_minutes(rule.end),
+        'breakDuration': rule.break_duration
+    }
+
+class ScheduleRegistry:
+    """Compiled schedules read from a repository
+
+    Compiled tables are cached per schedule name and reused until the stored
+    definition changes, so edits by an admin take effect on the next lookup.
+    Unknown names fall back to 'general', as they always have.
+    """
+
+    def __init__(self, repository):
+        self.repository = repository
+        self._compiled = {}
+        self._lock = threading.Lock()
+
+    def definition(self, name):
+        """Return the stored definition for a schedule, or the general one"""
+        schedule = self.repository.get_schedule(name) or self.repository.get_schedule('general')
+        if schedule:
+            return schedule['definition']
+        return DEFAULT_SCHEDULES.get(name, DEFAULT_SCHEDULES['general'])
+
+    def names(self):
+        names = [schedule['name'] for schedule in self.repository.list_schedules()]
+        return names or list(DEFAULT_SCHEDULES)
+
+    def compiled(self, name):
+        """Return the CompiledSchedule for a schedule name"""
+        definition = self.definition(name)
+        fingerprint = json.dumps(definition, sort_keys=True)
+        cached = self._compiled.get(name)
+        if cached and cached[0] == fingerprint:
+            return cached[1]
+
+        schedule = CompiledSchedule(definition)
+        with self._lock:
+            self._compiled[name] = (fingerprint, schedule)
+        return schedule
+
+    def rule_for(self, name, day):
+        """Return the DayRule of a schedule on a date"""
+        return self.compiled(name).rule_for(day)
@@ -0,0 +1,93 @@
+"""
+Binary snapshots for WorkoHolic
+A pickled copy of the workbook's parsed collections, written next to it
+whenever it is rewritten, so a cold start reads one small file instead of
+parsing the workbook's XML. A snapshot records the (inode, mtime, size) of
+the workbook it was made from and is ignored as soon as those differ.
+"""
+
+import logging
+import os
+import pickle
+import struct
+import tempfile
+import zlib
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'WKSNAP'
+
+# Bump whenever the layout of the pickled collections changes
+VERSION = 1
+
+# magic, version, workbook inode, mtime_ns and size, payload length, payload CRC-32
+_HEADER = struct.Struct('>6sHQqQQI')
+
+def encode_snapshot(collections, signature):
+    """Serialize collections made from the workbook with the given signature"""
+    payload = pickle.dumps(collections, protocol=pickle.HIGHEST_PROTOCOL)
+    return _HEADER.pack(MAGIC, VERSION, *signature, len(payload), zlib.crc32(payload)) + payload
+
+def _header(blob, signature):
+    """Return (payload length, checksum) if blob starts with a header for signature, else None"""
+    if len(blob) < _HEADER.size:
+        return None
+    magic, version, inode, mtime_ns, size, length, checksum = _HEADER.unpack_from(blob)
+    if magic != MAGIC or version != VERSION or (inode, mtime_ns, size) != tuple(signature):
+        return None
+    return length, checksum
+
+def decode_snapshot(blob, signature):
+    """Return the collections in a snapshot, or None if it is stale, foreign or damaged"""
+    header = _header(blob, signature)
+    if header is None:
+        return None
+    length, checksum = header
+    payload = blob[_HEADER.size:]
+    if len(payload) != length or zlib.crc32(payload) != checksum:
+        return None
+    return pickle.loads(payload)
+
+def write_snapshot(path, collections, signature, mode=0o644):
+    """Write a snapshot to a temp file next to path; returns the temp path to rename into place
+
+    The file is fsync'd and given the permission bits mode (mkstemp makes
+    it private), so once renamed it is complete and readable by whoever
+    can read the workbook.
+    """
+    directory = os.path.dirname(path) or '.'
+    fd, temp_path = tempfile.mkstemp(prefix=f'.{os.path.basename(path)}.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as temp_file:
+            temp_file.write(encode_snapshot(collections, signature))
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+        os.chmod(temp_path, mode)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return temp_path
+
+def read_snapshot(path, signature):
+    """Return the collections of the snapshot at path if it matches signature, else None"""
+    try:
+        with open(path, 'rb') as snapshot_file:
+            blob = snapshot_file.read()
+    except OSError:
+        return None
+    try:
+        return decode_snapshot(blob, signature)
+    except Exception as e:
+        logger.warning('Ignoring unreadable snapshot %s: %s', path, e)
+        return None
+
+def is_current(path, signature):
+    """Return True if the snapshot at path was made from the workbook with this signature
+
+    Only the header is read; a damaged payload is caught by read_snapshot.
+    """
+    try:
+        with open(path, 'rb') as snapshot_file:
+            return _header(snapshot_file.read(_HEADER.size), signature) is not None
+    except OSError:
+        return False
@@ -1,5 +1,7 @@
 document.addEventListener('DOMContentLoaded', function() {
     let currentUser = null;
+    let attendanceCursor = null;
+    let pollInterval = null;
     
     // DOM elements
     const logoutBtn = document.getElementById('logoutBtn');
@@ -11,6 +13,7 @@ document.addEventListener('DOMContentLoaded', function() {
     const dateFilter = document.getElementById('dateFilter');
     const employeeFilter = document.getElementById('employeeFilter');
     const attendanceTable = document.getElementById('attendanceTable');
+    const loadMoreAttendance = document.getElementById('loadMoreAttendance');
     const fullLeaderboard = document.getElementById('fullLeaderboard');
     const usersTable = document.getElementById('usersTable');
     const addUserBtn = document.getElementById('addUserBtn');
@@ -47,8 +50,9 @@ document.addEventListener('DOMContentLoaded', function() {
             // Load employees
             await loadEmployees();
             
-            // Load users
+            // Load users and the schedules they can be assigned
             await loadUsers();
+            await loadSchedules();
             
             // Load attendance data
             await loadAttendance();
@@ -56,6 +60,9 @@ document.addEventListener('DOMContentLoaded', function() {
             // Load full leaderboard
             await loadFullLeaderboard();
             
+            // Keep attendance and leaderboard live
+            subscribeToEvents();
+            
             // Set today's date as default filter
             dateFilter.valueAsDate = new Date();
             
@@ -106,6 +113,25 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
     
+    async function loadSchedules() {
+        try {
+            const response = await fetch('/api/admin/schedules');
+            const data = await response.json();
+            
+            if (data.success && data.schedules.length > 0) {
+                userSchedule.innerHTML = '';
+                data.schedules.forEach(schedule => {
+                    const option = document.createElement('option');
+                    option.value = schedule.name;
+                    option.textContent = schedule.name.charAt(0).toUpperCase() + schedule.name.slice(1);
+                    userSchedule.appendChild(option);
+                });
+            }
+        } catch (error) {
+            console.error('Error loading schedules:', error);
+        }
+    }
+    
     function renderUsers(users) {
         usersTable.innerHTML = '';
         
@@ -155,46 +181,45 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
     
-    async function loadAttendance() {
+    async function loadAttendance(append = false) {
         try {
-            const response = await fetch('/api/admin/attendance');
+            // Filtering, sorting (newest first) and paging happen on the server
+            const params = new URLSearchParams({ order: 'desc' });
+            if (dateFilter.value) {
+                params.set('date', dateFilter.value);
+            }
+            if (employeeFilter.value) {
+                params.set('email', employeeFilter.value);
+            }
+            if (append && attendanceCursor) {
+                params.set('cursor', attendanceCursor);
+            }
+            
+            const response = await fetch(`/api/admin/attendance?${params}`);
             const data = await response.json();
             
             if (data.success) {
-                renderAttendance(data.attendance);
+                renderAttendance(data.attendance, append);
+                attendanceCursor = data.nextCursor;
+                loadMoreAttendance.classList.toggle('hidden', !attendanceCursor);
             }
         } catch (error) {
             console.error('Error loading attendance:', error);
         }
     }
     
-    function renderAttendance(attendance) {
-        attendanceTable.innerHTML = '';
+    function renderAttendance(attendance, append = false) {
+        if (!append) {
+            attendanceTable.innerHTML = '';
+        }
         
-        if (!attendance || attendance.length === 0) {
+        if (!append && (!attendance || attendance.length === 0)) {
             attendanceTable.innerHTML = '<tr><td colspan="6" class="px-6 py-4 text-center text-gray-500">No attendance records found</td></tr>';
             return;
         }
         
-        // Apply filters
-        let filteredAttendance = attendance;
-        
-        const selectedDate = dateFilter.value;
-        const selectedEmployee = employeeFilter.value;
-        
-        if (selectedDate) {
-            filteredAttendance = filteredAttendance.filter(record => record.date === selectedDate);
-        }
-        
-        if (selectedEmployee) {
-            filteredAttendance = filteredAttendance.filter(record => record.email === selectedEmployee);
-        }
-        
-        // Sort by date (newest first)
-        filteredAttendance.sort((a, b) => new Date(b.date) - new Date(a.date));
-        
         // Render records
-        filteredAttendance.forEach(record => {
+        attendance.forEach(record => {
             const row = document.createElement('tr');
             row.className = 'hover:bg-gray-50';
             
@@ -293,6 +318,62 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
     
+    function subscribeToEvents() {
+        if (!window.EventSource) {
+            startPolling();
+            return;
+        }
+        
+        const source = new EventSource('/api/events');
+        let attendanceReload = null;
+        let connected = false;
+        
+        // Coalesce bursts of clock events into a single reload
+        function scheduleAttendanceReload() {
+            if (attendanceReload) return;
+            attendanceReload = setTimeout(() => {
+                attendanceReload = null;
+                loadAttendance();
+            }, 1000);
+        }
+        
+        source.addEventListener('attendance', scheduleAttendanceReload);
+        
+        source.addEventListener('leaderboard', (event) => {
+            renderFullLeaderboard(JSON.parse(event.data).leaderboard);
+        });
+        
+        source.addEventListener('sync', () => {
+            scheduleAttendanceReload();
+            loadFullLeaderboard();
+        });
+        
+        // The server ends each stream after a while; catch up on anything
+        // published while the browser was reconnecting
+        source.addEventListener('open', () => {
+            if (connected) {
+                scheduleAttendanceReload();
+                loadFullLeaderboard();
+            }
+            connected = true;
+        });
+        
+        // The server does not hold streams open (or refused this one)
+        source.addEventListener('error', () => {
+            if (source.readyState === EventSource.CLOSED) {
+                startPolling();
+            }
+        });
+    }
+    
+    function startPolling() {
+        if (pollInterval) return;
+        pollInterval = setInterval(() => {
+            loadAttendance();
+            loadFullLeaderboard();
+        }, 30000);
+    }
+    
     function showTaskMessage(message, type = 'error') {
         taskMessage.textContent = message;
         taskMessage.className = `mt-4 p-3 rounded-lg text-center ${type === 'success' ? 'message-success' : type === 'info' ? 'message-info' : 'message-error'}`;
@@ -356,6 +437,10 @@ document.addEventListener('DOMContentLoaded', function() {
         loadAttendance();
     });
     
+    loadMoreAttendance.addEventListener('click', () => {
+        loadAttendance(true);
+    });
+    
     // User management event listeners
     addUserBtn.addEventListener('click', () => {
         openUserModal();
@@ -6,6 +6,7 @@ document.addEventListener('DOMContentLoaded', function() {
     let totalBreakTime = 0;
     let isOnBreak = false;
     let timerInterval = null;
+    let pollInterval = null;
     let currentCalendarDate = new Date();
     let attendanceData = [];
     
@@ -78,6 +79,9 @@ document.addEventListener('DOMContentLoaded', function() {
             // Load leaderboard
             await loadLeaderboard();
             
+            // Receive leaderboard and clock updates as they happen
+            subscribeToEvents();
+            
             // Start timer updates
             startTimerUpdates();
             
@@ -451,7 +455,7 @@ document.addEventListener('DOMContentLoaded', function() {
             
             if (data.success) {
                 console.log('Schedule data:', data.schedule);
-                renderTodaySchedule(data.schedule);
+                renderTodaySchedule(data.schedule, data.today);
             } else {
                 console.error('Schedule API error:', data.message);
                 // Show fallback schedule based on current user
@@ -486,109 +490,33 @@ document.addEventListener('DOMContentLoaded', function() {
         todaySchedule.innerHTML = fallbackSchedule;
     }
     
-    function renderTodaySchedule(schedule) {
-        console.log('Rendering schedule:', schedule);
+    function renderTodaySchedule(schedule, rule) {
+        console.log('Rendering schedule:', schedule, rule);
         
-        if (!schedule) {
+        if (!schedule || !rule) {
             todaySchedule.innerHTML = '<div class="text-sm text-gray-500">No schedule available</div>';
             return;
         }
         
-        const today = new Date();
-        const dayOfWeek = today.getDay(); // 0 = Sunday, 1 = Monday, etc.
-        const dayName = today.toLocaleDateString('en-US', { weekday: 'long' });
-        
-        console.log('Day of week:', dayOfWeek, 'Day name:', dayName);
-        
-        let scheduleInfo = '';
-        let clockInTime = '';
-        let clockOutTime = '';
-        let totalHours = '';
-        let breakTime = '';
-        
-        if (schedule.weekend === 'off' && (dayOfWeek === 0 || dayOfWeek === 6)) {
-            scheduleInfo = '<div class="text-sm text-gray-500">Weekend - No work scheduled</div>';
-        } else if (schedule.weekend === 'off' && dayOfWeek === 5 && schedule.friday) {
-            // Friday schedule
-            clockInTime = schedule.friday.start;
-            clockOutTime = schedule.friday.end;
-            const startTime = new Date(`2000-01-01T${schedule.friday.start}`);
-            const endTime = new Date(`2000-01-01T${schedule.friday.end}`);
-            const totalMinutes = (endTime - startTime) / (1000 * 60);
-            const workMinutes = totalMinutes - schedule.friday.breakDuration;
-            totalHours = `${Math.floor(workMinutes / 60)}h required`;
-            breakTime = `${schedule.friday.breakDuration} min break`;
-            
-            scheduleInfo = `
-                <div class="text-sm font-medium text-blue-800">Clock In: ${clockInTime}</div>
-                <div class="text-sm font-medium text-blue-800">Clock Out: ${clockOutTime}</div>
-                <div class="text-sm text-blue-600">${totalHours}</div>
-                <div class="text-sm text-blue-600">${breakTime}</div>
-            `;
-        } else if (schedule.workingSaturdays && dayOfWeek === 6) {
-            // Check if it's a working Saturday
-            const todayDate = today.getDate();
-            const weekOfMonth = Math.ceil(todayDate / 7);
-            const isWorkingSaturday = schedule.workingSaturdays.includes(weekOfMonth);
-            
-            if (isWorkingSaturday) {
-                clockInTime = schedule.saturday.start;
-                clockOutTime = schedule.saturday.end;
-                const startTime = new Date(`2000-01-01T${schedule.saturday.start}`);
-                const endTime = new Date(`2000-01-01T${schedule.saturday.end}`);
-                const totalMinutes = (endTime - startTime) / (1000 * 60);
-                const workMinutes = totalMinutes - schedule.saturday.breakDuration;
-                totalHours = `${Math.floor(workMinutes / 60)}h required`;
-                breakTime = `${schedule.saturday.breakDuration} min break`;
-                
-                scheduleInfo = `
-                    <div class="text-sm font-medium text-blue-800">Clock In: ${clockInTime}</div>
-                    <div class="text-sm font-medium text-blue-800">Clock Out: ${clockOutTime}</div>
-                    <div class="text-sm text-blue-600">${totalHours}</div>
-                    <div class="text-sm text-blue-600">${breakTime}</div>
-                `;
-            } else {
-                scheduleInfo = '<div class="text-sm text-gray-500">Saturday - No work scheduled</div>';
-            }
-        } else if (dayOfWeek === 6 && schedule.saturday) {
-            // Regular Saturday
-            clockInTime = schedule.saturday.start;
-            clockOutTime = schedule.saturday.end;
-            const startTime = new Date(`2000-01-01T${schedule.saturday.start}`);
-            const endTime = new Date(`2000-01-01T${schedule.saturday.end}`);
-            const totalMinutes = (endTime - startTime) / (1000 * 60);
-            const workMinutes = totalMinutes - schedule.saturday.breakDuration;
-            totalHours = `${Math.floor(workMinutes / 60)}h required`;
-            breakTime = `${schedule.saturday.breakDuration} min break`;
-            
-            scheduleInfo = `
-                <div class="text-sm font-medium text-blue-800">Clock In: ${clockInTime}</div>
-                <div class="text-sm font-medium text-blue-800">Clock Out: ${clockOutTime}</div>
-                <div class="text-sm text-blue-600">${totalHours}</div>
-                <div class="text-sm text-blue-600">${breakTime}</div>
-            `;
-        } else if (schedule.weekdays) {
-            // Regular weekday
-            clockInTime = schedule.weekdays.start;
-            clockOutTime = schedule.weekdays.end;
-            const startTime = new Date(`2000-01-01T${schedule.weekdays.start}`);
-            const endTime = new Date(`2000-01-01T${schedule.weekdays.end}`);
-            const totalMinutes = (endTime - startTime) / (1000 * 60);
-            const workMinutes = totalMinutes - schedule.weekdays.breakDuration;
-            totalHours = `${Math.floor(workMinutes / 60)}h required`;
-            breakTime = `${schedule.weekdays.breakDuration} min break`;
-            
-            scheduleInfo = `
-                <div class="text-sm font-medium text-blue-800">Clock In: ${clockInTime}</div>
-                <div class="text-sm font-medium text-blue-800">Clock Out: ${clockOutTime}</div>
-                <div class="text-sm text-blue-600">${totalHours}</div>
-                <div class="text-sm text-blue-600">${breakTime}</div>
-            `;
-        } else {
-            scheduleInfo = '<div class="text-sm text-gray-500">No schedule available</div>';
+        // The server resolves which rule applies today (weekday, Friday, working Saturday...)
+        const dayName = new Date().toLocaleDateString('en-US', { weekday: 'long' });
+        
+        if (!rule.working) {
+            todaySchedule.innerHTML = `<div class="text-sm text-gray-500">${dayName} - No work scheduled</div>`;
+            return;
         }
         
-        todaySchedule.innerHTML = scheduleInfo;
+        const startTime = new Date(`2000-01-01T${rule.start}`);
+        const endTime = new Date(`2000-01-01T${rule.end}`);
+        const totalMinutes = (endTime - startTime) / (1000 * 60);
+        const workMinutes = totalMinutes - rule.breakDuration;
+        
+        todaySchedule.innerHTML = `
+            <div class="text-sm font-medium text-blue-800">Clock In: ${rule.start}</div>
+            <div class="text-sm font-medium text-blue-800">Clock Out: ${rule.end}</div>
+            <div class="text-sm text-blue-600">${Math.floor(workMinutes / 60)}h required</div>
+            <div class="text-sm text-blue-600">${rule.breakDuration} min break</div>
+        `;
     }
     
     function renderAttendanceHistory(attendance) {
@@ -628,6 +556,59 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
     
+    function subscribeToEvents() {
+        if (!window.EventSource) {
+            startPolling();
+            return;
+        }
+        
+        const source = new EventSource('/api/events');
+        let connected = false;
+        
+        // The server ends each stream after a while; catch up on anything
+        // published while the browser was reconnecting
+        source.addEventListener('open', () => {
+            if (connected) {
+                loadTodayRecord();
+                loadLeaderboard();
+            }
+            connected = true;
+        });
+        
+        // The server does not hold streams open (or refused this one)
+        source.addEventListener('error', () => {
+            if (source.readyState === EventSource.CLOSED) {
+                startPolling();
+            }
+        });
+        
+        source.addEventListener('leaderboard', (event) => {
+            const data = JSON.parse(event.data);
+            renderLeaderboard(data.leaderboard, data.userRank);
+        });
+        
+        // Clock actions from another tab or device
+        source.addEventListener('attendance', (event) => {
+            const record = JSON.parse(event.data).record;
+            if (todayRecord && todayRecord.date !== record.date) return;
+            todayRecord = record;
+            updateUI();
+        });
+        
+        source.addEventListener('sync', () => {
+            loadTodayRecord();
+            loadLeaderboard();
+        });
+    }
+    
+    function startPolling() {
+        if (pollInterval) return;
+        pollInterval = setInterval(() => {
+            loadTodayRecord();
+            loadLeaderboard();
+        }, 30000);
+    }
+    
     async function loadLeaderboard() {
         try {
             const response = await fetch('/api/leaderboard');
@@ -0,0 +1,2380 @@
+"""
+Storage backends for WorkoHolic
+
+Routes talk to a Repository instead of raw workbook dicts. Two backends are
+available:
+
+- SQLiteRepository stores employees, attendance, leaderboard and schedules
+  in indexed tables (WAL mode, so readers run alongside a single writer).
+- ExcelRepository keeps the original workbook format, with an in-process
+  cache and an append-only journal in front of it.
+
+read_workbook/write_workbook are also used on their own to import from and
+export to .xlsx files whatever the active backend is.
+"""
+
+import bisect
+import copy
+import heapq
+import json
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import date, datetime
+
+import openpyxl
+from openpyxl import Workbook
+
+from columnar import AttendanceColumns
+from metrics import CACHE_REQUESTS, STORAGE_BYTES_WRITTEN, STORAGE_SECONDS
+from snapshot import is_current, read_snapshot, write_snapshot
+from timestamps import from_epoch, json_default, parse_attendance, parse_timestamp, to_epoch
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to an in-process lock
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+def empty_data():
+    """Return an empty data set"""
+    return {'employees': [], 'attendance': [], 'leaderboard': [], 'schedules': [], 'ledger': []}
+
+def copy_data(data):
+    """Copy parsed data so callers can mutate it without touching shared state"""
+    return {
+        'employees': [dict(emp) for emp in data['employees']],
+        'attendance': [
+            {**record, 'breaks': [dict(brk) for brk in record.get('breaks') or []]}
+            for record in data['attendance']
+        ],
+        'leaderboard': [dict(entry) for entry in data['leaderboard']],
+        'schedules': copy.deepcopy(data.get('schedules', [])),
+        'ledger': [dict(entry) for entry in data.get('ledger', [])]
+    }
+
+def _file_signature(path):
+    """Return (inode, mtime_ns, size) of a data file, or None if it is missing"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+def _fsync_directory(directory):
+    """Flush a directory entry change (e.g. a rename) to disk where supported"""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def _atomic_save(workbook, path):
+    """Save a workbook to a temp file, fsync it and rename it over path
+
+    A crash mid-save leaves either the old or the new file, never a
+    truncated one.
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix=f'.{os.path.basename(path)}.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as temp_file:
+            workbook.save(temp_file)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+        try:
+            os.chmod(temp_path, os.stat(path).st_mode & 0o777)
+        except FileNotFoundError:
+            os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    _fsync_directory(directory)
+
+
+class FileLock:
+    """Cross-process reader/writer lock backed by flock on a lock file
+
+    Any number of readers may hold the shared lock; a writer holding the
+    exclusive lock keeps out readers and writers in every worker process.
+    The lock is re-entrant per thread: nested acquisitions reuse the
+    outermost one, and a shared holder cannot upgrade to exclusive.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._thread_lock = threading.Lock()  # used only when fcntl is unavailable
+
+    def is_held(self):
+        """Return True if the current thread holds the lock in any mode"""
+        return getattr(self._local, 'mode', None) is not None
+
+    @contextmanager
+    def _acquire(self, exclusive):
+        held = getattr(self._local, 'mode', None)
+        if held is not None:
+            if exclusive and held != 'exclusive':
+                raise RuntimeError('Cannot upgrade a shared data lock to exclusive')
+            yield
+            return
+
+        if fcntl is None:
+            with self._thread_lock:
+                self._local.mode = 'exclusive'
+                try:
+                    yield
+                finally:
+                    self._local.mode = None
+            return
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, 'a') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            self._local.mode = 'exclusive' if exclusive else 'shared'
+            try:
+                yield
+            finally:
+                self._local.mode = None
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def shared(self):
+        return self._acquire(exclusive=False)
+
+    def exclusive(self):
+        return self._acquire(exclusive=True)
+
+class BackgroundWriter:
+    """Single thread that runs a save once a burst of changes has settled
+
+    request() marks new work and returns a ticket. The thread waits until no
+    request has arrived for `delay` seconds (or at most `max_delay` after the
+    first one), then calls save() once for everything requested so far.
+    wait(ticket) blocks until a save started after that ticket has finished,
+    skipping the remaining delay; flush() does so for all pending work.
+    A save that raises completes nothing: the error is raised to everyone
+    waiting for that work, and the save is retried after `delay`.
+    """
+
+    def __init__(self, save, delay=2.0, max_delay=10.0):
+        self._save = save
+        self.delay = delay
+        self.max_delay = max_delay
+        self._cond = threading.Condition()
+        self._requested = 0
+        self._completed = 0
+        self._first_pending = None
+        self._last_pending = None
+        self._urgent = False
+        self._thread = None
+        # Number of saves run so far, and the last failed one's (target, error)
+        self._attempts = 0
+        self._failure = None
+
+    def request(self):
+        with self._cond:
+            now = time.monotonic()
+            self._requested += 1
+            if self._first_pending is None:
+                self._first_pending = now
+            self._last_pending = now
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='workholic-writer', daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+            return self._requested
+
+    def wait(self, ticket):
+        with self._cond:
+            if self._completed >= ticket:
+                return
+            attempts = self._attempts
+            self._urgent = True
+            self._cond.notify_all()
+            self._cond.wait_for(lambda: self._completed >= ticket or (
+                self._attempts > attempts and self._failure is not None and self._failure[0] >= ticket))
+            if self._completed < ticket:
+                raise self._failure[1]
+
+    def flush(self):
+        """Block until everything requested so far has been saved"""
+        with self._cond:
+            ticket = self._requested
+        self.wait(ticket)
+
+    def _settled(self):
+        if self._urgent:
+            return 0
+        now = time.monotonic()
+        return max(0, min(self._last_pending + self.delay, self._first_pending + self.max_delay) - now)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._requested > self._completed)
+                remaining = self._settled()
+                while remaining > 0:
+                    self._cond.wait(remaining)
+                    remaining = self._settled()
+                target = self._requested
+                self._first_pending = None
+                self._urgent = False
+
+            try:
+                self._save()
+            except Exception as e:
+                logger.error('Background save error: %s', e)
+                with self._cond:
+                    # Nothing was saved; keep the work pending and try again later
+                    self._attempts += 1
+                    self._failure = (target, e)
+                    self._first_pending = self._last_pending = time.monotonic()
+                    self._cond.notify_all()
+                continue
+
+            with self._cond:
+                self._attempts += 1
+                self._failure = None
+                self._completed = target
+                self._cond.notify_all()
+
+# 'log': a write returns once it is committed to the journal / WAL.
+# 'full': it returns once it is in the main store (saved workbook, or
+# an fsync'd SQLite commit).
+DURABILITY_MODES = ('log', 'full')
+
+# Collection -> sheet name in the workbook
+SHEETS = {'employees': 'Employees', 'attendance': 'Attendance', 'leaderboard': 'Leaderboard',
+          'schedules': 'Schedules', 'ledger': 'Ledger', 'breaks': 'Breaks'}
+
+def _pad(row, width):
+    """Read-only sheets may return short rows when trailing cells are empty"""
+    return tuple(row) + (None,) * (width - len(row))
+
+def _employee_row(row):
+    row = _pad(row, 5)
+    return {
+        'email': row[0],
+        'name': row[1] or '',
+        'role': row[2],
+        'schedule': row[3],
+        'password': row[4] or None
+    }
+
+def _cell_timestamp(value):
+    """Clock cells are datetimes; workbooks from before typed timestamps hold ISO text"""
+    try:
+        return parse_timestamp(value)
+    except (TypeError, ValueError):
+        return None
+
+def _cell_date(value):
+    """Dates typed into the sheet by hand come back as datetimes"""
+    return value.strftime('%Y-%m-%d') if isinstance(value, (date, datetime)) else value
+
+def _attendance_row(row):
+    """Attendance summary row; breaks live in their own sheet"""
+    row = _pad(row, 5)
+    return {
+        'email': row[0],
+        'date': _cell_date(row[1]),
+        'clockIn': _cell_timestamp(row[2]),
+        'clockOut': _cell_timestamp(row[3]),
+        'status': row[4] or 'A'
+    }
+
+def _legacy_attendance_row(row):
+    """Row of an Attendance sheet from before the Breaks sheet, breaks JSON in column 5"""
+    row = _pad(row, 6)
+    return _attendance_row(row[:4] + row[5:])
+
+def _breaks_json(value, email, date):
+    """Breaks an older version kept as JSON; an unreadable value is reported and read as no breaks"""
+    try:
+        breaks = json.loads(value) if value else []
+    except ValueError:
+        logger.warning('Unreadable breaks for %s on %s: %r', email, date, value)
+        return []
+    return [brk for brk in breaks if isinstance(brk, dict)] if isinstance(breaks, list) else []
+
+def _legacy_breaks(row):
+    """The breaks JSON of a legacy attendance row, as a day group"""
+    row = _pad(row, 6)
+    date = _cell_date(row[1])
+    breaks = [{**brk, 'start': _cell_timestamp(brk.get('start')), 'end': _cell_timestamp(brk.get('end'))}
+              for brk in _breaks_json(row[4], row[0], date)]
+    return {'email': row[0], 'date': date, 'breaks': breaks}
+
+def _break_row(row):
+    row = _pad(row, 5)
+    return {
+        'email': row[0],
+        'date': _cell_date(row[1]),
+        'seq': row[2] or 0,
+        'start': _cell_timestamp(row[3]),
+        'end': _cell_timestamp(row[4])
+    }
+
+def _leaderboard_row(row):
+    row = _pad(row, 7)
+    return {
+        'email': row[0],
+        'name': row[1] or '',
+        'totalPoints': row[2] or 0,
+        'attendancePoints': row[3] or 0,
+        'smallTasks': row[4] or 0,
+        'regularTasks': row[5] or 0,
+        'bigTasks': row[6] or 0
+    }
+
+def _schedule_row(row):
+    row = _pad(row, 2)
+    try:
+        definition = json.loads(row[1]) if row[1] else {}
+    except ValueError:
+        definition = {}
+    return {'name': row[0], 'definition': definition}
+
+def _ledger_row(row):
+    row = _pad(row, 7)
+    return {
+        'id': row[0],
+        'email': row[1],
+        'kind': row[2],
+        'detail': row[3],
+        'count': row[4] or 0,
+        'date': row[5],
+        'ts': row[6]
+    }
+
+_ROW_PARSERS = {'employees': _employee_row, 'attendance': _attendance_row, 'leaderboard': _leaderboard_row,
+                'schedules': _schedule_row, 'ledger': _ledger_row}
+
+def _sheet_rows(workbook, name):
+    """Yield the unparsed data rows of one collection from an open workbook"""
+    if SHEETS[name] not in workbook.sheetnames:
+        return
+    for row in workbook[SHEETS[name]].iter_rows(min_row=2, values_only=True):
+        if row and row[0]:  # If email exists
+            yield row
+
+def _has_breaks_column(workbook):
+    """Attendance sheets written before the Breaks sheet keep breaks as JSON in column 5"""
+    if SHEETS['attendance'] not in workbook.sheetnames:
+        return False
+    header = next(workbook[SHEETS['attendance']].iter_rows(max_row=1, values_only=True), ())
+    return 'Breaks' in header
+
+def _break_groups(workbook):
+    """Yield one {'email', 'date', 'breaks'} group per day from the Breaks sheet"""
+    groups = {}
+    for row in map(_break_row, _sheet_rows(workbook, 'breaks')):
+        groups.setdefault((row['email'], row['date']), []).append(row)
+    for (email, day), rows in groups.items():
+        rows.sort(key=lambda row: row['seq'])
+        yield {'email': email, 'date': day, 'breaks': [{'start': row['start'], 'end': row['end']} for row in rows]}
+
+def _sheet_records(workbook, name):
+    """Yield the records of one collection from an open workbook
+
+    Attendance records come without their breaks; 'breaks' yields them as
+    one group per (email, date).
+    """
+    if name == 'breaks':
+        if _has_breaks_column(workbook):
+            yield from map(_legacy_breaks, _sheet_rows(workbook, 'attendance'))
+        else:
+            yield from _break_groups(workbook)
+        return
+    parse = _ROW_PARSERS[name]
+    if name == 'attendance' and _has_breaks_column(workbook):
+        parse = _legacy_attendance_row
+    for row in _sheet_rows(workbook, name):
+        yield parse(row)
+
+def _join_breaks(records, groups):
+    """Attach a copy of each record's breaks from an iterable of day groups"""
+    by_key = {(group['email'], group['date']): group['breaks'] for group in groups}
+    for record in records:
+        record['breaks'] = [dict(brk) for brk in by_key.get((record['email'], record['date']), [])]
+    return records
+
+def iter_sheet(source, name):
+    """Lazily yield the records of one collection from a workbook
+
+    source is a path or binary file object. The workbook is opened in
+    read-only mode, so only the requested sheet is parsed, row by row.
+    """
+    workbook = openpyxl.load_workbook(source, read_only=True)
+    try:
+        yield from _sheet_records(workbook, name)
+    finally:
+        workbook.close()
+
+# Collections a workbook from an older version may not have a sheet for
+_OPTIONAL_SHEETS = ('schedules', 'ledger')
+
+def read_workbook(path, names=None):
+    """Parse a WorkoHolic workbook into a list per collection
+
+    names limits parsing to those collections; the others come back empty.
+    A schedules or ledger collection whose sheet the workbook does not have
+    is left out, so saving the result keeps the stored one (see
+    Repository.save) rather than replacing it with nothing.
+    """
+    data = empty_data()
+    workbook = openpyxl.load_workbook(path, read_only=True)
+    try:
+        for name in names or empty_data():
+            if name in _OPTIONAL_SHEETS and SHEETS[name] not in workbook.sheetnames:
+                del data[name]
+                continue
+            data[name] = list(_sheet_records(workbook, name))
+        if 'attendance' in (names or data):
+            _join_breaks(data['attendance'], _sheet_records(workbook, 'breaks'))
+    finally:
+        workbook.close()
+    return data
+
+def _is_outdated(path):
+    """Return True if a workbook keeps breaks as JSON or clock times as ISO text
+
+    Clock times are judged by the first one found.
+    """
+    workbook = openpyxl.load_workbook(path, read_only=True)
+    try:
+        if _has_breaks_column(workbook):
+            return True
+        for row in _sheet_rows(workbook, 'attendance'):
+            row = _pad(row, 4)
+            if row[2] or row[3]:
+                return isinstance(row[2] or row[3], str)
+        return False
+    finally:
+        workbook.close()
+
+def _style_header(sheet):
+    for cell in sheet[1]:
+        cell.font = openpyxl.styles.Font(bold=True)
+        cell.fill = openpyxl.styles.PatternFill(start_color='E0E0E0', end_color='E0E0E0', fill_type='solid')
+
+def _attendance_sheet(workbook, records):
+    attendance_sheet = workbook.create_sheet('Attendance')
+    attendance_sheet.append(['Email', 'Date', 'Clock In', 'Clock Out', 'Status'])
+    for record in records:
+        attendance_sheet.append([
+            record['email'],
+            record['date'],
+            record['clockIn'],
+            record['clockOut'],
+            record['status']
+        ])
+    return attendance_sheet
+
+def _breaks_sheet(workbook, records):
+    breaks_sheet = workbook.create_sheet('Breaks')
+    breaks_sheet.append(['Email', 'Date', 'Seq', 'Start', 'End'])
+    for record in records:
+        for seq, brk in enumerate(record['breaks'], 1):
+            breaks_sheet.append([record['email'], record['date'], seq, brk.get('start'), brk.get('end')])
+    return breaks_sheet
+
+def _ledger_sheet(workbook, entries):
+    ledger_sheet = workbook.create_sheet('Ledger')
+    ledger_sheet.append(['ID', 'Email', 'Kind', 'Detail', 'Count', 'Date', 'Timestamp'])
+    for entry in entries:
+        ledger_sheet.append([
+            entry['id'],
+            entry['email'],
+            entry['kind'],
+            entry['detail'],
+            entry['count'],
+            entry['date'],
+            entry['ts']
+        ])
+    return ledger_sheet
+
+def write_ledger_workbook(entries, path):
+    """Write ledger entries alone to a workbook with a Ledger sheet"""
+    workbook = Workbook()
+    workbook.remove(workbook.active)
+    _style_header(_ledger_sheet(workbook, entries))
+    _atomic_save(workbook, path)
+
+def write_attendance_workbook(records, path):
+    """Write attendance records alone to a workbook with Attendance and Breaks sheets"""
+    workbook = Workbook()
+    workbook.remove(workbook.active)
+    _style_header(_attendance_sheet(workbook, records))
+    _style_header(_breaks_sheet(workbook, records))
+    _atomic_save(workbook, path)
+
+def write_workbook(data, path):
+    """Write all collections to a WorkoHolic workbook"""
+    # Create workbook
+    workbook = Workbook()
+
+    # Remove default sheet
+    workbook.remove(workbook.active)
+
+    # Create Employees sheet
+    employees_sheet = workbook.create_sheet('Employees')
+    employees_sheet.append(['Email', 'Name', 'Role', 'Schedule', 'Password'])
+    for employee in data['employees']:
+        employees_sheet.append([
+            employee['email'],
+            employee['name'],
+            employee['role'],
+            employee['schedule'],
+            employee['password'] or ''
+        ])
+
+    # Create Attendance sheet
+    attendance_sheet = _attendance_sheet(workbook, data['attendance'])
+
+    # Create Breaks sheet
+    breaks_sheet = _breaks_sheet(workbook, data['attendance'])
+
+    # Create Leaderboard sheet
+    leaderboard_sheet = workbook.create_sheet('Leaderboard')
+    leaderboard_sheet.append(['Email', 'Name', 'Total Points', 'Attendance Points', 'Small Tasks', 'Regular Tasks', 'Big Tasks'])
+    for entry in data['leaderboard']:
+        leaderboard_sheet.append([
+            entry['email'],
+            entry['name'],
+            entry['totalPoints'],
+            entry['attendancePoints'],
+            entry['smallTasks'],
+            entry['regularTasks'],
+            entry['bigTasks']
+        ])
+
+    # Create Schedules sheet
+    schedules_sheet = workbook.create_sheet('Schedules')
+    schedules_sheet.append(['Name', 'Definition'])
+    for schedule in data.get('schedules', []):
+        schedules_sheet.append([schedule['name'], json.dumps(schedule['definition'])])
+
+    # Create Ledger sheet
+    ledger_sheet = _ledger_sheet(workbook, data.get('ledger', []))
+
+    # Style headers
+    for sheet in [employees_sheet, attendance_sheet, breaks_sheet, leaderboard_sheet, schedules_sheet, ledger_sheet]:
+        _style_header(sheet)
+
+    _atomic_save(workbook, path)
+
+
+class Repository:
+    """Interface implemented by every storage backend
+
+    Records are plain dicts in the same shape the API returns. Getters return
+    copies, so callers may modify them and hand them back to a put_* method.
+    """
+
+    def load(self):
+        """Return a full copy of every collection"""
+        raise NotImplementedError
+
+    def save(self, data):
+        """Replace all stored data, returning True on success
+
+        Stored schedules and the points ledger are kept when data has no
+        'schedules' or 'ledger' key, so callers that only rebuild employees
+        and attendance leave them be.
+        """
+        raise NotImplementedError
+
+    def is_empty(self):
+        """Return True if nothing has been stored yet"""
+        raise NotImplementedError
+
+    def get_employee(self, email):
+        raise NotImplementedError
+
+    def iter_employees(self, email=None):
+        """Yield employees one at a time, in storage order
+
+        email limits them to that one employee, found by key.
+        """
+        raise NotImplementedError
+
+    def list_employees(self):
+        return list(self.iter_employees())
+
+    def put_employee(self, employee):
+        """Insert or replace an employee keyed by email"""
+        raise NotImplementedError
+
+    def put_employees(self, employees):
+        """Insert or replace several employees in a single write"""
+        with self.transaction():
+            for employee in employees:
+                self.put_employee(employee)
+        return True
+
+    def delete_employee(self, email):
+        """Delete an employee, returning False if it did not exist"""
+        raise NotImplementedError
+
+    def get_attendance(self, email, date, breaks=True):
+        """Return one attendance record, or None
+
+        breaks=False returns the day's summary without a 'breaks' key, and
+        the breaks are not read at all.
+        """
+        raise NotImplementedError
+
+    def iter_attendance(self, email=None, start=None, end=None, status=None,
+                        descending=False, after=None, breaks=True):
+        """Yield attendance records ordered by (date, email)
+
+        email limits the records to one employee, start and end are
+        inclusive YYYY-MM-DD bounds and status an exact match. after is a
+        (date, email) key to resume strictly after, in iteration order, which
+        makes it usable as a pagination cursor. Records are produced one at
+        a time from an index, so reading a page costs O(page), not O(history).
+        breaks=False leaves the breaks out, as in get_attendance().
+        """
+        raise NotImplementedError
+
+    def list_attendance(self, email=None):
+        return list(self.iter_attendance(email=email))
+
+    def put_attendance(self, record):
+        """Insert or replace an attendance record keyed by (email, date)
+
+        A record without a 'breaks' key keeps the breaks already stored.
+        """
+        raise NotImplementedError
+
+    def get_leaderboard_entry(self, email):
+        raise NotImplementedError
+
+    def iter_leaderboard(self, email=None):
+        """Yield leaderboard entries one at a time, in storage order; email as in iter_employees()"""
+        raise NotImplementedError
+
+    def list_leaderboard(self):
+        return list(self.iter_leaderboard())
+
+    def put_leaderboard_entry(self, entry):
+        """Insert or replace a leaderboard entry keyed by email"""
+        raise NotImplementedError
+
+    def put_leaderboard_entries(self, entries):
+        """Insert or replace several leaderboard entries in a single write"""
+        with self.transaction():
+            for entry in entries:
+                self.put_leaderboard_entry(entry)
+        return True
+
+    def put_many(self, employees=(), attendance=(), leaderboard=(), ledger=()):
+        """Insert or replace records across collections in a single write"""
+        raise NotImplementedError
+
+    def get_ledger_entry(self, entry_id, day=None):
+        """Return a points ledger entry, or None
+
+        day is the entry's date if the caller knows it, which lets a store
+        that partitions the ledger by month look in that month alone.
+        """
+        raise NotImplementedError
+
+    def iter_ledger(self):
+        """Yield points ledger entries in the order they were first recorded
+
+        Re-recording an entry with the same id keeps its original position.
+        """
+        raise NotImplementedError
+
+    def leaderboard_top(self, limit):
+        """Return the highest scoring entries with a 'rank' field
+
+        Entries are ordered by totalPoints descending, ties broken by email
+        so the order is stable between calls.
+        """
+        raise NotImplementedError
+
+    def leaderboard_rank(self, email):
+        """Return an employee's 1-based rank, or None if they have no entry"""
+        raise NotImplementedError
+
+    def get_schedule(self, name):
+        raise NotImplementedError
+
+    def list_schedules(self):
+        raise NotImplementedError
+
+    def put_schedule(self, schedule):
+        """Insert or replace a schedule ({'name', 'definition'}) keyed by name"""
+        raise NotImplementedError
+
+    def delete_schedule(self, name):
+        """Delete a schedule, returning False if it did not exist"""
+        raise NotImplementedError
+
+    def transaction(self):
+        """Context manager holding the store's write lock
+
+        Wrap every read-modify-write cycle in it so concurrent requests, in
+        this process or another worker, cannot lose each other's updates.
+        """
+        raise NotImplementedError
+
+    def data_version(self):
+        """Return a token that changes whenever any stored data changes
+
+        It must be cheap: no data is loaded, so conditional GETs can be
+        answered from it alone.
+        """
+        raise NotImplementedError
+
+    def migrate(self):
+        """Rewrite data an older version stored in a superseded format (no-op by default)
+
+        Returns True if anything was rewritten.
+        """
+        return False
+
+    def compact(self):
+        """Fold any pending log into the main store (no-op by default)"""
+        return True
+
+    def flush(self):
+        """Wait until background writes have reached the main store (no-op by default)"""
+        return True
+
+    def invalidate(self):
+        """Drop any in-process cache (no-op by default)"""
+
+
+# Primary key of each collection
+_KEYS = {
+    'employees': lambda item: item['email'],
+    'attendance': lambda item: (item['email'], item['date']),
+    'leaderboard': lambda item: item['email'],
+    'schedules': lambda item: item['name'],
+    'ledger': lambda item: item['id'],
+    # One {'email', 'date', 'breaks'} group per attendance day
+    'breaks': lambda item: (item['email'], item['date']),
+}
+
+# Journal op -> collections. Every op is an upsert of one record, except the
+# *_delete ops, so replaying an entry twice is harmless. A 'batch' entry
+# wraps several of these in one line so they replay all-or-nothing. An
+# attendance record is split: the summary goes to 'attendance' and, if the
+# record has a 'breaks' key, its breaks replace the day's group.
+_JOURNAL_OPS = {
+    'employee': ('employees',),
+    'employee_delete': ('employees',),
+    'attendance': ('attendance', 'breaks'),
+    'leaderboard': ('leaderboard',),
+    'schedule': ('schedules',),
+    'schedule_delete': ('schedules',),
+    'ledger': ('ledger',),
+}
+
+def _split_breaks(data):
+    """Public data -> IndexedData collections: attendance summaries plus break groups"""
+    attendance = []
+    groups = []
+    for record in data['attendance']:
+        summary = dict(record)
+        breaks = summary.pop('breaks', None)
+        attendance.append(summary)
+        if breaks:
+            groups.append({'email': record['email'], 'date': record['date'], 'breaks': breaks})
+    return {**data, 'attendance': attendance, 'breaks': groups}
+
+def _insert_sorted(items, item):
+    """Return items with item inserted in order
+
+    The common case, an item that sorts last, is appended in place; anything
+    else goes into a copy so concurrent readers keep a consistent list.
+    """
+    if not items or items[-1] <= item:
+        items.append(item)
+        return items
+    updated = list(items)
+    bisect.insort(updated, item)
+    return updated
+
+def _replace_sorted(items, old, new):
+    """Return a copy of sorted items with old (if present) swapped for new"""
+    updated = list(items)
+    if old is not None:
+        i = bisect.bisect_left(updated, old)
+        if i < len(updated) and updated[i] == old:
+            del updated[i]
+    bisect.insort(updated, new)
+    return updated
+
+def _rank_key(entry):
+    """Sort key for the leaderboard: most points first, ties by email"""
+    return (-(entry.get('totalPoints') or 0), entry['email'])
+
+def _key_range(keys, start, end, after, descending):
+    """Return the slice bounds of sorted (date, email) keys matching a query"""
+    lo = bisect.bisect_left(keys, start, key=lambda key: key[0]) if start is not None else 0
+    hi = bisect.bisect_right(keys, end, key=lambda key: key[0]) if end is not None else len(keys)
+    if after is not None:
+        if descending:
+            hi = min(hi, bisect.bisect_left(keys, after))
+        else:
+            lo = max(lo, bisect.bisect_right(keys, after))
+    return lo, hi
+
+def _positions(collection, key_of):
+    """Map each key to the position of its first record, like a linear scan would"""
+    positions = {}
+    for i, item in enumerate(collection):
+        positions.setdefault(key_of(item), i)
+    return positions
+
+
+class StaleSnapshot(Exception):
+    """The workbook changed on disk before a lazily loaded sheet was read"""
+
+
+class IndexedData:
+    """Parsed data plus hash indexes from each record's key to its list position
+
+    Indexes cover email -> employee, email -> leaderboard entry and
+    (email, date) -> attendance record or break group, and are kept up to
+    date by apply(). Attendance records are held without their breaks, which
+    are a collection of their own.
+    Attendance keys are also kept as sorted (date, email) lists, overall and
+    per employee, for ordered range scans, and the leaderboard as a sorted
+    ranking so top-K and rank queries are a slice or a bisect.
+    Records are replaced rather than modified in place, so readers holding a
+    reference to an old record or list never see a half-applied change.
+
+    Collections can also be loaded lazily: given a loader(name) and the
+    journal entries to replay, each collection is parsed the first time
+    ensure() asks for it, so a login never pays for the Attendance sheet.
+    """
+
+    def __init__(self, data=None, loader=None, journal=()):
+        self.data = {}
+        self.index = {}
+        self.attendance_keys = []
+        self.attendance_keys_by_email = {}
+        self.ranking = []
+        self._loader = loader
+        self._journal = []
+        for entry in journal:
+            self._journal.extend(entry['data'] if entry.get('op') == 'batch' else [entry])
+        self._lock = threading.Lock()
+        if data is not None:
+            for name in _KEYS:
+                self._install(name, data.get(name, []))
+
+    def _install(self, name, records):
+        """Index a freshly parsed collection and make it visible to readers"""
+        self.index[name] = _positions(records, _KEYS[name])
+        if name == 'attendance':
+            self.attendance_keys = sorted((day, email) for email, day in self.index['attendance'])
+            self.attendance_keys_by_email = {}
+            for key in self.attendance_keys:
+                self.attendance_keys_by_email.setdefault(key[1], []).append(key)
+        elif name == 'leaderboard':
+            self.ranking = sorted(_rank_key(records[i]) for i in self.index['leaderboard'].values())
+        self.data[name] = records
+
+    def ensure(self, *names):
+        """Load the named collections if they are not loaded yet; returns self"""
+        for name in names:
+            if name in self.data:
+                continue
+            with self._lock:
+                if name in self.data:
+                    continue
+                records = list(self._loader(name)) if self._loader else []
+                self._install(name, records)
+                for entry in self._journal:
+                    if name in _JOURNAL_OPS.get(entry.get('op'), ()):
+                        self._apply(entry, name)
+        return self
+
+    def rebase(self, loader):
+        """Parse collections that are not loaded yet with a new loader
+
+        Used when the workbook is replaced by a compacted copy of the same
+        data; the journal entries still queued for those collections are
+        already in it, and replaying them again changes nothing.
+        """
+        with self._lock:
+            self._loader = loader
+
+    def get(self, name, key):
+        """Return the record with the given key, or None"""
+        collection = self.ensure(name).data[name]
+        position = self.index[name].get(key)
+        if position is None:
+            return None
+        if position < len(collection) and _KEYS[name](collection[position]) == key:
+            return collection[position]
+
+        # A concurrent delete swapped the list under us; fall back to a scan
+        return next((item for item in collection if _KEYS[name](item) == key), None)
+
+    def apply(self, entry):
+        """Apply one journal entry
+
+        Changes to collections that are not loaded yet are queued and
+        replayed when the collection is loaded.
+        """
+        with self._lock:
+            for change in entry['data'] if entry.get('op') == 'batch' else [entry]:
+                names = _JOURNAL_OPS.get(change.get('op'), ())
+                if any(name not in self.data for name in names):
+                    self._journal.append(change)
+                for name in names:
+                    if name in self.data:
+                        self._apply(change, name)
+
+    def _apply(self, entry, name):
+        key_of = _KEYS[name]
+        collection = self.data[name]
+        payload = entry['data']
+        if entry['op'] == 'attendance':
+            # Journal lines carry ISO strings
+            payload = parse_attendance(payload)
+            breaks = payload.pop('breaks', None)
+            if name == 'breaks':
+                if breaks is None:
+                    return
+                payload = {'email': payload['email'], 'date': payload['date'], 'breaks': breaks}
+        key = key_of(payload)
+        position = self.index[name].get(key)
+
+        if entry['op'].endswith('_delete'):
+            if position is not None:
+                remaining = [item for item in collection if key_of(item) != key]
+                self.data[name] = remaining
+                self.index[name] = _positions(remaining, key_of)
+            return
+
+        previous = None
+        if position is None:
+            collection.append(payload)
+            self.index[name][key] = len(collection) - 1
+            if name == 'attendance':
+                email, day = key
+                self.attendance_keys = _insert_sorted(self.attendance_keys, (day, email))
+                self.attendance_keys_by_email[email] = _insert_sorted(
+                    self.attendance_keys_by_email.get(email, []), (day, email))
+        else:
+            previous = collection[position]
+            collection[position] = payload
+
+        if name == 'leaderboard':
+            old = _rank_key(previous) if previous is not None else None
+            self.ranking = _replace_sorted(self.ranking, old, _rank_key(payload))
+
+    def rank(self, email):
+        """Return the 1-based rank of an email, or None"""
+        entry = self.ensure('leaderboard').get('leaderboard', email)
+        if entry is None:
+            return None
+        return bisect.bisect_left(self.ranking, _rank_key(entry)) + 1
+
+
+def _month(day):
+    """'YYYY-MM-DD' -> 'YYYY-MM'"""
+    return day[:7]
+
+def _current_month():
+    return date.today().strftime('%Y-%m')
+
+
+
+class MonthArchive:
+    """One collection's past months, one immutable workbook per month
+
+    Files are named PREFIX-YYYY-MM.xlsx and only ever replaced whole.
+    A month is parsed the first time a query reaches it and kept while its
+    file is unchanged; beyond max_cached months the least recently used
+    ones are dropped again. Subclasses say how a month is parsed and written.
+    """
+
+    PREFIX = None
+
+    def __init__(self, directory, max_cached=12):
+        self.directory = directory
+        self.max_cached = max_cached
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+
+    def path(self, month):
+        return os.path.join(self.directory, f'{self.PREFIX}-{month}.xlsx')
+
+    def months(self):
+        """Archived months, oldest first"""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        pattern = re.compile(rf'^{self.PREFIX}-(\d{{4}}-\d{{2}})\.xlsx$')
+        return sorted(match.group(1) for match in map(pattern.match, names) if match)
+
+    def _parse(self, partition_file):
+        raise NotImplementedError
+
+    def _normalize(self, records):
+        """records as they read back from a month's file"""
+        raise NotImplementedError
+
+    def _write(self, records, path):
+        raise NotImplementedError
+
+    def partition(self, month):
+        """Return the parsed month, or None if it is not archived"""
+        path = self.path(month)
+        signature = _file_signature(path)
+        if signature is None:
+            return None
+        with self._lock:
+            cached = self._cache.get(month)
+            if cached and cached[0] == signature:
+                self._cache.move_to_end(month)
+                return cached[1]
+
+        try:
+            with open(path, 'rb') as partition_file:
+                stat = os.fstat(partition_file.fileno())
+                with STORAGE_SECONDS.time(backend='excel', operation='partition_load'):
+                    partition = self._parse(partition_file)
+        except FileNotFoundError:
+            return None
+
+        with self._lock:
+            self._cache[month] = ((stat.st_ino, stat.st_mtime_ns, stat.st_size), partition)
+            self._cache.move_to_end(month)
+            while len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+        return partition
+
+    def write(self, month, records):
+        """Replace a month's file, skipping the write if it already holds these records"""
+        records = self._normalize(records)
+        existing = self.partition(month)
+        if existing is not None and existing.records() == records:
+            return False
+        os.makedirs(self.directory, exist_ok=True)
+        self._write(records, self.path(month))
+        STORAGE_BYTES_WRITTEN.inc(os.path.getsize(self.path(month)), backend='excel', target='archive')
+        return True
+
+    def remove(self, month):
+        try:
+            os.remove(self.path(month))
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            self._cache.pop(month, None)
+
+
+class AttendanceArchive(MonthArchive):
+    """Attendance for past months, each parsed into AttendanceColumns"""
+
+    PREFIX = 'attendance'
+
+    def _parse(self, partition_file):
+        return AttendanceColumns(read_workbook(partition_file, ['attendance'])['attendance'])
+
+    def _normalize(self, records):
+        return AttendanceColumns(records).records()
+
+    def _write(self, records, path):
+        write_attendance_workbook(records, path)
+
+
+class LedgerMonth:
+    """The points ledger entries dated in one archived month, indexed by id"""
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.index = _positions(entries, _KEYS['ledger'])
+
+    def get(self, entry_id):
+        position = self.index.get(entry_id)
+        return dict(self.entries[position]) if position is not None else None
+
+    def records(self):
+        return [dict(entry) for entry in self.entries]
+
+
+class LedgerArchive(MonthArchive):
+    """Points ledger entries for past months, by the month of their date"""
+
+    PREFIX = 'ledger'
+
+    def _parse(self, partition_file):
+        return LedgerMonth(read_workbook(partition_file, ['ledger'])['ledger'])
+
+    def _normalize(self, records):
+        return [dict(entry) for entry in records]
+
+    def _write(self, records, path):
+        write_ledger_workbook(records, path)
+
+
+
+class ExcelRepository(Repository):
+    """Workbook-backed storage
+
+    The workbook is the last compacted snapshot. Single-record changes are
+    appended to a journal (one fsync'd JSON line each) that is replayed on top
+    of the workbook on every load. A BackgroundWriter folds the journal back
+    into the workbook once a burst of changes settles, so requests never wait
+    for .xlsx serialization unless durability is 'full', in which case a
+    write returns only once its change is in the saved workbook (waiters
+    share one save). Parsed data is cached in-process, keyed by a data version
+    plus the mtime/size of the workbook and the journal, so edits made to the
+    file by hand are picked up on the next read. Each sheet is parsed in
+    read-only mode the first time a query needs it.
+
+    Attendance is partitioned by month. The workbook only holds the current
+    month (plus any late changes to older ones); every compaction moves
+    finished months into an AttendanceArchive, so the first one after a
+    month rollover archives the previous month. Queries read archived
+    months on demand, and a record in the workbook takes precedence over
+    the archived copy until it is archived again. The points ledger is
+    partitioned the same way by the month of each entry's date, into a
+    LedgerArchive, so a save never rewrites the whole scoring history.
+
+    Whenever the workbook is rewritten, its parsed collections are also
+    written to a binary snapshot next to it (see snapshot.py). A cold load
+    takes them from there and only parses the workbook's sheets when the
+    snapshot is missing or was made from a different file.
+
+    A FileLock next to the workbook is held shared while loading from disk
+    and exclusively for writes and transactions, so several worker
+    processes can share the same files.
+    """
+
+    def __init__(self, path, journal_path, durability='log', save_delay=2.0, archive_dir=None):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f'Unknown durability mode: {durability}')
+        self.path = path
+        self.journal_path = journal_path
+        self.snapshot_path = path + '.snapshot'
+        self.durability = durability
+        archive_dir = archive_dir or os.path.join(os.path.dirname(path) or '.', 'attendance-archive')
+        self.archive = AttendanceArchive(archive_dir)
+        self.ledger_archive = LedgerArchive(archive_dir)
+        self._cache_lock = threading.Lock()
+        self._cache = {'key': None, 'data': None, 'loading': None}
+        self._version = 0
+        self._lock = FileLock(path + '.lock')
+        # Serializes whole-store rewrites (compact, save) so archive files are never written from a stale copy
+        self._rewrite_lock = FileLock(path + '.rewrite.lock')
+        self._local = threading.local()
+        self._writer = BackgroundWriter(self.compact, delay=save_delay)
+
+    @contextmanager
+    def transaction(self):
+        with self._lock.exclusive():
+            yield
+        self._settle()
+
+    def _settle(self):
+        """In 'full' mode, wait for this thread's changes to reach the workbook
+
+        Only once the outermost lock is released: the writer needs it too.
+        """
+        ticket = getattr(self._local, 'ticket', 0)
+        if ticket and not self._lock.is_held():
+            self._local.ticket = 0
+            if self.durability == 'full':
+                self._writer.wait(ticket)
+
+    def flush(self):
+        self._writer.flush()
+        return True
+
+    def data_version(self):
+        # Every commit rewrites the workbook or appends to the journal, and
+        # both show up in the files' inode/mtime/size
+        return '{}-{}'.format(
+            '-'.join(map(str, _file_signature(self.path) or ())),
+            '-'.join(map(str, _file_signature(self.journal_path) or ()))
+        )
+
+    def invalidate(self):
+        """Drop the cached workbook so the next read reloads it from disk"""
+        with self._cache_lock:
+            self._version += 1
+            self._cache['key'] = None
+            self._cache['data'] = None
+
+    def _current(self):
+        """Return the shared cached data, loading it if stale
+
+        Loading only reads the journal; sheets are parsed later by
+        _dataset(). Concurrent cold misses wait on a single in-flight load,
+        and a thread holding the data lock loads on its own, since the
+        in-flight loader may be waiting for that lock.
+        """
+        while True:
+            signature = _file_signature(self.path)
+            if signature is None:
+                return IndexedData(empty_data())
+            journal_signature = _file_signature(self.journal_path)
+
+            with self._cache_lock:
+                key = (self._version, signature, journal_signature)
+                if self._cache['key'] == key:
+                    CACHE_REQUESTS.inc(backend='excel', result='hit')
+                    return self._cache['data']
+
+                if self._lock.is_held():
+                    loading = None
+                    break
+
+                loading = self._cache['loading']
+                if loading is None:
+                    # This thread performs the load; others wait for it
+                    loading = threading.Event()
+                    self._cache['loading'] = loading
+                    break
+
+            # Another thread is already parsing the file, wait and re-check
+            loading.wait()
+
+        CACHE_REQUESTS.inc(backend='excel', result='miss')
+        try:
+            data = self._load()
+            with self._cache_lock:
+                if data is not None and self._version == key[0]:
+                    self._cache['key'] = key
+                    self._cache['data'] = data
+        finally:
+            if loading is not None:
+                with self._cache_lock:
+                    self._cache['loading'] = None
+                loading.set()
+
+        return data if data is not None else IndexedData(empty_data())
+
+    def _load(self):
+        """Read the journal and return a dataset that parses sheets on demand"""
+        with self._lock.shared(), STORAGE_SECONDS.time(backend='excel', operation='journal_load'):
+            signature = _file_signature(self.path)
+            try:
+                with open(self.journal_path, 'r', encoding='utf-8') as journal:
+                    lines = journal.readlines()
+            except FileNotFoundError:
+                lines = []
+
+        entries = []
+        for line in lines:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                # A torn final line from a crash mid-append; it was never acknowledged
+                logger.warning('Skipping unreadable journal entry')
+
+        return IndexedData(loader=self._loader(signature), journal=entries)
+
+    def _loader(self, signature):
+        """Return a loader(name) for the collections of the workbook with this signature
+
+        They come from the binary snapshot if it was made from that workbook,
+        otherwise each sheet is parsed when it is first needed. The snapshot
+        is read on the first call, which IndexedData makes under its lock.
+        """
+        snapshot = {}
+
+        def loader(name):
+            if 'collections' not in snapshot:
+                with STORAGE_SECONDS.time(backend='excel', operation='snapshot_load'):
+                    snapshot['collections'] = read_snapshot(self.snapshot_path, signature) if signature else None
+            collections = snapshot['collections']
+            if collections is None:
+                return self._read_sheet(name, signature)
+            # Each collection is loaded once; let go of it as soon as it is handed over
+            return collections.pop(name, [])
+
+        return loader
+
+    def _read_sheet(self, name, signature):
+        """Parse one sheet of the workbook the journal was read against
+
+        Saves replace the workbook by rename, so an open file is always
+        complete; if it is no longer the same file the snapshot is stale.
+        """
+        try:
+            with open(self.path, 'rb') as workbook_file:
+                stat = os.fstat(workbook_file.fileno())
+                if (stat.st_ino, stat.st_mtime_ns, stat.st_size) != signature:
+                    raise StaleSnapshot(self.path)
+                with STORAGE_SECONDS.time(backend='excel', operation='sheet_load'):
+                    return list(iter_sheet(workbook_file, name))
+        except FileNotFoundError:
+            raise StaleSnapshot(self.path)
+
+    def _write_snapshot(self, collections, signature, workbook_path):
+        """Write a snapshot of collections for the workbook with this signature to a temp file
+
+        The snapshot gets the workbook's permissions. Returns the temp path
+        to rename over snapshot_path, or None if it could not be written:
+        without a snapshot the next cold load just parses the workbook.
+        """
+        try:
+            mode = os.stat(workbook_path).st_mode & 0o777
+            with STORAGE_SECONDS.time(backend='excel', operation='snapshot_write'):
+                temp_path = write_snapshot(self.snapshot_path, collections, signature, mode)
+        except Exception as e:
+            logger.error('Error writing snapshot: %s', e)
+            return None
+        STORAGE_BYTES_WRITTEN.inc(os.path.getsize(temp_path), backend='excel', target='snapshot')
+        return temp_path
+
+    def _refresh_snapshot(self):
+        """Write the snapshot of the current workbook if it is missing or stale"""
+        try:
+            with self._lock.shared():
+                signature = _file_signature(self.path)
+                if signature is None or is_current(self.snapshot_path, signature):
+                    return
+                collections = {name: self._read_sheet(name, signature) for name in _KEYS}
+        except Exception as e:
+            logger.error('Error reading Excel file: %s', e)
+            return
+        temp_path = self._write_snapshot(collections, signature, self.path)
+        if temp_path is None:
+            return
+        with self._lock.exclusive():
+            if _file_signature(self.path) == signature:
+                os.replace(temp_path, self.snapshot_path)
+                _fsync_directory(os.path.dirname(self.snapshot_path) or '.')
+            else:
+                os.remove(temp_path)
+
+    def _dataset(self, *names, strict=False):
+        """Return the cached data with the named collections loaded
+
+        A read error gives an empty data set, so a request still gets an
+        answer; with strict=True it is raised instead. Anything that
+        rewrites the workbook reads strictly: writing back the empty data
+        would erase the store.
+        """
+        while True:
+            dataset = self._current()
+            try:
+                return dataset.ensure(*names)
+            except StaleSnapshot:
+                with self._cache_lock:
+                    if self._cache['data'] is dataset:
+                        self._version += 1
+                        self._cache['key'] = None
+                        self._cache['data'] = None
+            except Exception as e:
+                if strict:
+                    raise
+                logger.error('Error reading Excel file: %s', e)
+                return IndexedData(empty_data())
+
+    def _hot_data(self, strict=False):
+        """Copy of the workbook and journal data, breaks attached to their records"""
+        dataset = self._dataset(*_KEYS, strict=strict)
+        data = copy_data(dataset.data)
+        _join_breaks(data['attendance'], dataset.data['breaks'])
+        return data
+
+    def _all_data(self, strict=False):
+        """The hot data with archived attendance and ledger entries merged in"""
+        data = self._hot_data(strict)
+        if self.archive.months():
+            data['attendance'] = list(self.iter_attendance())
+        if self.ledger_archive.months():
+            data['ledger'] = list(self.iter_ledger())
+        return data
+
+    def load(self):
+        return self._all_data()
+
+    @staticmethod
+    def _split_months(records):
+        """Split dated records into the current partition and {month: records} to archive"""
+        current_month = _current_month()
+        hot = []
+        archived = {}
+        for record in records:
+            # A ledger entry without a date stays in the workbook
+            if record['date'] and _month(record['date']) < current_month:
+                archived.setdefault(_month(record['date']), []).append(record)
+            else:
+                hot.append(record)
+        return hot, archived
+
+    def save(self, data):
+        """Rewrite the workbook and archive; the full data supersedes the journal"""
+        try:
+            with self._rewrite_lock.exclusive(), self._lock.exclusive():
+                hot, archived = self._split_months(data['attendance'])
+                data = {**data, 'attendance': hot}
+                if 'schedules' not in data:
+                    data['schedules'] = copy.deepcopy(self._dataset('schedules', strict=True).data['schedules'])
+                if 'ledger' in data:
+                    data['ledger'], archived_ledger = self._split_months(data['ledger'])
+                else:
+                    # The archived months are kept as they are
+                    data['ledger'] = [dict(entry) for entry in self._dataset('ledger', strict=True).data['ledger']]
+                    archived_ledger = None
+                self._replace_archive(self.archive, archived)
+                if archived_ledger is not None:
+                    self._replace_archive(self.ledger_archive, archived_ledger)
+
+                with STORAGE_SECONDS.time(backend='excel', operation='save'):
+                    write_workbook(data, self.path)
+                STORAGE_BYTES_WRITTEN.inc(os.path.getsize(self.path), backend='excel', target='workbook')
+                signature = _file_signature(self.path)
+                collections = _split_breaks(copy_data(data))
+                snapshot_temp_path = self._write_snapshot(collections, signature, self.path)
+                if snapshot_temp_path is not None:
+                    os.replace(snapshot_temp_path, self.snapshot_path)
+                    _fsync_directory(os.path.dirname(self.snapshot_path) or '.')
+                if os.path.exists(self.journal_path):
+                    os.remove(self.journal_path)
+
+                # The data just written is now the freshest copy, cache it directly
+                with self._cache_lock:
+                    self._version += 1
+                    self._cache['key'] = (self._version, signature, None)
+                    self._cache['data'] = IndexedData(collections)
+            return True
+
+        except Exception as e:
+            logger.error('Error writing Excel file: %s', e)
+            self.invalidate()
+            return False
+
+    @staticmethod
+    def _replace_archive(archive, months):
+        """Make archive hold exactly these {month: records}"""
+        for month in archive.months():
+            if month not in months:
+                archive.remove(month)
+        for month, records in months.items():
+            archive.write(month, records)
+
+    def is_empty(self):
+        return not os.path.exists(self.path)
+
+    def migrate(self):
+        """Rewrite workbooks in an older layout: breaks as JSON, clock times as ISO text
+
+        Both are still read; the rewrite moves breaks to the Breaks sheet and
+        clock times to datetime cells, so they never have to be parsed from
+        text again. A missing or stale snapshot is written afresh. A current
+        snapshot is only ever made from data in the current layout, so when
+        there is one no workbook is opened at all.
+        """
+        signature = _file_signature(self.path)
+        if signature is not None and is_current(self.snapshot_path, signature):
+            return False
+        migrated = False
+        with self._rewrite_lock.exclusive():
+            for month in self.archive.months():
+                partition = self.archive.partition(month)
+                if partition is not None and _is_outdated(self.archive.path(month)):
+                    write_attendance_workbook(partition.records(), self.archive.path(month))
+                    migrated = True
+            if os.path.exists(self.path) and _is_outdated(self.path):
+                # A read error is raised rather than saved as an empty store
+                migrated = self.save(self._all_data(strict=True)) or migrated
+            else:
+                self._refresh_snapshot()
+        return migrated
+
+    def append(self, op, payload):
+        """Durably append one change to the journal and apply it to the cache"""
+        line = json.dumps({'op': op, 'data': payload, 'ts': datetime.now().isoformat()},
+                          default=json_default) + '\n'
+        return self._append_line(line)
+
+    def append_many(self, changes):
+        """Append several (op, payload) changes as one all-or-nothing batch entry"""
+        if not changes:
+            return True
+        batch = [{'op': op, 'data': payload} for op, payload in changes]
+        line = json.dumps({'op': 'batch', 'data': batch, 'ts': datetime.now().isoformat()},
+                          default=json_default) + '\n'
+        return self._append_line(line)
+
+    def _append_line(self, line):
+        """fsync one journal line and apply it to the cache if that was current"""
+        with self._lock.exclusive():
+            signature = _file_signature(self.path)
+            journal_signature = _file_signature(self.journal_path)
+
+            directory = os.path.dirname(self.journal_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with STORAGE_SECONDS.time(backend='excel', operation='journal_append'):
+                with open(self.journal_path, 'a', encoding='utf-8') as journal:
+                    journal.write(line)
+                    journal.flush()
+                    os.fsync(journal.fileno())
+            STORAGE_BYTES_WRITTEN.inc(len(line.encode('utf-8')), backend='excel', target='journal')
+
+            # Keep the cache warm: apply the change in place if it was current
+            new_journal_signature = _file_signature(self.journal_path)
+            with self._cache_lock:
+                if self._cache['key'] == (self._version, signature, journal_signature):
+                    self._cache['data'].apply(json.loads(line))
+                    self._cache['key'] = (self._version, signature, new_journal_signature)
+
+        self._local.ticket = self._writer.request()
+        self._settle()
+        return True
+
+    def compact(self):
+        """Fold the journal into the workbook snapshot and archive past months
+
+        The data is copied under the shared lock and serialized without any
+        lock, so requests keep committing meanwhile; the exclusive lock is
+        taken just to swap the new file in and keep the journal lines
+        appended since. Replaying journal lines that are already in the
+        workbook is harmless (every entry is a whole-record upsert or
+        delete), so a crash between the two renames loses nothing. Past
+        months are merged into their archive file before they are dropped
+        from the workbook; changes made to them meanwhile stay in the
+        journal and are archived by the next compaction. If the workbook or
+        journal cannot be read, the error is raised and nothing is rewritten.
+        """
+        with self._rewrite_lock.exclusive():
+            return self._compact()
+
+    def _compact(self):
+        with self._lock.shared():
+            journal_signature = _file_signature(self.journal_path)
+            signature = _file_signature(self.path)
+            if signature is None:
+                return True
+            # Raises on a read error: folding an empty data set in would erase the store
+            data = self._hot_data(strict=True)
+            hot, archived = self._split_months(data['attendance'])
+            hot_ledger, archived_ledger = self._split_months(data['ledger'])
+            if journal_signature is None and not archived and not archived_ledger:
+                return True
+
+        with STORAGE_SECONDS.time(backend='excel', operation='compact'):
+            for month, records in archived.items():
+                partition = self.archive.partition(month)
+                if partition is not None:
+                    merged = {(record['email'], record['date']): record for record in partition.records()}
+                    merged.update(((record['email'], record['date']), record) for record in records)
+                    records = list(merged.values())
+                self.archive.write(month, records)
+            for month, entries in archived_ledger.items():
+                partition = self.ledger_archive.partition(month)
+                if partition is not None:
+                    # Entries already archived keep their place, new ones go last
+                    merged = {entry['id']: entry for entry in partition.records()}
+                    merged.update((entry['id'], entry) for entry in entries)
+                    entries = list(merged.values())
+                self.ledger_archive.write(month, entries)
+
+            data['attendance'] = hot
+            data['ledger'] = hot_ledger
+            compact_path = f'{self.path}.{os.getpid()}.{threading.get_ident()}.compact'
+            write_workbook(data, compact_path)
+            # The copy is a new file; give it the permissions of the one it replaces
+            os.chmod(compact_path, os.stat(self.path).st_mode & 0o777)
+        STORAGE_BYTES_WRITTEN.inc(os.path.getsize(compact_path), backend='excel', target='workbook')
+        # A rename keeps inode, mtime and size, so this is also the swapped-in workbook's signature
+        snapshot_temp_path = self._write_snapshot(_split_breaks(data), _file_signature(compact_path), compact_path)
+
+        with self._lock.exclusive():
+            current = _file_signature(self.journal_path)
+            if _file_signature(self.path) != signature or (journal_signature is not None and (
+                    current is None or current[0] != journal_signature[0] or current[2] < journal_signature[2])):
+                # Another process compacted in the meantime
+                os.remove(compact_path)
+                if snapshot_temp_path is not None:
+                    os.remove(snapshot_temp_path)
+                return True
+
+            os.replace(compact_path, self.path)
+            if snapshot_temp_path is not None:
+                os.replace(snapshot_temp_path, self.snapshot_path)
+            if journal_signature is not None:
+                with open(self.journal_path, 'rb') as journal:
+                    journal.seek(journal_signature[2])
+                    tail = journal.read()
+                if tail:
+                    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(self.journal_path) or '.')
+                    with os.fdopen(fd, 'wb') as temp_file:
+                        temp_file.write(tail)
+                        temp_file.flush()
+                        os.fsync(temp_file.fileno())
+                    os.chmod(temp_path, os.stat(self.journal_path).st_mode & 0o777)
+                    os.replace(temp_path, self.journal_path)
+                else:
+                    os.remove(self.journal_path)
+            _fsync_directory(os.path.dirname(self.path) or '.')
+
+            # Unless anything moved to the archive, the cached data is
+            # unchanged by the swap; keep it, reading any collections not
+            # parsed yet from the new workbook's snapshot
+            new_signature = _file_signature(self.path)
+            with self._cache_lock:
+                if not archived and not archived_ledger and self._cache['key'] == (self._version, signature, current):
+                    self._cache['key'] = (self._version, new_signature, _file_signature(self.journal_path))
+                    self._cache['data'].rebase(self._loader(new_signature))
+                else:
+                    self._version += 1
+                    self._cache['key'] = None
+                    self._cache['data'] = None
+        return True
+
+    def get_employee(self, email):
+        employee = self._dataset('employees').get('employees', email)
+        return dict(employee) if employee else None
+
+    def iter_employees(self, email=None):
+        if email is not None:
+            employee = self.get_employee(email)
+            if employee is not None:
+                yield employee
+            return
+        for emp in self._dataset('employees').data['employees']:
+            yield dict(emp)
+
+    def put_employee(self, employee):
+        return self.append('employee', employee)
+
+    def put_employees(self, employees):
+        return self.append_many([('employee', employee) for employee in employees])
+
+    def delete_employee(self, email):
+        if self.get_employee(email) is None:
+            return False
+        return self.append('employee_delete', {'email': email})
+
+    def _archived_record(self, email, day, breaks=True):
+        partition = self.archive.partition(_month(day))
+        row = partition.find(email, day) if partition else None
+        return partition.record(row, breaks) if row is not None else None
+
+    def _attendance_dataset(self, breaks):
+        """The cached data with attendance, and the Breaks sheet only if wanted"""
+        return self._dataset('attendance', 'breaks') if breaks else self._dataset('attendance')
+
+    @staticmethod
+    def _hot_record(dataset, email, day, breaks):
+        """Copy of a workbook/journal record, with its breaks if wanted"""
+        record = dataset.get('attendance', (email, day))
+        if record is None:
+            return None
+        record = dict(record)
+        if breaks:
+            group = dataset.get('breaks', (email, day))
+            record['breaks'] = [dict(brk) for brk in group['breaks']] if group else []
+        return record
+
+    def get_attendance(self, email, date, breaks=True):
+        dataset = self._attendance_dataset(breaks)
+        return self._hot_record(dataset, email, date, breaks) or self._archived_record(email, date, breaks)
+
+    def _archived_rows(self, email, start, end, status, after, descending):
+        """Yield (key, partition, row) from the archived months, parsing each only when reached"""
+        first, last = start, end
+        if after is not None and descending:
+            last = min(last, after[0]) if last else after[0]
+        elif after is not None:
+            first = max(first, after[0]) if first else after[0]
+        months = [month for month in self.archive.months()
+                  if (not first or month >= _month(first)) and (not last or month <= _month(last))]
+
+        for month in reversed(months) if descending else months:
+            partition = self.archive.partition(month)
+            if partition is None:
+                continue
+            for row in partition.rows(email, start, end, after, descending, status):
+                yield partition.key(row), partition, row
+
+    def iter_attendance(self, email=None, start=None, end=None, status=None,
+                        descending=False, after=None, breaks=True):
+        dataset = self._attendance_dataset(breaks)
+        if email is not None:
+            keys = dataset.attendance_keys_by_email.get(email, [])
+        else:
+            keys = dataset.attendance_keys
+
+        lo, hi = _key_range(keys, start, end, after, descending)
+        positions = range(hi - 1, lo - 1, -1) if descending else range(lo, hi)
+        hot = ((keys[i], None, None) for i in positions)
+        archived = self._archived_rows(email, start, end, status, after, descending)
+
+        # Archived months are merged in key order; a key in both comes from the workbook
+        previous = None
+        for key, partition, row in heapq.merge(hot, archived, key=lambda item: item[0], reverse=descending):
+            if key == previous:
+                continue
+            previous = key
+            day, record_email = key
+            if partition is not None:
+                record = partition.record(row, breaks)
+            else:
+                record = (self._hot_record(dataset, record_email, day, breaks) or
+                          self._archived_record(record_email, day, breaks))
+            if record is None or (status is not None and record['status'] != status):
+                continue
+            yield record
+
+    def _with_stored_breaks(self, record):
+        """Journal entries carry whole days; a record put without breaks keeps the stored ones"""
+        if 'breaks' in record:
+            return record
+        stored = self.get_attendance(record['email'], record['date'])
+        return {**record, 'breaks': stored['breaks'] if stored else []}
+
+    def put_attendance(self, record):
+        return self.append('attendance', self._with_stored_breaks(record))
+
+    def get_leaderboard_entry(self, email):
+        entry = self._dataset('leaderboard').get('leaderboard', email)
+        return dict(entry) if entry else None
+
+    def iter_leaderboard(self, email=None):
+        if email is not None:
+            entry = self.get_leaderboard_entry(email)
+            if entry is not None:
+                yield entry
+            return
+        for entry in self._dataset('leaderboard').data['leaderboard']:
+            yield dict(entry)
+
+    def put_leaderboard_entry(self, entry):
+        return self.append('leaderboard', entry)
+
+    def put_leaderboard_entries(self, entries):
+        return self.append_many([('leaderboard', entry) for entry in entries])
+
+    def put_many(self, employees=(), attendance=(), leaderboard=(), ledger=()):
+        return self.append_many(
+            [('employee', employee) for employee in employees] +
+            [('attendance', self._with_stored_breaks(record)) for record in attendance] +
+            [('leaderboard', entry) for entry in leaderboard] +
+            [('ledger', entry) for entry in ledger])
+
+    def get_ledger_entry(self, entry_id, day=None):
+        entry = self._dataset('ledger').get('ledger', entry_id)
+        if entry:
+            return dict(entry)
+        # Without a day every archived month may have to be parsed
+        months = [_month(day)] if day else reversed(self.ledger_archive.months())
+        for month in months:
+            partition = self.ledger_archive.partition(month)
+            entry = partition.get(entry_id) if partition else None
+            if entry:
+                return entry
+        return None
+
+    def iter_ledger(self):
+        """Archived months oldest first, then the workbook's entries
+
+        An entry re-recorded since its month was archived is yielded in
+        its archived place, with the workbook's version.
+        """
+        dataset = self._dataset('ledger')
+        replaced = set()
+        for month in self.ledger_archive.months():
+            partition = self.ledger_archive.partition(month)
+            for entry in partition.entries if partition else ():
+                hot = dataset.get('ledger', entry['id'])
+                if hot is not None:
+                    replaced.add(entry['id'])
+                yield dict(hot or entry)
+        for entry in dataset.data['ledger']:
+            if entry['id'] not in replaced:
+                yield dict(entry)
+
+    def leaderboard_top(self, limit):
+        dataset = self._dataset('leaderboard')
+        top = []
+        for rank, (_, email) in enumerate(dataset.ranking[:limit], 1):
+            entry = dataset.get('leaderboard', email)
+            if entry is not None:
+                top.append({**entry, 'rank': rank})
+        return top
+
+    def leaderboard_rank(self, email):
+        return self._dataset('leaderboard').rank(email)
+
+    def get_schedule(self, name):
+        schedule = self._dataset('schedules').get('schedules', name)
+        return copy.deepcopy(schedule) if schedule else None
+
+    def list_schedules(self):
+        return copy.deepcopy(self._dataset('schedules').data['schedules'])
+
+    def put_schedule(self, schedule):
+        return self.append('schedule', schedule)
+
+    def delete_schedule(self, name):
+        if self.get_schedule(name) is None:
+            return False
+        return self.append('schedule_delete', {'name': name})
+
+
+def _legacy_time(value):
+    """A clock or break time from any older SQLite schema: ISO text or epoch microseconds"""
+    return from_epoch(value) if isinstance(value, int) else value
+
+
+class SQLiteRepository(Repository):
+    """SQLite-backed storage with one connection per thread
+
+    Connections run in autocommit mode; every write goes through
+    transaction(), which issues BEGIN IMMEDIATE so SQLite's own
+    cross-process write lock covers the whole read-modify-write cycle.
+    Clock and break times are stored as integer microseconds since the
+    epoch, and breaks in their own table keyed by (email, date, seq).
+    """
+
+    # PRAGMA user_version of the current schema
+    VERSION = 2
+
+    ATTENDANCE_SCHEMA = ('''
+        CREATE TABLE IF NOT EXISTS attendance (
+            email TEXT NOT NULL,
+            date TEXT NOT NULL,
+            clock_in INTEGER,
+            clock_out INTEGER,
+            status TEXT NOT NULL DEFAULT 'A',
+            PRIMARY KEY (email, date)
+        )''', '''
+        CREATE INDEX IF NOT EXISTS idx_attendance_date ON attendance (date, email)''')
+
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS employees (
+            email TEXT PRIMARY KEY,
+            name TEXT NOT NULL DEFAULT '',
+            role TEXT,
+            schedule TEXT,
+            password TEXT
+        );
+        ''' + ';'.join(ATTENDANCE_SCHEMA) + ''';
+        CREATE TABLE IF NOT EXISTS breaks (
+            email TEXT NOT NULL,
+            date TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            start INTEGER,
+            end INTEGER,
+            PRIMARY KEY (email, date, seq)
+        );
+        CREATE TABLE IF NOT EXISTS leaderboard (
+            email TEXT PRIMARY KEY,
+            name TEXT NOT NULL DEFAULT '',
+            total_points INTEGER NOT NULL DEFAULT 0,
+            attendance_points INTEGER NOT NULL DEFAULT 0,
+            small_tasks INTEGER NOT NULL DEFAULT 0,
+            regular_tasks INTEGER NOT NULL DEFAULT 0,
+            big_tasks INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_leaderboard_rank ON leaderboard (total_points DESC, email);
+        CREATE TABLE IF NOT EXISTS ledger (
+            id TEXT PRIMARY KEY,
+            email TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            detail TEXT,
+            count INTEGER NOT NULL DEFAULT 0,
+            date TEXT,
+            ts TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_ledger_email ON ledger (email);
+        CREATE TABLE IF NOT EXISTS schedules (
+            name TEXT PRIMARY KEY,
+            definition TEXT NOT NULL DEFAULT '{}'
+        );
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        );
+        INSERT OR IGNORE INTO meta VALUES ('data_version', 0);
+        INSERT OR IGNORE INTO meta VALUES ('leaderboard_version', 0);
+        CREATE TRIGGER IF NOT EXISTS leaderboard_inserted AFTER INSERT ON leaderboard BEGIN
+            UPDATE meta SET value = value + 1 WHERE key = 'leaderboard_version';
+        END;
+        CREATE TRIGGER IF NOT EXISTS leaderboard_updated AFTER UPDATE ON leaderboard BEGIN
+            UPDATE meta SET value = value + 1 WHERE key = 'leaderboard_version';
+        END;
+        CREATE TRIGGER IF NOT EXISTS leaderboard_deleted AFTER DELETE ON leaderboard BEGIN
+            UPDATE meta SET value = value + 1 WHERE key = 'leaderboard_version';
+        END;
+    '''
+
+    def __init__(self, path, durability='log'):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f'Unknown durability mode: {durability}')
+        self.path = path
+        self.durability = durability
+        self._local = threading.local()
+        # (leaderboard_version, sorted rank keys, email -> points), see _ranking()
+        self._ranking_lock = threading.Lock()
+        self._ranking_cache = (None, [], {})
+        self._connect().executescript(self.SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        """Upgrade a database written by an older version, once"""
+        conn = self._connect()
+        if conn.execute('PRAGMA user_version').fetchone()[0] >= self.VERSION:
+            return
+        with self._writing():
+            if conn.execute('PRAGMA user_version').fetchone()[0] >= self.VERSION:
+                return
+
+            columns = {row['name'] for row in conn.execute('PRAGMA table_info(attendance)')}
+            if 'breaks' in columns:
+                # Versions 0 and 1 kept breaks as JSON in the attendance
+                # table, version 0 also kept clock and break times as ISO
+                # text; the table is rebuilt in rowid order
+                records = [parse_attendance({
+                    'email': row['email'],
+                    'date': row['date'],
+                    'clockIn': _legacy_time(row['clock_in']),
+                    'clockOut': _legacy_time(row['clock_out']),
+                    'breaks': [{**brk, 'start': _legacy_time(brk.get('start')), 'end': _legacy_time(brk.get('end'))}
+                               for brk in _breaks_json(row['breaks'], row['email'], row['date'])],
+                    'status': row['status']
+                }) for row in conn.execute('SELECT * FROM attendance ORDER BY rowid')]
+                conn.execute('DROP TABLE attendance')
+                for statement in self.ATTENDANCE_SCHEMA:
+                    conn.execute(statement)
+                self._put_attendance_records(conn, records)
+                if records:
+                    print(f'Migrated {len(records)} attendance records to the version {self.VERSION} schema')
+            conn.execute(f'PRAGMA user_version = {self.VERSION}')
+
+    def _connect(self):
+        """Return this thread's connection, opening it on first use"""
+        conn = getattr(self._local, 'connection', None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            # NORMAL: commits are in the WAL when they return and reach the
+            # database file at checkpoints; FULL also fsyncs every commit
+            conn.execute('PRAGMA synchronous=FULL' if self.durability == 'full' else 'PRAGMA synchronous=NORMAL')
+            self._local.connection = conn
+            self._local.depth = 0
+            self._local.dirty = False
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        conn = self._connect()
+        if self._local.depth:
+            # Nested: the outermost transaction commits
+            self._local.depth += 1
+            try:
+                yield conn
+            finally:
+                self._local.depth -= 1
+            return
+
+        started = time.perf_counter()
+        conn.execute('BEGIN IMMEDIATE')
+        self._local.depth = 1
+        try:
+            yield conn
+            if self._local.dirty:
+                conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'data_version'")
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            self._local.depth = 0
+            self._local.dirty = False
+            STORAGE_SECONDS.observe(time.perf_counter() - started, backend='sqlite', operation='transaction')
+
+    @contextmanager
+    def _writing(self):
+        """Transaction that bumps the data version when it commits"""
+        with self.transaction() as conn:
+            self._local.dirty = True
+            yield conn
+
+    def data_version(self):
+        row = self._connect().execute("SELECT value FROM meta WHERE key = 'data_version'").fetchone()
+        return row['value']
+
+    @staticmethod
+    def _employee(row):
+        return {
+            'email': row['email'],
+            'name': row['name'] or '',
+            'role': row['role'],
+            'schedule': row['schedule'],
+            'password': row['password'] or None
+        }
+
+    @staticmethod
+    def _attendance(row):
+        return {
+            'email': row['email'],
+            'date': row['date'],
+            'clockIn': from_epoch(row['clock_in']),
+            'clockOut': from_epoch(row['clock_out']),
+            'status': row['status'] or 'A'
+        }
+
+    @staticmethod
+    def _break(row):
+        return {'start': from_epoch(row['start']), 'end': from_epoch(row['end'])}
+
+    @staticmethod
+    def _leaderboard(row):
+        return {
+            'email': row['email'],
+            'name': row['name'] or '',
+            'totalPoints': row['total_points'],
+            'attendancePoints': row['attendance_points'],
+            'smallTasks': row['small_tasks'],
+            'regularTasks': row['regular_tasks'],
+            'bigTasks': row['big_tasks']
+        }
+
+    @staticmethod
+    def _ledger(row):
+        return {key: row[key] for key in ('id', 'email', 'kind', 'detail', 'count', 'date', 'ts')}
+
+    @staticmethod
+    def _schedule(row):
+        return {'name': row['name'], 'definition': json.loads(row['definition'] or '{}')}
+
+    @staticmethod
+    def _employee_params(employee):
+        return (employee['email'], employee.get('name') or '', employee.get('role'),
+                employee.get('schedule'), employee.get('password') or None)
+
+    @staticmethod
+    def _attendance_params(record):
+        return (record['email'], record['date'], to_epoch(record.get('clockIn')),
+                to_epoch(record.get('clockOut')), record.get('status') or 'A')
+
+    @staticmethod
+    def _break_params(record):
+        return [(record['email'], record['date'], seq, to_epoch(brk.get('start')), to_epoch(brk.get('end')))
+                for seq, brk in enumerate(record['breaks'], 1)]
+
+    @staticmethod
+    def _leaderboard_params(entry):
+        return (entry['email'], entry.get('name') or '', entry.get('totalPoints', 0),
+                entry.get('attendancePoints', 0), entry.get('smallTasks', 0),
+                entry.get('regularTasks', 0), entry.get('bigTasks', 0))
+
+    @staticmethod
+    def _ledger_params(entry):
+        return (entry['id'], entry['email'], entry['kind'], entry.get('detail'),
+                entry.get('count') or 0, entry.get('date'), entry.get('ts'))
+
+    @staticmethod
+    def _schedule_params(schedule):
+        return (schedule['name'], json.dumps(schedule.get('definition') or {}))
+
+    # Upserts keep the original rowid, so listings stay in insertion order
+    _PUT_EMPLOYEE = '''
+        INSERT INTO employees VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (email) DO UPDATE SET
+            name = excluded.name, role = excluded.role,
+            schedule = excluded.schedule, password = excluded.password
+    '''
+    _PUT_ATTENDANCE = '''
+        INSERT INTO attendance VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (email, date) DO UPDATE SET
+            clock_in = excluded.clock_in, clock_out = excluded.clock_out,
+            status = excluded.status
+    '''
+    _PUT_BREAK = 'INSERT INTO breaks VALUES (?, ?, ?, ?, ?)'
+    _PUT_LEDGER = '''
+        INSERT INTO ledger VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (id) DO UPDATE SET
+            email = excluded.email, kind = excluded.kind, detail = excluded.detail,
+            count = excluded.count, date = excluded.date, ts = excluded.ts
+    '''
+    _PUT_SCHEDULE = '''
+        INSERT INTO schedules VALUES (?, ?)
+        ON CONFLICT (name) DO UPDATE SET definition = excluded.definition
+    '''
+    _PUT_LEADERBOARD = '''
+        INSERT INTO leaderboard VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (email) DO UPDATE SET
+            name = excluded.name, total_points = excluded.total_points,
+            attendance_points = excluded.attendance_points, small_tasks = excluded.small_tasks,
+            regular_tasks = excluded.regular_tasks, big_tasks = excluded.big_tasks
+    '''
+
+    def _put_attendance_records(self, conn, records):
+        """Upsert records; the breaks of those that carry a 'breaks' key are replaced"""
+        conn.executemany(self._PUT_ATTENDANCE, map(self._attendance_params, records))
+        with_breaks = [record for record in records if 'breaks' in record]
+        conn.executemany('DELETE FROM breaks WHERE email = ? AND date = ?',
+                         [(record['email'], record['date']) for record in with_breaks])
+        conn.executemany(self._PUT_BREAK, [params for record in with_breaks for params in self._break_params(record)])
+
+    def _breaks(self, email, date):
+        rows = self._connect().execute(
+            'SELECT start, end FROM breaks WHERE email = ? AND date = ? ORDER BY seq', (email, date))
+        return [self._break(row) for row in rows]
+
+    def load(self):
+        conn = self._connect()
+        with STORAGE_SECONDS.time(backend='sqlite', operation='load'):
+            breaks = {}
+            for row in conn.execute('SELECT * FROM breaks ORDER BY email, date, seq'):
+                breaks.setdefault((row['email'], row['date']), []).append(self._break(row))
+            attendance = []
+            for row in conn.execute('SELECT * FROM attendance ORDER BY rowid'):
+                record = self._attendance(row)
+                record['breaks'] = breaks.get((record['email'], record['date']), [])
+                attendance.append(record)
+            return {
+                'employees': [self._employee(row) for row in conn.execute('SELECT * FROM employees ORDER BY rowid')],
+                'attendance': attendance,
+                'leaderboard': [self._leaderboard(row) for row in conn.execute('SELECT * FROM leaderboard ORDER BY rowid')],
+                'schedules': [self._schedule(row) for row in conn.execute('SELECT * FROM schedules ORDER BY rowid')],
+                'ledger': [self._ledger(row) for row in conn.execute('SELECT * FROM ledger ORDER BY rowid')]
+            }
+
+    def save(self, data):
+        try:
+            with self._writing() as conn:
+                conn.execute('DELETE FROM employees')
+                conn.execute('DELETE FROM attendance')
+                conn.execute('DELETE FROM breaks')
+                conn.execute('DELETE FROM leaderboard')
+                conn.executemany(self._PUT_EMPLOYEE, map(self._employee_params, data['employees']))
+                self._put_attendance_records(conn, data['attendance'])
+                conn.executemany(self._PUT_LEADERBOARD, map(self._leaderboard_params, data['leaderboard']))
+                if 'schedules' in data:
+                    conn.execute('DELETE FROM schedules')
+                    conn.executemany(self._PUT_SCHEDULE, map(self._schedule_params, data['schedules']))
+                if 'ledger' in data:
+                    conn.execute('DELETE FROM ledger')
+                    conn.executemany(self._PUT_LEDGER, map(self._ledger_params, data['ledger']))
+            return True
+
+        except Exception as e:
+            logger.error('Error writing SQLite database: %s', e)
+            return False
+
+    def is_empty(self):
+        conn = self._connect()
+        for table in ('employees', 'attendance', 'leaderboard'):
+            if conn.execute(f'SELECT 1 FROM {table} LIMIT 1').fetchone():
+                return False
+        return True
+
+    def get_employee(self, email):
+        row = self._connect().execute('SELECT * FROM employees WHERE email = ?', (email,)).fetchone()
+        return self._employee(row) if row else None
+
+    def iter_employees(self, email=None):
+        where, params = ('WHERE email = ?', (email,)) if email is not None else ('', ())
+        for row in self._connect().execute(f'SELECT * FROM employees {where} ORDER BY rowid', params):
+            yield self._employee(row)
+
+    def put_employee(self, employee):
+        with self._writing() as conn:
+            conn.execute(self._PUT_EMPLOYEE, self._employee_params(employee))
+        return True
+
+    def put_employees(self, employees):
+        with self._writing() as conn:
+            conn.executemany(self._PUT_EMPLOYEE, map(self._employee_params, employees))
+        return True
+
+    def delete_employee(self, email):
+        with self._writing() as conn:
+            return conn.execute('DELETE FROM employees WHERE email = ?', (email,)).rowcount > 0
+
+    def get_attendance(self, email, date, breaks=True):
+        row = self._connect().execute(
+            'SELECT * FROM attendance WHERE email = ? AND date = ?', (email, date)).fetchone()
+        if row is None:
+            return None
+        record = self._attendance(row)
+        if breaks:
+            record['breaks'] = self._breaks(email, date)
+        return record
+
+    def iter_attendance(self, email=None, start=None, end=None, status=None,
+                        descending=False, after=None, breaks=True):
+        conditions, params = [], []
+        if email is not None:
+            conditions.append('email = ?')
+            params.append(email)
+        if start is not None:
+            conditions.append('date >= ?')
+            params.append(start)
+        if end is not None:
+            conditions.append('date <= ?')
+            params.append(end)
+        if status is not None:
+            conditions.append('status = ?')
+            params.append(status)
+        if after is not None:
+            conditions.append('(date, email) < (?, ?)' if descending else '(date, email) > (?, ?)')
+            params.extend(after)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        order = 'DESC' if descending else 'ASC'
+
+        query = f'SELECT * FROM attendance {where} ORDER BY date {order}, email {order}'
+        for row in self._connect().execute(query, params):
+            record = self._attendance(row)
+            if breaks:
+                # A primary key lookup per record keeps a page O(page)
+                record['breaks'] = self._breaks(record['email'], record['date'])
+            yield record
+
+    def put_attendance(self, record):
+        with self._writing() as conn:
+            self._put_attendance_records(conn, [record])
+        return True
+
+    def get_leaderboard_entry(self, email):
+        row = self._connect().execute('SELECT * FROM leaderboard WHERE email = ?', (email,)).fetchone()
+        return self._leaderboard(row) if row else None
+
+    def iter_leaderboard(self, email=None):
+        where, params = ('WHERE email = ?', (email,)) if email is not None else ('', ())
+        for row in self._connect().execute(f'SELECT * FROM leaderboard {where} ORDER BY rowid', params):
+            yield self._leaderboard(row)
+
+    def put_leaderboard_entry(self, entry):
+        with self._writing() as conn:
+            conn.execute(self._PUT_LEADERBOARD, self._leaderboard_params(entry))
+        return True
+
+    def put_leaderboard_entries(self, entries):
+        with self._writing() as conn:
+            conn.executemany(self._PUT_LEADERBOARD, map(self._leaderboard_params, entries))
+        return True
+
+    def put_many(self, employees=(), attendance=(), leaderboard=(), ledger=()):
+        with self._writing() as conn:
+            conn.executemany(self._PUT_EMPLOYEE, map(self._employee_params, employees))
+            self._put_attendance_records(conn, list(attendance))
+            conn.executemany(self._PUT_LEADERBOARD, map(self._leaderboard_params, leaderboard))
+            conn.executemany(self._PUT_LEDGER, map(self._ledger_params, ledger))
+        return True
+
+    def get_ledger_entry(self, entry_id, day=None):
+        row = self._connect().execute('SELECT * FROM ledger WHERE id = ?', (entry_id,)).fetchone()
+        return self._ledger(row) if row else None
+
+    def iter_ledger(self):
+        for row in self._connect().execute('SELECT * FROM ledger ORDER BY rowid'):
+            yield self._ledger(row)
+
+    def leaderboard_top(self, limit):
+        rows = self._connect().execute(
+            'SELECT * FROM leaderboard ORDER BY total_points DESC, email LIMIT ?', (limit,))
+        return [{**self._leaderboard(row), 'rank': rank} for rank, row in enumerate(rows, 1)]
+
+    def _ranking(self):
+        """Return the leaderboard as sorted (-points, email) keys plus email -> points
+
+        Triggers bump leaderboard_version on every change to the table, from
+        any process, so the ranking is read once per change and each rank
+        is then a bisect. The version is read before the rows: a ranking
+        newer than its version is only rebuilt once more.
+        """
+        conn = self._connect()
+        version = conn.execute("SELECT value FROM meta WHERE key = 'leaderboard_version'").fetchone()[0]
+        with self._ranking_lock:
+            if self._ranking_cache[0] == version:
+                return self._ranking_cache[1:]
+
+        rows = conn.execute('SELECT total_points, email FROM leaderboard ORDER BY total_points DESC, email').fetchall()
+        keys = [(-row['total_points'], row['email']) for row in rows]
+        points = {row['email']: row['total_points'] for row in rows}
+        with self._ranking_lock:
+            self._ranking_cache = (version, keys, points)
+        return keys, points
+
+    def leaderboard_rank(self, email):
+        conn = self._connect()
+        if self._local.depth:
+            # Inside a transaction the changes are not committed yet and
+            # may be rolled back, so they must not be cached; count instead
+            row = conn.execute('SELECT total_points FROM leaderboard WHERE email = ?', (email,)).fetchone()
+            if row is None:
+                return None
+            points = row['total_points']
+            ahead = conn.execute(
+                'SELECT (SELECT COUNT(*) FROM leaderboard WHERE total_points > ?)'
+                ' + (SELECT COUNT(*) FROM leaderboard WHERE total_points = ? AND email < ?)',
+                (points, points, email)).fetchone()[0]
+            return ahead + 1
+
+        keys, points = self._ranking()
+        if email not in points:
+            return None
+        return bisect.bisect_left(keys, (-points[email], email)) + 1
+
+    def get_schedule(self, name):
+        row = self._connect().execute('SELECT * FROM schedules WHERE name = ?', (name,)).fetchone()
+        return self._schedule(row) if row else None
+
+    def list_schedules(self):
+        return [self._schedule(row) for row in self._connect().execute('SELECT * FROM schedules ORDER BY rowid')]
+
+    def put_schedule(self, schedule):
+        with self._writing() as conn:
+            conn.execute(self._PUT_SCHEDULE, self._schedule_params(schedule))
+        return True
+
+    def delete_schedule(self, name):
+        with self._writing() as conn:
+            return conn.execute('DELETE FROM schedules WHERE name = ?', (name,)).rowcount > 0
+
+
+def create_repository(backend, excel_file, journal_file, sqlite_file, durability='log'):
+    """Create the configured repository
+
+    A fresh SQLite database is seeded from the workbook if one exists, so
+    switching backends keeps existing data.
+    """
+    if backend == 'excel':
+        return ExcelRepository(excel_file, journal_file, durability)
+    if backend != 'sqlite':
+        raise ValueError(f'Unknown storage backend: {backend}')
+
+    repository = SQLiteRepository(sqlite_file, durability)
+    if repository.is_empty() and os.path.exists(excel_file):
+        data = ExcelRepository(excel_file, journal_file).load()
+        if repository.save(data):
+            print(f'Imported {excel_file} into {sqlite_file}')
+    return repository
@@ -0,0 +1,110 @@
+"""
+Shared fixtures for the WorkoHolic tests
+Every store lives under the test's tmp_path, so nothing in data/ is touched.
+"""
+
+import json
+import os
+import sqlite3
+import sys
+
+import pytest
+from openpyxl import Workbook
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import ExcelRepository, SQLiteRepository, empty_data  # noqa: E402
+from timestamps import parse_timestamp, to_epoch  # noqa: E402
+
+
+def excel_repository(directory, **options):
+    """An ExcelRepository with its workbook, journal and archive in directory"""
+    options.setdefault('save_delay', 60)
+    return ExcelRepository(os.path.join(directory, 'workholic-data.xlsx'),
+                           os.path.join(directory, 'workholic-journal.jsonl'), **options)
+
+def reopen(repository):
+    """A second repository on the same files, as another worker process would have"""
+    if isinstance(repository, SQLiteRepository):
+        return SQLiteRepository(repository.path, repository.durability)
+    return excel_repository(os.path.dirname(repository.path), durability=repository.durability)
+
+def write_baseline_workbook(path, employees=(), attendance=(), leaderboard=()):
+    """A workbook as the first release wrote it
+
+    Three sheets only, clock times as ISO text and each day's breaks as a
+    JSON column; values are written exactly as given.
+    """
+    workbook = Workbook()
+    workbook.remove(workbook.active)
+    sheet = workbook.create_sheet('Employees')
+    sheet.append(['Email', 'Name', 'Role', 'Schedule', 'Password'])
+    for employee in employees:
+        sheet.append([employee['email'], employee['name'], employee['role'], employee['schedule'],
+                      employee['password'] or ''])
+    sheet = workbook.create_sheet('Attendance')
+    sheet.append(['Email', 'Date', 'Clock In', 'Clock Out', 'Breaks', 'Status'])
+    for record in attendance:
+        breaks = record['breaks'] if isinstance(record['breaks'], str) else json.dumps(record['breaks'])
+        sheet.append([record['email'], record['date'], record['clockIn'] or '', record['clockOut'] or '',
+                      breaks, record['status']])
+    sheet = workbook.create_sheet('Leaderboard')
+    sheet.append(['Email', 'Name', 'Total Points', 'Attendance Points', 'Small Tasks', 'Regular Tasks', 'Big Tasks'])
+    for entry in leaderboard:
+        sheet.append([entry['email'], entry['name'], entry['totalPoints'], entry['attendancePoints'],
+                      entry['smallTasks'], entry['regularTasks'], entry['bigTasks']])
+    workbook.save(path)
+
+def write_legacy_database(path, attendance=(), version=0):
+    """A database as an older SQLite backend wrote it, with each day's breaks as JSON
+
+    Version 0 kept clock and break times as ISO text, version 1 as epoch
+    microseconds. A str breaks value is written exactly as given.
+    """
+    def stored(value):
+        if not value:
+            return None
+        return to_epoch(parse_timestamp(value)) if version else value
+
+    def breaks(value):
+        if isinstance(value, str):
+            return value
+        return json.dumps([{**brk, 'start': stored(brk.get('start')), 'end': stored(brk.get('end'))}
+                           for brk in value])
+
+    conn = sqlite3.connect(path)
+    clock_type = 'INTEGER' if version else 'TEXT'
+    conn.executescript(f'''
+        CREATE TABLE employees (email TEXT PRIMARY KEY, name TEXT NOT NULL DEFAULT '', role TEXT,
+                                schedule TEXT, password TEXT);
+        CREATE TABLE attendance (email TEXT NOT NULL, date TEXT NOT NULL, clock_in {clock_type},
+                                 clock_out {clock_type}, breaks TEXT NOT NULL DEFAULT '[]',
+                                 status TEXT NOT NULL DEFAULT 'A', PRIMARY KEY (email, date));
+        CREATE TABLE leaderboard (email TEXT PRIMARY KEY, name TEXT NOT NULL DEFAULT '',
+                                  total_points INTEGER NOT NULL DEFAULT 0, attendance_points INTEGER NOT NULL DEFAULT 0,
+                                  small_tasks INTEGER NOT NULL DEFAULT 0, regular_tasks INTEGER NOT NULL DEFAULT 0,
+                                  big_tasks INTEGER NOT NULL DEFAULT 0);
+        PRAGMA user_version = {version};
+    ''')
+    conn.executemany('INSERT INTO attendance VALUES (?, ?, ?, ?, ?, ?)', [
+        (record['email'], record['date'], stored(record['clockIn']), stored(record['clockOut']),
+         breaks(record['breaks']), record['status'])
+        for record in attendance])
+    conn.commit()
+    conn.close()
+
+@pytest.fixture
+def excel_repo(tmp_path):
+    """An empty Excel store; writes go to the journal until compacted"""
+    repository = excel_repository(str(tmp_path))
+    repository.save(empty_data())
+    return repository
+
+@pytest.fixture
+def sqlite_repo(tmp_path):
+    return SQLiteRepository(str(tmp_path / 'workholic.db'))
+
+@pytest.fixture(params=['excel', 'sqlite'])
+def repo(request):
+    """Each backend in turn"""
+    return request.getfixturevalue(f'{request.param}_repo')
@@ -0,0 +1,129 @@
+"""Monthly attendance partitions in the Excel backend"""
+
+import os
+
+import pytest
+
+import storage
+from conftest import excel_repository
+from ledger import attendance_entry, task_entry
+from storage import empty_data, read_workbook
+
+
+def record(email, day, status='FD'):
+    return {'email': email, 'date': day, 'clockIn': None, 'clockOut': None, 'status': status, 'breaks': []}
+
+def workbook_days(repository):
+    return sorted(item['date'] for item in read_workbook(repository.path, ['attendance'])['attendance'])
+
+@pytest.fixture
+def march(monkeypatch):
+    """Pretend it is March 2025, so earlier months are archived"""
+    monkeypatch.setattr(storage, '_current_month', lambda: '2025-03')
+
+RECORDS = [record('anna@example.com', '2025-01-31'), record('ben@example.com', '2025-02-03'),
+           record('anna@example.com', '2025-02-28', 'HD'), record('anna@example.com', '2025-03-03')]
+
+
+def test_a_save_moves_past_months_to_the_archive(excel_repo, march):
+    assert excel_repo.save({**empty_data(), 'attendance': RECORDS})
+
+    assert excel_repo.archive.months() == ['2025-01', '2025-02']
+    assert workbook_days(excel_repo) == ['2025-03-03']
+    assert excel_repo.get_attendance('anna@example.com', '2025-02-28')['status'] == 'HD'
+    assert excel_repo.load()['attendance'] == RECORDS
+
+def test_queries_span_the_archive_and_the_workbook(excel_repo, march, tmp_path):
+    excel_repo.save({**empty_data(), 'attendance': RECORDS})
+    reopened = excel_repository(str(tmp_path))
+
+    assert [item['date'] for item in reopened.iter_attendance(email='anna@example.com')] == [
+        '2025-01-31', '2025-02-28', '2025-03-03']
+    assert [item['date'] for item in reopened.iter_attendance(start='2025-02-01', end='2025-03-31',
+                                                              descending=True)] == [
+        '2025-03-03', '2025-02-28', '2025-02-03']
+    after = ('2025-02-03', 'ben@example.com')
+    assert [item['date'] for item in reopened.iter_attendance(after=after)] == ['2025-02-28', '2025-03-03']
+    assert [item['email'] for item in reopened.iter_attendance(status='HD')] == ['anna@example.com']
+
+def test_compaction_archives_a_month_once_it_is_over(excel_repo, monkeypatch):
+    monkeypatch.setattr(storage, '_current_month', lambda: '2025-02')
+    excel_repo.put_many(attendance=RECORDS[1:3])
+    excel_repo.compact()
+    assert excel_repo.archive.months() == []
+
+    monkeypatch.setattr(storage, '_current_month', lambda: '2025-03')
+    excel_repo.put_attendance(RECORDS[3])
+    excel_repo.compact()
+
+    assert excel_repo.archive.months() == ['2025-02']
+    assert workbook_days(excel_repo) == ['2025-03-03']
+    assert [item['date'] for item in excel_repo.iter_attendance()] == ['2025-02-03', '2025-02-28', '2025-03-03']
+
+def test_a_late_change_overrides_the_archive_until_it_is_merged(excel_repo, march):
+    excel_repo.save({**empty_data(), 'attendance': RECORDS})
+    archived = os.path.getmtime(excel_repo.archive.path('2025-02'))
+    excel_repo.put_attendance(record('ben@example.com', '2025-02-03', 'A'))
+
+    assert excel_repo.get_attendance('ben@example.com', '2025-02-03')['status'] == 'A'
+    assert [item['status'] for item in excel_repo.iter_attendance(email='ben@example.com')] == ['A']
+    assert os.path.getmtime(excel_repo.archive.path('2025-02')) == archived
+
+    excel_repo.compact()
+    assert workbook_days(excel_repo) == ['2025-03-03']
+    assert excel_repo.archive.partition('2025-02').find('ben@example.com', '2025-02-03') is not None
+    assert excel_repo.get_attendance('ben@example.com', '2025-02-03')['status'] == 'A'
+
+
+def ledger_entry(email, day, status='FD'):
+    return {**attendance_entry(email, day, status), 'ts': f'{day}T19:00:00'}
+
+LEDGER = [ledger_entry('anna@example.com', '2025-01-31'), ledger_entry('ben@example.com', '2025-02-03'),
+          {**task_entry('anna@example.com', 'big', 1), 'date': '2025-02-10'},
+          ledger_entry('anna@example.com', '2025-03-03')]
+
+def workbook_ledger(repository):
+    return [entry['id'] for entry in read_workbook(repository.path, ['ledger'])['ledger']]
+
+
+def test_a_save_moves_past_months_of_the_ledger_to_the_archive(excel_repo, march, tmp_path):
+    assert excel_repo.save({**empty_data(), 'ledger': LEDGER})
+
+    assert excel_repo.ledger_archive.months() == ['2025-01', '2025-02']
+    assert workbook_ledger(excel_repo) == [LEDGER[3]['id']]
+    reopened = excel_repository(str(tmp_path))
+    assert list(reopened.iter_ledger()) == LEDGER
+    assert reopened.get_ledger_entry(LEDGER[1]['id'], '2025-02-03') == LEDGER[1]
+    assert reopened.get_ledger_entry(LEDGER[2]['id']) == LEDGER[2]
+    assert reopened.get_ledger_entry('attendance:anna@example.com:2025-02-04', '2025-02-04') is None
+    assert reopened.load()['ledger'] == LEDGER
+
+def test_a_save_without_a_ledger_keeps_the_archived_months(excel_repo, march):
+    excel_repo.save({**empty_data(), 'ledger': LEDGER})
+    excel_repo.save({'employees': [], 'attendance': [], 'leaderboard': []})
+    assert list(excel_repo.iter_ledger()) == LEDGER
+
+    excel_repo.save({**empty_data(), 'ledger': LEDGER[3:]})
+    assert excel_repo.ledger_archive.months() == []
+    assert list(excel_repo.iter_ledger()) == LEDGER[3:]
+
+def test_compaction_archives_the_ledger_and_merges_late_entries(excel_repo, march, monkeypatch):
+    monkeypatch.setattr(storage, '_current_month', lambda: '2025-02')
+    excel_repo.put_many(ledger=LEDGER[1:3])
+    excel_repo.compact()
+    assert excel_repo.ledger_archive.months() == []
+
+    monkeypatch.setattr(storage, '_current_month', lambda: '2025-03')
+    excel_repo.put_many(ledger=LEDGER[3:])
+    excel_repo.compact()
+    assert excel_repo.ledger_archive.months() == ['2025-02']
+    assert workbook_ledger(excel_repo) == [LEDGER[3]['id']]
+
+    # Re-scoring an archived day replaces the entry where it was
+    rescored = ledger_entry('ben@example.com', '2025-02-03', 'HD')
+    excel_repo.put_many(ledger=[rescored])
+    assert list(excel_repo.iter_ledger()) == [rescored, LEDGER[2], LEDGER[3]]
+    excel_repo.compact()
+    assert workbook_ledger(excel_repo) == [LEDGER[3]['id']]
+    assert excel_repo.ledger_archive.partition('2025-02').records() == [rescored, LEDGER[2]]
+    assert list(excel_repo.iter_ledger()) == [rescored, LEDGER[2], LEDGER[3]]
@@ -0,0 +1,98 @@
+"""Breaks kept per day, apart from the attendance summary, and their migration"""
+
+import logging
+from datetime import datetime
+
+from conftest import excel_repository, reopen, write_baseline_workbook, write_legacy_database
+from storage import SQLiteRepository
+
+UNREADABLE = '[{"start": "2025-03-03T13:00:00", "end": '
+
+LEGACY = [
+    {'email': 'anna@example.com', 'date': '2025-03-03', 'clockIn': '2025-03-03T10:30:00Z',
+     'clockOut': '2025-03-03T19:00:00Z', 'status': 'FD',
+     'breaks': [{'start': '2025-03-03T13:00:00Z', 'end': '2025-03-03T13:30:00.250Z'},
+                {'start': '2025-03-03T16:00:00', 'end': None}]},
+    {'email': 'ben@example.com', 'date': '2025-03-03', 'clockIn': '2025-03-03T10:45:00',
+     'clockOut': '2025-03-03T18:45:00', 'status': 'FD', 'breaks': UNREADABLE},
+]
+
+EXPECTED = [
+    {'email': 'anna@example.com', 'date': '2025-03-03', 'clockIn': datetime(2025, 3, 3, 10, 30),
+     'clockOut': datetime(2025, 3, 3, 19, 0), 'status': 'FD',
+     'breaks': [{'start': datetime(2025, 3, 3, 13, 0), 'end': datetime(2025, 3, 3, 13, 30, 0, 250000)},
+                {'start': datetime(2025, 3, 3, 16, 0), 'end': None}]},
+    # Kept, with the unreadable breaks reported rather than failing the whole store
+    {'email': 'ben@example.com', 'date': '2025-03-03', 'clockIn': datetime(2025, 3, 3, 10, 45),
+     'clockOut': datetime(2025, 3, 3, 18, 45), 'status': 'FD', 'breaks': []},
+]
+
+TODAY = datetime.now().strftime('%Y-%m-%d')
+
+def at(hour, minute=0):
+    return datetime.strptime(TODAY, '%Y-%m-%d').replace(hour=hour, minute=minute)
+
+def clocked_out():
+    return {'email': 'anna@example.com', 'date': TODAY, 'clockIn': at(10), 'clockOut': at(19), 'status': 'FD',
+            'breaks': [{'start': at(13), 'end': at(13, 45)}]}
+
+
+def assert_unreadable_reported(caplog):
+    assert any(record.levelno == logging.WARNING and 'ben@example.com' in record.getMessage()
+               and repr(UNREADABLE) in record.getMessage() for record in caplog.records)
+
+def test_a_legacy_workbook_moves_its_breaks_to_their_own_sheet(tmp_path, caplog):
+    repository = excel_repository(str(tmp_path))
+    write_baseline_workbook(repository.path, attendance=LEGACY)
+
+    with caplog.at_level(logging.WARNING, logger='storage'):
+        assert repository.migrate()
+
+    assert_unreadable_reported(caplog)
+    assert excel_repository(str(tmp_path)).list_attendance() == EXPECTED
+
+def test_a_version_0_database_with_unreadable_breaks_is_migrated(tmp_path, caplog):
+    path = str(tmp_path / 'workholic.db')
+    write_legacy_database(path, LEGACY)
+
+    with caplog.at_level(logging.WARNING, logger='storage'):
+        repository = SQLiteRepository(path)
+
+    assert_unreadable_reported(caplog)
+    assert repository.list_attendance() == EXPECTED
+
+def test_a_version_1_database_moves_its_breaks_to_their_own_table(tmp_path):
+    path = str(tmp_path / 'workholic.db')
+    write_legacy_database(path, LEGACY[:1], version=1)
+
+    repository = SQLiteRepository(path)
+
+    assert repository.list_attendance() == EXPECTED[:1]
+    conn = repository._connect()
+    assert 'breaks' not in {row['name'] for row in conn.execute('PRAGMA table_info(attendance)')}
+    assert conn.execute('SELECT COUNT(*) FROM breaks').fetchone()[0] == 2
+
+def test_a_record_without_breaks_keeps_the_stored_breaks(repo):
+    record = clocked_out()
+    repo.put_attendance(record)
+    summary = {key: value for key, value in record.items() if key != 'breaks'}
+
+    repo.put_attendance({**summary, 'status': 'HD'})
+
+    assert repo.get_attendance('anna@example.com', TODAY) == {**record, 'status': 'HD'}
+    assert reopen(repo).get_attendance('anna@example.com', TODAY) == {**record, 'status': 'HD'}
+
+def test_an_empty_breaks_list_clears_them(repo):
+    repo.put_attendance(clocked_out())
+    repo.put_attendance({**clocked_out(), 'breaks': []})
+    assert reopen(repo).get_attendance('anna@example.com', TODAY)['breaks'] == []
+
+def test_summary_reads_leave_the_breaks_out(repo):
+    record = clocked_out()
+    repo.put_attendance(record)
+    summary = {key: value for key, value in record.items() if key != 'breaks'}
+
+    assert repo.get_attendance('anna@example.com', TODAY, breaks=False) == summary
+    assert list(repo.iter_attendance(breaks=False)) == [summary]
+    assert list(repo.iter_attendance(email='anna@example.com', breaks=False)) == [summary]
+    assert list(repo.iter_attendance()) == [record]
@@ -0,0 +1,85 @@
+"""End-of-day close-out: absences, open shifts, pending shifts and re-runs"""
+
+from datetime import date, datetime
+
+import pytest
+
+import app
+from schedules import DEFAULT_SCHEDULES, ScheduleRegistry
+
+MONDAY = date(2025, 3, 3)
+SUNDAY = date(2025, 3, 9)
+AFTER_HOURS = datetime(2025, 3, 3, 23, 0)
+
+
+@pytest.fixture
+def store(repo, monkeypatch):
+    """The app wired to a test repository holding the default schedules"""
+    for name, definition in DEFAULT_SCHEDULES.items():
+        repo.put_schedule({'name': name, 'definition': definition})
+    repo.put_employees([
+        {'email': 'admin@example.com', 'name': 'Admin', 'role': 'admin', 'schedule': 'general', 'password': 'x'},
+        {'email': 'anna@example.com', 'name': 'Anna', 'role': 'employee', 'schedule': 'general', 'password': 'x'},
+        {'email': 'ben@example.com', 'name': 'Ben', 'role': 'employee', 'schedule': 'general', 'password': 'x'},
+    ])
+    monkeypatch.setattr(app, 'repository', repo)
+    monkeypatch.setattr(app, 'schedule_registry', ScheduleRegistry(repo))
+    return repo
+
+def clock_in(repository, email, at, breaks=()):
+    repository.put_attendance({'email': email, 'date': at.strftime('%Y-%m-%d'), 'clockIn': at,
+                               'clockOut': None, 'breaks': list(breaks), 'status': 'HD'})
+
+
+def test_missing_days_are_absences_and_open_shifts_are_closed(store):
+    clock_in(store, 'ben@example.com', datetime(2025, 3, 3, 10, 30),
+             [{'start': datetime(2025, 3, 3, 14, 0), 'end': None}])
+
+    summary = app.close_out_day(MONDAY, now=AFTER_HOURS)
+
+    assert summary == {'date': '2025-03-03', 'absent': ['anna@example.com'],
+                       'closed': ['ben@example.com'], 'pending': []}
+    assert store.get_attendance('admin@example.com', '2025-03-03') is None
+    assert store.get_attendance('anna@example.com', '2025-03-03')['status'] == 'A'
+    closed = store.get_attendance('ben@example.com', '2025-03-03')
+    assert closed['clockOut'] == datetime(2025, 3, 3, 19, 0)
+    assert closed['breaks'][0]['end'] == datetime(2025, 3, 3, 19, 0)
+    assert closed['status'] == 'HD'
+    assert store.get_leaderboard_entry('anna@example.com')['attendancePoints'] == -1
+    assert store.get_leaderboard_entry('ben@example.com')['attendancePoints'] == 1
+
+def test_running_it_again_changes_nothing(store):
+    clock_in(store, 'ben@example.com', datetime(2025, 3, 3, 10, 30))
+    app.close_out_day(MONDAY, now=AFTER_HOURS)
+    ledger = list(store.iter_ledger())
+    board = store.list_leaderboard()
+
+    summary = app.close_out_day(MONDAY, now=AFTER_HOURS)
+
+    assert summary['absent'] == summary['closed'] == summary['pending'] == []
+    assert list(store.iter_ledger()) == ledger
+    assert store.list_leaderboard() == board
+
+def test_shifts_that_have_not_ended_are_left_pending(store):
+    clock_in(store, 'ben@example.com', datetime(2025, 3, 3, 10, 30))
+
+    summary = app.close_out_day(MONDAY, now=datetime(2025, 3, 3, 12, 0))
+
+    assert summary['pending'] == ['anna@example.com', 'ben@example.com']
+    assert summary['absent'] == summary['closed'] == []
+    assert store.get_attendance('anna@example.com', '2025-03-03') is None
+    assert store.get_attendance('ben@example.com', '2025-03-03')['clockOut'] is None
+    assert list(store.iter_ledger()) == []
+
+    summary = app.close_out_day(MONDAY, now=AFTER_HOURS)
+    assert (summary['absent'], summary['closed']) == (['anna@example.com'], ['ben@example.com'])
+
+def test_a_shift_started_after_hours_closes_at_its_clock_in(store):
+    clock_in(store, 'ben@example.com', datetime(2025, 3, 3, 20, 15))
+    app.close_out_day(MONDAY, now=AFTER_HOURS)
+    assert store.get_attendance('ben@example.com', '2025-03-03')['clockOut'] == datetime(2025, 3, 3, 20, 15)
+
+def test_days_off_are_not_absences(store):
+    summary = app.close_out_day(SUNDAY, now=datetime(2025, 3, 10, 9, 0))
+    assert summary['absent'] == summary['pending'] == []
+    assert list(store.iter_attendance()) == []
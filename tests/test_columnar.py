@@ -0,0 +1,130 @@
+"""AttendanceColumns: exact round trips, exception rows, lookups and queries"""
+
+import itertools
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+from columnar import AttendanceColumns
+
+EMAILS = ['anna@example.com', 'ben@example.com', 'carl@example.com']
+STATUSES = ['FD', 'HD', 'A', 'L']
+
+
+def record(email, day, status='FD', breaks=()):
+    at = datetime.fromisoformat(day)
+    return {'email': email, 'date': day, 'clockIn': at.replace(hour=10, minute=30),
+            'clockOut': at.replace(hour=19) if status != 'HD' else None, 'status': status,
+            'breaks': [dict(brk) for brk in breaks]}
+
+def month():
+    """A month of attendance: three employees, some days skipped, varied statuses and breaks"""
+    records = []
+    for n, (offset, email) in enumerate(itertools.product(range(28), EMAILS)):
+        if n % 7 == 3:
+            continue
+        day = (date(2025, 2, 1) + timedelta(days=offset)).isoformat()
+        at = datetime.fromisoformat(day)
+        breaks = [{'start': at.replace(hour=13), 'end': at.replace(hour=13, minute=n % 60)}] * (n % 3)
+        records.append(record(email, day, STATUSES[n % len(STATUSES)], breaks))
+    return records
+
+def ordered(records):
+    return sorted(records, key=lambda r: (r['date'], r['email']))
+
+
+def test_records_come_back_exactly_in_date_and_email_order():
+    records = month()
+    records[5]['breaks'] = [{'start': records[5]['clockIn'] + timedelta(hours=2), 'end': None}]
+    records[6]['clockIn'] = datetime(2025, 2, 3, 10, 30, 15, 123000)
+    columns = AttendanceColumns(list(reversed(records)))
+
+    assert columns.records() == ordered(records)
+    assert columns.exceptions == {}
+    assert len(columns) == len(records)
+
+def test_returned_records_are_copies():
+    columns = AttendanceColumns([record('anna@example.com', '2025-02-03',
+                                        breaks=[{'start': datetime(2025, 2, 3, 13), 'end': None}])])
+    columns.record(0)['breaks'][0]['end'] = datetime(2025, 2, 3, 14)
+    columns.record(0)['status'] = 'A'
+    assert columns.record(0) == record('anna@example.com', '2025-02-03',
+                                       breaks=[{'start': datetime(2025, 2, 3, 13), 'end': None}])
+
+def test_the_first_of_duplicate_keys_is_kept():
+    columns = AttendanceColumns([record('anna@example.com', '2025-02-03', 'FD'),
+                                 record('anna@example.com', '2025-02-03', 'A')])
+    assert [r['status'] for r in columns.records()] == ['FD']
+
+@pytest.mark.parametrize('odd', [
+    # Legacy text timestamps, 'Z' suffix and all
+    {'clockIn': '2025-02-04T10:30:00.000Z', 'clockOut': '2025-02-04T19:00:00.000Z'},
+    {'breaks': [{'start': '2025-02-04T13:00:00Z', 'end': '2025-02-04T13:30:00Z'}]},
+    # Malformed breaks
+    {'breaks': [{'start': datetime(2025, 2, 4, 13), 'end': None, 'reason': 'lunch'}]},
+    {'breaks': [{'start': datetime(2025, 2, 4, 13)}]},
+    {'breaks': ['13:00-13:30']},
+    {'breaks': None},
+    # Times that would not decode to the same value
+    {'clockIn': datetime(2025, 2, 4, 10, 30, tzinfo=timezone.utc)},
+    {'clockIn': '2025-02-04'},
+])
+def test_records_that_would_not_round_trip_are_kept_as_they_are(odd):
+    records = [record('anna@example.com', '2025-02-03'), {**record('anna@example.com', '2025-02-04', 'HD'), **odd},
+               record('anna@example.com', '2025-02-05', 'HD')]
+    columns = AttendanceColumns(records)
+
+    assert list(columns.exceptions) == [1]
+    assert columns.records() == records
+    # Neighbouring rows are unaffected by the times a failed row half wrote
+    assert columns.record(2) == records[2]
+    assert columns.key(1) == ('2025-02-04', 'anna@example.com')
+    assert list(columns.rows(status='HD')) == [1, 2]
+    summary = columns.record(1, breaks=False)
+    assert 'breaks' not in summary and summary['clockIn'] == records[1]['clockIn']
+
+def test_summary_rows_leave_out_the_breaks():
+    records = month()
+    columns = AttendanceColumns(records)
+    assert [columns.record(row, breaks=False) for row in range(len(columns))] == [
+        {key: value for key, value in r.items() if key != 'breaks'} for r in ordered(records)]
+
+def test_find_returns_the_row_of_a_key():
+    records = month()
+    columns = AttendanceColumns(records)
+
+    for r in records:
+        assert columns.record(columns.find(r['email'], r['date'])) == r
+    assert columns.find('nobody@example.com', '2025-02-03') is None
+    assert columns.find('anna@example.com', '2025-03-01') is None
+    skipped = {(r['email'], r['date']) for r in records}
+    missing = next((email, day) for day in sorted({r['date'] for r in records}) for email in EMAILS
+                   if (email, day) not in skipped)
+    assert columns.find(*missing) is None
+
+QUERIES = [{}, {'email': 'ben@example.com'}, {'email': 'nobody@example.com'}, {'status': 'HD'}, {'status': 'X'},
+           {'start': '2025-02-10'}, {'end': '2025-02-10'}, {'start': '2025-02-05', 'end': '2025-02-05'},
+           {'start': '2025-02-20', 'end': '2025-02-10'}, {'start': '2024-12-01', 'end': '2025-12-31'},
+           {'email': 'anna@example.com', 'start': '2025-02-03', 'end': '2025-02-17', 'status': 'FD'}]
+CURSORS = [None, ('2025-02-10', 'ben@example.com'), ('2025-02-10', 'aaron@example.com'),
+           ('2025-01-01', 'anna@example.com'), ('2025-02-28', 'zed@example.com')]
+
+@pytest.mark.parametrize('query', QUERIES)
+@pytest.mark.parametrize('after', CURSORS)
+@pytest.mark.parametrize('descending', [False, True])
+def test_rows_match_a_scan_of_the_records(query, after, descending):
+    records = ordered(month())
+    columns = AttendanceColumns(records)
+
+    def matches(r):
+        key = (r['date'], r['email'])
+        return ((query.get('email') is None or r['email'] == query['email'])
+                and (query.get('status') is None or r['status'] == query['status'])
+                and (query.get('start') is None or r['date'] >= query['start'])
+                and (query.get('end') is None or r['date'] <= query['end'])
+                and (after is None or (key < after if descending else key > after)))
+    expected = [r for r in records if matches(r)]
+    if descending:
+        expected.reverse()
+
+    assert [columns.record(row) for row in columns.rows(after=after, descending=descending, **query)] == expected
@@ -0,0 +1,99 @@
+"""ETags on GET endpoints: 304s without running the view, and tags that change with the data"""
+
+import pytest
+
+import app
+from conftest import reopen
+from schedules import ScheduleRegistry
+
+ADMIN = {'email': 'admin@example.com', 'name': 'Admin', 'role': 'admin', 'schedule': 'general'}
+
+
+@pytest.fixture
+def client(repo, monkeypatch):
+    repo.put_employees([{**ADMIN, 'password': 'x'},
+                        {**ADMIN, 'email': 'root@example.com', 'name': 'Root', 'password': 'x'}])
+    monkeypatch.setattr(app, 'repository', repo)
+    monkeypatch.setattr(app, 'schedule_registry', ScheduleRegistry(repo))
+    client = app.app.test_client()
+    sign_in(client, ADMIN)
+    return client
+
+def sign_in(client, user):
+    with client.session_transaction() as session:
+        session['user'] = user
+
+@pytest.fixture
+def view_calls(repo, monkeypatch):
+    """How many times /api/admin/users read the employees"""
+    calls = []
+    list_employees = repo.list_employees
+    monkeypatch.setattr(repo, 'list_employees', lambda *args: calls.append(args) or list_employees(*args))
+    return calls
+
+
+def test_a_matching_tag_is_answered_without_running_the_view(client, view_calls):
+    first = client.get('/api/admin/users')
+    assert first.status_code == 200 and first.get_json()['success']
+    assert first.headers['Cache-Control'] == 'private, no-cache'
+    etag = first.headers['ETag']
+
+    again = client.get('/api/admin/users', headers={'If-None-Match': etag})
+
+    assert again.status_code == 304
+    assert again.data == b''
+    assert again.headers['ETag'] == etag
+    assert len(view_calls) == 1
+
+def test_a_stale_tag_gets_the_full_response(client, view_calls):
+    etag = client.get('/api/admin/users').headers['ETag']
+
+    response = client.get('/api/admin/users', headers={'If-None-Match': '"something-else"'})
+
+    assert response.status_code == 200
+    assert response.headers['ETag'] == etag
+    assert len(view_calls) == 2
+
+def test_the_tag_changes_after_a_write(client, repo):
+    etag = client.get('/api/admin/users').headers['ETag']
+
+    repo.put_employee({'email': 'ben@example.com', 'name': 'Ben', 'role': 'employee', 'schedule': 'general',
+                       'password': 'x'})
+    response = client.get('/api/admin/users', headers={'If-None-Match': etag})
+
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert 'ben@example.com' in [user['email'] for user in response.get_json()['users']]
+
+def test_the_tag_changes_after_a_write_by_another_process(client, repo):
+    etag = client.get('/api/admin/users').headers['ETag']
+
+    reopen(repo).put_employee({'email': 'ben@example.com', 'name': 'Ben', 'role': 'employee',
+                               'schedule': 'general', 'password': 'x'})
+    response = client.get('/api/admin/users', headers={'If-None-Match': etag})
+
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+def test_each_user_and_query_gets_its_own_tag(client):
+    tags = {}
+    for user, query in [(ADMIN, ''), (ADMIN, '?status=FD'), (ADMIN, '?status=A'), ({**ADMIN, 'email': 'root@example.com'}, '')]:
+        sign_in(client, user)
+        tags[user['email'], query] = client.get(f'/api/admin/attendance{query}').headers['ETag']
+    tags['schedules'] = client.get('/api/admin/schedules').headers['ETag']
+
+    assert len(set(tags.values())) == len(tags)
+
+    # Another admin's tag does not validate this admin's copy
+    sign_in(client, ADMIN)
+    response = client.get('/api/admin/attendance', headers={'If-None-Match': tags['root@example.com', '']})
+    assert response.status_code == 200
+
+def test_failed_responses_are_not_tagged(client):
+    invalid = client.get('/api/admin/attendance?start=yesterday')
+    assert not invalid.get_json()['success'] and 'ETag' not in invalid.headers
+
+    sign_in(client, {**ADMIN, 'role': 'employee'})
+    unauthorized = client.get('/api/admin/users')
+    assert unauthorized.get_json() == {'success': False, 'message': 'Unauthorized'}
+    assert 'ETag' not in unauthorized.headers
@@ -0,0 +1,113 @@
+"""Background saves and the 'log' / 'full' durability modes"""
+
+import os
+import threading
+import time
+
+import pytest
+
+import storage
+from conftest import excel_repository
+from storage import BackgroundWriter, SQLiteRepository, empty_data, read_workbook
+
+EMPLOYEE = {'email': 'anna@example.com', 'name': 'Anna', 'role': 'employee', 'schedule': 'general',
+            'password': 'secret'}
+
+
+class Saves:
+    """A save function that records its calls and fails while told to"""
+
+    def __init__(self, failures=0):
+        self.calls = 0
+        self.failures = failures
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        with self.lock:
+            self.calls += 1
+            if self.failures:
+                self.failures -= 1
+                raise OSError('disk full')
+
+
+def workbook_emails(repository):
+    return [emp['email'] for emp in read_workbook(repository.path, ['employees'])['employees']]
+
+
+def test_a_burst_of_requests_is_saved_once():
+    saves = Saves()
+    writer = BackgroundWriter(saves, delay=0.05)
+    tickets = [writer.request() for _ in range(5)]
+    writer.wait(tickets[-1])
+    assert saves.calls == 1
+
+    writer.flush()
+    assert saves.calls == 1
+
+def test_flush_skips_the_remaining_delay():
+    saves = Saves()
+    writer = BackgroundWriter(saves, delay=30)
+    writer.request()
+    started = time.monotonic()
+    writer.flush()
+    assert saves.calls == 1
+    assert time.monotonic() - started < 5
+
+def test_a_failed_save_is_raised_to_waiters_and_retried():
+    saves = Saves(failures=1)
+    writer = BackgroundWriter(saves, delay=0.05)
+    ticket = writer.request()
+
+    with pytest.raises(OSError):
+        writer.wait(ticket)
+    # The work is still pending and the retry saves it
+    writer.wait(ticket)
+    assert saves.calls == 2
+
+def test_log_mode_returns_once_the_change_is_journaled(tmp_path):
+    repository = excel_repository(str(tmp_path))
+    repository.save(empty_data())
+    repository.put_employee(EMPLOYEE)
+
+    assert workbook_emails(repository) == []
+    assert os.path.exists(repository.journal_path)
+
+    repository.flush()
+    assert workbook_emails(repository) == ['anna@example.com']
+    assert not os.path.exists(repository.journal_path)
+
+def test_full_mode_returns_once_the_change_is_in_the_workbook(tmp_path):
+    repository = excel_repository(str(tmp_path), durability='full')
+    repository.save(empty_data())
+    repository.put_employee(EMPLOYEE)
+
+    assert workbook_emails(repository) == ['anna@example.com']
+    assert not os.path.exists(repository.journal_path)
+
+def test_full_mode_reports_a_failed_save(tmp_path, monkeypatch):
+    repository = excel_repository(str(tmp_path), durability='full')
+    repository.save(empty_data())
+    write_workbook = storage.write_workbook
+
+    def full_disk(data, path):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(storage, 'write_workbook', full_disk)
+    with pytest.raises(OSError):
+        repository.put_employee(EMPLOYEE)
+    # The change is still in the journal, and reaches the workbook once saving works again
+    assert workbook_emails(repository) == []
+    assert repository.get_employee('anna@example.com') == EMPLOYEE
+
+    monkeypatch.setattr(storage, 'write_workbook', write_workbook)
+    repository.flush()
+    assert workbook_emails(repository) == ['anna@example.com']
+
+@pytest.mark.parametrize('durability, synchronous', [('log', 1), ('full', 2)])
+def test_sqlite_durability_sets_the_synchronous_mode(tmp_path, durability, synchronous):
+    repository = SQLiteRepository(str(tmp_path / 'workholic.db'), durability)
+    assert repository._connect().execute('PRAGMA synchronous').fetchone()[0] == synchronous
+
+def test_an_unknown_durability_mode_is_refused(tmp_path):
+    with pytest.raises(ValueError):
+        excel_repository(str(tmp_path), durability='sometimes')
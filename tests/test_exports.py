@@ -0,0 +1,173 @@
+"""Streamed exports: CSV and JSON Lines extracts and the Excel attendance export"""
+
+import csv
+import io
+import json
+from datetime import datetime
+
+import openpyxl
+import pytest
+
+import app
+from schedules import ScheduleRegistry
+
+EMPLOYEES = [
+    {'email': 'anna@example.com', 'name': 'Anna', 'role': 'employee', 'schedule': 'general', 'password': 'secret-a'},
+    {'email': 'ben@example.com', 'name': 'Ben, Jr.', 'role': 'admin', 'schedule': 'vinay', 'password': 'secret-b'},
+]
+
+def day(date, status, clock_in=None, clock_out=None, breaks=()):
+    at = datetime.fromisoformat(date)
+    time = lambda hhmm: at.replace(hour=int(hhmm[:2]), minute=int(hhmm[3:])) if hhmm else None
+    return {'date': date, 'status': status, 'clockIn': time(clock_in), 'clockOut': time(clock_out),
+            'breaks': [{'start': time(start), 'end': time(end)} for start, end in breaks]}
+
+ATTENDANCE = [
+    {'email': 'anna@example.com', **day('2025-03-03', 'FD', '10:30', '19:00', [('13:00', '13:45'), ('17:00', None)])},
+    {'email': 'ben@example.com', **day('2025-03-03', 'A')},
+    {'email': 'anna@example.com', **day('2025-03-04', 'HD', '10:30', '14:00')},
+    {'email': 'ben@example.com', **day('2025-04-01', 'FD', '10:15', '21:00', [('13:00', '14:00'), ('18:00', '18:10')])},
+]
+
+LEADERBOARD = [
+    {'email': 'anna@example.com', 'name': 'Anna', 'totalPoints': 7, 'attendancePoints': 3, 'smallTasks': 1,
+     'regularTasks': 0, 'bigTasks': 1},
+    {'email': 'ben@example.com', 'name': 'Ben, Jr.', 'totalPoints': 1, 'attendancePoints': 1, 'smallTasks': 0,
+     'regularTasks': 0, 'bigTasks': 0},
+]
+
+# The rows of the attendance export, in (date, email) order
+EXPORTED = [
+    {'name': 'Anna', 'email': 'anna@example.com', 'date': '2025-03-03', 'clockIn': '2025-03-03T10:30:00.000',
+     'clockOut': '2025-03-03T19:00:00.000', 'status': 'FD', 'breakMinutes': 45, 'totalBreaks': 2},
+    {'name': 'Ben, Jr.', 'email': 'ben@example.com', 'date': '2025-03-03', 'clockIn': None, 'clockOut': None,
+     'status': 'A', 'breakMinutes': 0, 'totalBreaks': 0},
+    {'name': 'Anna', 'email': 'anna@example.com', 'date': '2025-03-04', 'clockIn': '2025-03-04T10:30:00.000',
+     'clockOut': '2025-03-04T14:00:00.000', 'status': 'HD', 'breakMinutes': 0, 'totalBreaks': 0},
+    {'name': 'Ben, Jr.', 'email': 'ben@example.com', 'date': '2025-04-01', 'clockIn': '2025-04-01T10:15:00.000',
+     'clockOut': '2025-04-01T21:00:00.000', 'status': 'FD', 'breakMinutes': 70, 'totalBreaks': 2},
+]
+
+
+@pytest.fixture
+def client(repo, monkeypatch):
+    repo.put_employees(EMPLOYEES)
+    for record in ATTENDANCE:
+        repo.put_attendance(record)
+    for entry in LEADERBOARD:
+        repo.put_leaderboard_entry(entry)
+    # Past months are read back from the archive on the Excel backend
+    repo.compact()
+    monkeypatch.setattr(app, 'repository', repo)
+    monkeypatch.setattr(app, 'schedule_registry', ScheduleRegistry(repo))
+    client = app.app.test_client()
+    with client.session_transaction() as session:
+        session['user'] = {'email': 'admin@example.com', 'name': 'Admin', 'role': 'admin', 'schedule': 'general'}
+    return client
+
+def csv_export(client, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    return list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+
+def jsonl_export(client, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+def as_csv(rows):
+    """Rows as csv.DictReader reads them back: every value a string, None empty"""
+    return [{key: '' if value is None else str(value) for key, value in row.items()} for row in rows]
+
+
+def test_attendance_exports_as_csv(client):
+    response = client.get('/api/admin/export/attendance')
+    assert response.headers['Content-Disposition'].startswith('attachment; filename=attendance-export-')
+    assert response.headers['Content-Disposition'].endswith('.csv')
+    assert response.get_data(as_text=True).splitlines()[0] == (
+        'name,email,date,clockIn,clockOut,status,breakMinutes,totalBreaks')
+
+    assert csv_export(client, '/api/admin/export/attendance') == as_csv(EXPORTED)
+
+def test_attendance_exports_as_json_lines(client):
+    assert jsonl_export(client, '/api/admin/export/attendance?format=jsonl') == EXPORTED
+
+@pytest.mark.parametrize('query, rows', [
+    ('email=ben@example.com', [1, 3]),
+    ('start=2025-03-04', [2, 3]),
+    ('end=2025-03-03', [0, 1]),
+    ('start=2025-03-01&end=2025-03-31', [0, 1, 2]),
+    ('date=2025-03-03', [0, 1]),
+    ('status=FD', [0, 3]),
+    ('email=anna@example.com&status=FD&date=2025-03-03', [0]),
+    ('email=nobody@example.com', []),
+])
+def test_attendance_filters(client, query, rows):
+    assert jsonl_export(client, f'/api/admin/export/attendance?format=jsonl&{query}') == [EXPORTED[i] for i in rows]
+    assert csv_export(client, f'/api/admin/export/attendance?{query}') == as_csv([EXPORTED[i] for i in rows])
+
+def test_the_leaderboard_exports_with_an_email_filter(client):
+    assert jsonl_export(client, '/api/admin/export/leaderboard?format=jsonl') == LEADERBOARD
+    assert csv_export(client, '/api/admin/export/leaderboard?email=ben@example.com') == as_csv(LEADERBOARD[1:])
+
+def test_the_users_export_leaves_out_passwords(client):
+    body = client.get('/api/admin/export/users').get_data(as_text=True)
+    assert 'secret' not in body and 'password' not in body.lower()
+    assert csv_export(client, '/api/admin/export/users') == [
+        {key: employee[key] for key in ('email', 'name', 'role', 'schedule')} for employee in EMPLOYEES]
+    assert 'password' not in jsonl_export(client, '/api/admin/export/users?format=jsonl')[0]
+
+@pytest.mark.parametrize('query', ['start=2025-3-01', 'end=yesterday', 'date=2025-02-30', 'start=2025-03-01T00:00'])
+def test_invalid_dates_are_a_bad_request(client, query):
+    response = client.get(f'/api/admin/export/attendance?{query}')
+    assert response.status_code == 400
+    assert response.get_json()['message'].endswith('expected a YYYY-MM-DD date')
+
+@pytest.mark.parametrize('url', ['/api/admin/export/ledger', '/api/admin/export/attendance?format=xml'])
+def test_unknown_exports_are_a_bad_request(client, url):
+    response = client.get(url)
+    assert response.status_code == 400
+    assert response.get_json() == {'success': False, 'message': 'Unknown export'}
+
+def test_exports_need_an_admin(client):
+    with client.session_transaction() as session:
+        session['user'] = {'email': 'anna@example.com', 'name': 'Anna', 'role': 'employee', 'schedule': 'general'}
+    assert client.get('/api/admin/export/users').get_json() == {'success': False, 'message': 'Unauthorized'}
+
+
+def excel_rows(response):
+    assert response.status_code == 200
+    assert response.mimetype == 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    workbook = openpyxl.load_workbook(io.BytesIO(response.get_data()))
+    assert workbook.sheetnames == ['Attendance Data']
+    return [list(row) for row in workbook['Attendance Data'].iter_rows(values_only=True)]
+
+def excel_row(i):
+    """EXPORTED[i] as the Excel export writes it: real datetimes, 'N/A' for a missing clock time"""
+    row = EXPORTED[i]
+    clock = lambda value: datetime.fromisoformat(value) if value else 'N/A'
+    return [row['name'], row['email'], row['date'], clock(row['clockIn']), clock(row['clockOut']), row['status'],
+            row['breakMinutes'], row['totalBreaks']]
+
+@pytest.mark.parametrize('query, rows', [
+    ('', [0, 1, 2, 3]),
+    ('?email=anna@example.com', [0, 2]),
+    ('?start=2025-03-04', [2, 3]),
+    ('?start=2025-03-01&end=2025-03-03', [0, 1]),
+    ('?email=ben@example.com&end=2025-03-31', [1]),
+    ('?email=nobody@example.com', []),
+])
+def test_the_excel_export_opens_with_the_filtered_rows(client, query, rows):
+    response = client.get(f'/api/admin/export-excel{query}')
+
+    assert response.headers['Content-Disposition'].endswith('.xlsx')
+    assert excel_rows(response) == [
+        ['Employee Name', 'Email', 'Date', 'Clock In', 'Clock Out', 'Status', 'Break Duration (min)', 'Total Breaks']
+    ] + [excel_row(i) for i in rows]
+
+def test_the_excel_export_rejects_a_malformed_date(client):
+    response = client.get('/api/admin/export-excel?end=31-03-2025')
+    assert response.status_code == 400
+    assert response.get_json() == {'success': False, 'message': 'Invalid end: expected a YYYY-MM-DD date'}
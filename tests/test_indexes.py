@@ -0,0 +1,93 @@
+"""Hash and sorted-key indexes kept by IndexedData"""
+
+from storage import IndexedData, empty_data
+
+
+def employee(email, name='Anna'):
+    return {'email': email, 'name': name, 'role': 'employee', 'schedule': 'general', 'password': None}
+
+def attendance(email, day, status='FD'):
+    return {'email': email, 'date': day, 'clockIn': None, 'clockOut': None, 'status': status}
+
+def indexed(**collections):
+    return IndexedData({**empty_data(), **collections})
+
+
+def test_records_are_found_by_key():
+    data = indexed(employees=[employee('anna@example.com'), employee('ben@example.com', 'Ben')],
+                   attendance=[attendance('anna@example.com', '2025-03-03'),
+                               attendance('ben@example.com', '2025-03-03', 'HD')])
+
+    assert data.get('employees', 'ben@example.com')['name'] == 'Ben'
+    assert data.get('attendance', ('ben@example.com', '2025-03-03'))['status'] == 'HD'
+    assert data.get('attendance', ('ben@example.com', '2025-03-04')) is None
+    assert data.get('employees', 'nobody@example.com') is None
+
+def test_a_duplicate_key_finds_the_first_record_like_a_scan():
+    data = indexed(employees=[employee('anna@example.com', 'First'), employee('anna@example.com', 'Second')])
+    assert data.get('employees', 'anna@example.com')['name'] == 'First'
+
+def test_attendance_keys_stay_sorted_by_date_and_email():
+    data = indexed(attendance=[attendance('ben@example.com', '2025-03-04'),
+                               attendance('anna@example.com', '2025-03-04'),
+                               attendance('ben@example.com', '2025-03-03')])
+    data.apply({'op': 'attendance', 'data': attendance('anna@example.com', '2025-03-01')})
+    data.apply({'op': 'attendance', 'data': attendance('carl@example.com', '2025-03-05')})
+
+    assert data.attendance_keys == [
+        ('2025-03-01', 'anna@example.com'), ('2025-03-03', 'ben@example.com'), ('2025-03-04', 'anna@example.com'),
+        ('2025-03-04', 'ben@example.com'), ('2025-03-05', 'carl@example.com')]
+    assert data.attendance_keys_by_email['anna@example.com'] == [
+        ('2025-03-01', 'anna@example.com'), ('2025-03-04', 'anna@example.com')]
+
+def test_an_update_replaces_the_record_in_place():
+    data = indexed(attendance=[attendance('anna@example.com', '2025-03-03', 'A')])
+    original = data.get('attendance', ('anna@example.com', '2025-03-03'))
+    data.apply({'op': 'attendance', 'data': attendance('anna@example.com', '2025-03-03', 'FD')})
+
+    assert data.get('attendance', ('anna@example.com', '2025-03-03'))['status'] == 'FD'
+    assert len(data.data['attendance']) == 1
+    assert data.attendance_keys == [('2025-03-03', 'anna@example.com')]
+    # Readers holding the old record never see it change
+    assert original['status'] == 'A'
+
+def test_a_delete_reindexes_the_records_after_it():
+    data = indexed(employees=[employee('anna@example.com'), employee('ben@example.com', 'Ben'),
+                              employee('carl@example.com', 'Carl')])
+    data.apply({'op': 'employee_delete', 'data': {'email': 'anna@example.com'}})
+
+    assert data.get('employees', 'anna@example.com') is None
+    assert data.get('employees', 'carl@example.com')['name'] == 'Carl'
+    assert data.index['employees'] == {'ben@example.com': 0, 'carl@example.com': 1}
+
+def test_collections_load_lazily_and_replay_queued_changes():
+    loaded = []
+
+    def loader(name):
+        loaded.append(name)
+        return [employee('anna@example.com')] if name == 'employees' else []
+
+    data = IndexedData(loader=loader, journal=[{'op': 'employee', 'data': employee('ben@example.com', 'Ben')}])
+    data.apply({'op': 'batch', 'data': [
+        {'op': 'employee', 'data': employee('carl@example.com', 'Carl')},
+        {'op': 'leaderboard', 'data': {'email': 'carl@example.com', 'totalPoints': 3}}]})
+
+    assert loaded == []
+    assert [emp['email'] for emp in data.ensure('employees').data['employees']] == [
+        'anna@example.com', 'ben@example.com', 'carl@example.com']
+    assert loaded == ['employees']
+    assert data.rank('carl@example.com') == 1
+    assert loaded == ['employees', 'leaderboard']
+
+def test_repository_lookups_by_key(repo):
+    days = ['2025-03-03', '2025-03-04', '2025-03-05']
+    repo.put_employees([employee('anna@example.com'), employee('ben@example.com', 'Ben')])
+    repo.put_many(attendance=[{**attendance(email, day), 'breaks': []}
+                              for day in days for email in ('anna@example.com', 'ben@example.com')])
+
+    assert repo.get_employee('ben@example.com')['name'] == 'Ben'
+    assert repo.get_employee('nobody@example.com') is None
+    assert repo.get_attendance('ben@example.com', '2025-03-04', breaks=False) == attendance(
+        'ben@example.com', '2025-03-04')
+    assert repo.get_attendance('ben@example.com', '2025-03-06') is None
+    assert [record['date'] for record in repo.iter_attendance(email='anna@example.com')] == days
@@ -0,0 +1,155 @@
+"""Journaled writes for the Excel backend: append, replay and compaction"""
+
+import json
+import os
+from datetime import date, datetime
+
+import pytest
+
+import storage
+from conftest import excel_repository
+from storage import _file_signature
+
+TODAY = date.today().strftime('%Y-%m-%d')
+
+
+def employee(email):
+    return {'email': email, 'name': email.split('@')[0], 'role': 'employee',
+            'schedule': 'general', 'password': 'secret'}
+
+def clocked_in(email, day=TODAY):
+    start = datetime.strptime(day, '%Y-%m-%d').replace(hour=10, minute=30)
+    return {'email': email, 'date': day, 'clockIn': start, 'clockOut': None, 'status': 'A',
+            'breaks': [{'start': start.replace(hour=13), 'end': start.replace(hour=13, minute=30)}]}
+
+def journal_lines(repository):
+    with open(repository.journal_path, encoding='utf-8') as journal:
+        return journal.readlines()
+
+
+def test_writes_go_to_the_journal_not_the_workbook(excel_repo):
+    signature = _file_signature(excel_repo.path)
+    excel_repo.put_employee(employee('anna@example.com'))
+    excel_repo.put_attendance(clocked_in('anna@example.com'))
+
+    assert _file_signature(excel_repo.path) == signature
+    assert [json.loads(line)['op'] for line in journal_lines(excel_repo)] == ['employee', 'attendance']
+    assert excel_repo.get_employee('anna@example.com')['name'] == 'anna'
+
+def test_appends_leave_the_workbook_alone_until_compaction(excel_repo, tmp_path):
+    # The journal used to be compacted on every append: its mtime, not its
+    # size, was compared with the threshold
+    signature = _file_signature(excel_repo.path)
+    for n in range(50):
+        excel_repo.put_employee(employee(f'user{n}@example.com'))
+
+    assert _file_signature(excel_repo.path) == signature
+    assert len(journal_lines(excel_repo)) == 50
+    assert excel_repo.compact()
+    assert not os.path.exists(excel_repo.journal_path)
+    assert len(excel_repository(str(tmp_path)).list_employees()) == 50
+
+def test_a_fresh_repository_replays_the_journal(excel_repo, tmp_path):
+    record = clocked_in('anna@example.com')
+    excel_repo.put_employee(employee('anna@example.com'))
+    excel_repo.put_attendance(record)
+
+    reopened = excel_repository(str(tmp_path))
+    assert reopened.get_employee('anna@example.com') == employee('anna@example.com')
+    assert reopened.get_attendance('anna@example.com', TODAY) == record
+
+def test_a_batch_is_replayed_whole(excel_repo, tmp_path):
+    excel_repo.put_many(employees=[employee('anna@example.com'), employee('ben@example.com')],
+                        attendance=[clocked_in('ben@example.com')])
+
+    assert len(journal_lines(excel_repo)) == 1
+    reopened = excel_repository(str(tmp_path))
+    assert [emp['email'] for emp in reopened.list_employees()] == ['anna@example.com', 'ben@example.com']
+    assert reopened.get_attendance('ben@example.com', TODAY) is not None
+
+def test_replaying_an_entry_twice_changes_nothing(excel_repo, tmp_path):
+    excel_repo.put_employee(employee('anna@example.com'))
+    excel_repo.put_attendance(clocked_in('anna@example.com'))
+    lines = journal_lines(excel_repo)
+    with open(excel_repo.journal_path, 'a', encoding='utf-8') as journal:
+        journal.writelines(lines)
+
+    reopened = excel_repository(str(tmp_path))
+    assert len(reopened.list_employees()) == 1
+    assert len(reopened.list_attendance()) == 1
+
+def test_a_torn_final_line_is_skipped(excel_repo, tmp_path):
+    excel_repo.put_employee(employee('anna@example.com'))
+    with open(excel_repo.journal_path, 'a', encoding='utf-8') as journal:
+        journal.write('{"op": "employee", "data": {"email": "ben@')
+
+    reopened = excel_repository(str(tmp_path))
+    assert [emp['email'] for emp in reopened.list_employees()] == ['anna@example.com']
+
+def test_deletes_are_replayed(excel_repo, tmp_path):
+    excel_repo.put_employees([employee('anna@example.com'), employee('ben@example.com')])
+    assert excel_repo.delete_employee('anna@example.com')
+    assert not excel_repo.delete_employee('anna@example.com')
+
+    reopened = excel_repository(str(tmp_path))
+    assert [emp['email'] for emp in reopened.list_employees()] == ['ben@example.com']
+
+def test_compact_folds_the_journal_into_the_workbook(excel_repo, tmp_path):
+    record = clocked_in('anna@example.com')
+    excel_repo.put_employee(employee('anna@example.com'))
+    excel_repo.put_attendance(record)
+
+    assert excel_repo.compact()
+    assert not os.path.exists(excel_repo.journal_path)
+    reopened = excel_repository(str(tmp_path))
+    assert reopened.get_attendance('anna@example.com', TODAY) == record
+
+def test_a_put_without_breaks_keeps_the_stored_ones(excel_repo, tmp_path):
+    record = clocked_in('anna@example.com')
+    excel_repo.put_attendance(record)
+    summary = {key: value for key, value in record.items() if key != 'breaks'}
+    excel_repo.put_attendance({**summary, 'clockOut': record['clockIn'].replace(hour=19), 'status': 'FD'})
+
+    stored = excel_repository(str(tmp_path)).get_attendance('anna@example.com', TODAY)
+    assert stored['status'] == 'FD'
+    assert stored['breaks'] == record['breaks']
+
+def test_a_read_error_aborts_compaction(excel_repo, tmp_path, monkeypatch):
+    excel_repo.put_employee(employee('anna@example.com'))
+    excel_repo.compact()
+    excel_repo.put_employee(employee('ben@example.com'))
+    workbook = excel_repo.path
+    before = (open(workbook, 'rb').read(), journal_lines(excel_repo))
+
+    def unreadable(source, name):
+        raise OSError(24, 'Too many open files')
+
+    # A cold repository whose snapshot is gone has to parse the sheets
+    os.remove(excel_repo.snapshot_path)
+    monkeypatch.setattr(storage, 'iter_sheet', unreadable)
+    cold = excel_repository(str(tmp_path))
+    with pytest.raises(OSError):
+        cold.compact()
+    assert not cold.save({'employees': [], 'attendance': [], 'leaderboard': []})
+
+    assert (open(workbook, 'rb').read(), journal_lines(excel_repo)) == before
+    monkeypatch.undo()
+    assert [emp['email'] for emp in excel_repository(str(tmp_path)).list_employees()] == [
+        'anna@example.com', 'ben@example.com']
+
+def test_the_journal_tail_keeps_its_permissions(excel_repo, tmp_path, monkeypatch):
+    excel_repo.put_employee(employee('anna@example.com'))
+    os.chmod(excel_repo.journal_path, 0o640)
+    write_workbook = storage.write_workbook
+
+    def write_while_appending(data, path):
+        write_workbook(data, path)
+        # Another worker commits while the compacted copy is being written
+        excel_repository(str(tmp_path)).put_employee(employee('ben@example.com'))
+
+    monkeypatch.setattr(storage, 'write_workbook', write_while_appending)
+    excel_repo.compact()
+
+    assert [json.loads(line)['data']['email'] for line in journal_lines(excel_repo)] == ['ben@example.com']
+    assert os.stat(excel_repo.journal_path).st_mode & 0o777 == 0o640
+    assert len(excel_repository(str(tmp_path)).list_employees()) == 2
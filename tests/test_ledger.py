@@ -0,0 +1,74 @@
+"""Points ledger: live counters, rebuilds, and saves that leave it alone"""
+
+import app
+from ledger import (apply_entry, attendance_entry, new_leaderboard_entry, rebuild_leaderboard, task_entry,
+                    verify_leaderboard)
+from storage import empty_data
+
+
+def test_a_rebuild_matches_counters_kept_live():
+    entries = [attendance_entry('anna@example.com', '2025-03-03', 'FD'),
+               task_entry('anna@example.com', 'big', 2),
+               attendance_entry('ben@example.com', '2025-03-03', 'A'),
+               task_entry('ben@example.com', 'small', 1)]
+    live = {'anna@example.com': new_leaderboard_entry('anna@example.com', 'Anna'),
+            'ben@example.com': new_leaderboard_entry('ben@example.com', 'Ben')}
+    for entry in entries:
+        apply_entry(live[entry['email']], entry)
+
+    rebuilt = rebuild_leaderboard(iter(entries), {'anna@example.com': 'Anna'})
+
+    assert rebuilt['anna@example.com']['totalPoints'] == 2 + 2 * 3
+    assert rebuilt['ben@example.com']['name'] == 'ben@example.com'
+    assert verify_leaderboard(rebuilt, live.values()) == []
+
+    live['ben@example.com']['smallTasks'] = 5
+    assert [(m['email'], m['field'], m['expected']) for m in verify_leaderboard(rebuilt, live.values())] == [
+        ('ben@example.com', 'smallTasks', 1)]
+
+def test_task_counts_never_go_below_zero():
+    board = new_leaderboard_entry('anna@example.com', 'Anna')
+    for entry in (task_entry('anna@example.com', 'regular', 1), task_entry('anna@example.com', 'regular', -3),
+                  task_entry('anna@example.com', 'regular', 1)):
+        apply_entry(board, entry)
+    assert (board['regularTasks'], board['totalPoints']) == (1, 2)
+
+def test_rescoring_a_day_replaces_its_points():
+    board = new_leaderboard_entry('anna@example.com', 'Anna')
+    first = attendance_entry('anna@example.com', '2025-03-03', 'A')
+    second = attendance_entry('anna@example.com', '2025-03-03', 'FD')
+    apply_entry(board, first)
+    apply_entry(board, first, reverse=True)
+    apply_entry(board, second)
+
+    assert first['id'] == second['id']
+    assert board['attendancePoints'] == 2
+
+def test_rebuild_from_ledger_corrects_the_leaderboard(repo, monkeypatch):
+    monkeypatch.setattr(app, 'repository', repo)
+    award = task_entry('anna@example.com', 'small', 4)
+    board = apply_entry(new_leaderboard_entry('anna@example.com', 'Anna'), award)
+    repo.put_many(leaderboard=[board, new_leaderboard_entry('ben@example.com', 'Ben')], ledger=[award])
+    repo.put_leaderboard_entry({**board, 'smallTasks': 9, 'totalPoints': 9})
+
+    assert [m['field'] for m in app.rebuild_from_ledger()] == ['smallTasks', 'totalPoints']
+    assert repo.get_leaderboard_entry('anna@example.com')['smallTasks'] == 9
+
+    app.rebuild_from_ledger(apply=True)
+    assert repo.get_leaderboard_entry('anna@example.com')['smallTasks'] == 4
+    assert app.rebuild_from_ledger() == []
+
+def test_a_save_without_a_ledger_keeps_the_stored_one(repo):
+    award = task_entry('anna@example.com', 'big', 1)
+    schedule = {'name': 'general', 'definition': {'weekdays': {'start': '09:00', 'end': '17:00'}}}
+    repo.put_many(ledger=[award])
+    repo.put_schedule(schedule)
+
+    data = repo.load()
+    del data['ledger'], data['schedules']
+    assert repo.save(data)
+
+    assert list(repo.iter_ledger()) == [award]
+    assert repo.list_schedules() == [schedule]
+    assert repo.save({**empty_data(), 'ledger': []})
+    assert list(repo.iter_ledger()) == []
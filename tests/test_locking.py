@@ -0,0 +1,96 @@
+"""Atomic workbook saves and the locks around read-modify-write cycles"""
+
+import os
+import threading
+
+import pytest
+from openpyxl import Workbook
+
+from conftest import reopen
+from ledger import new_leaderboard_entry
+from storage import FileLock, _atomic_save
+
+
+class FailingWorkbook:
+    """Writes part of a file and then fails, like a crash mid-save"""
+
+    def save(self, file):
+        file.write(b'PK partial')
+        raise OSError('disk full')
+
+
+def test_a_failed_save_keeps_the_old_workbook(tmp_path):
+    path = tmp_path / 'workholic-data.xlsx'
+    _atomic_save(Workbook(), str(path))
+    before = path.read_bytes()
+
+    with pytest.raises(OSError):
+        _atomic_save(FailingWorkbook(), str(path))
+
+    assert path.read_bytes() == before
+    assert os.listdir(tmp_path) == ['workholic-data.xlsx']
+
+def test_a_save_keeps_the_workbook_permissions(tmp_path):
+    path = tmp_path / 'workholic-data.xlsx'
+    _atomic_save(Workbook(), str(path))
+    assert os.stat(path).st_mode & 0o777 == 0o644
+    os.chmod(path, 0o640)
+
+    _atomic_save(Workbook(), str(path))
+    assert os.stat(path).st_mode & 0o777 == 0o640
+
+def test_the_lock_is_reentrant_but_cannot_upgrade(tmp_path):
+    lock = FileLock(str(tmp_path / 'data.lock'))
+    with lock.exclusive():
+        with lock.shared(), lock.exclusive():
+            assert lock.is_held()
+    assert not lock.is_held()
+
+    with lock.shared():
+        with pytest.raises(RuntimeError):
+            with lock.exclusive():
+                pass
+
+def test_an_exclusive_lock_keeps_out_other_holders(tmp_path):
+    path = str(tmp_path / 'data.lock')
+    held = threading.Event()
+    release = threading.Event()
+    order = []
+
+    def writer():
+        with FileLock(path).exclusive():
+            held.set()
+            release.wait(5)
+            order.append('writer')
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    held.wait(5)
+    # A separate FileLock opens its own lock file, like another process
+    timer = threading.Timer(0.2, release.set)
+    timer.start()
+    with FileLock(path).shared():
+        order.append('reader')
+    thread.join()
+    timer.join()
+
+    assert order == ['writer', 'reader']
+
+def test_transactions_do_not_lose_concurrent_updates(repo):
+    repo.put_leaderboard_entry(new_leaderboard_entry('anna@example.com', 'Anna'))
+    workers = [repo, reopen(repo)]
+
+    def award(repository):
+        for _ in range(25):
+            with repository.transaction():
+                entry = repository.get_leaderboard_entry('anna@example.com')
+                entry['smallTasks'] += 1
+                repository.put_leaderboard_entry(entry)
+
+    threads = [threading.Thread(target=award, args=(repository,)) for repository in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert reopen(repo).get_leaderboard_entry('anna@example.com')['smallTasks'] == 50
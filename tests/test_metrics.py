@@ -0,0 +1,143 @@
+"""Prometheus metrics: the text exposition format and who may read /api/admin/metrics"""
+
+import re
+
+import pytest
+
+import app
+from metrics import Counter, Gauge, Histogram, Registry
+
+SAMPLE = re.compile(r'([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})? (\S+)')
+LABEL = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\\n]|\\[\\"n])*)"(?:,|$)')
+
+
+def parse(text):
+    """Parse the text exposition format strictly: {family: {'type', 'help', 'samples'}}
+
+    Every line must be a HELP, a TYPE or a sample of a family whose TYPE
+    came first; samples are (name, labels, value).
+    """
+    assert text.endswith('\n')
+    families = {}
+    for line in text[:-1].split('\n'):
+        if line.startswith('# HELP '):
+            name, description = line[7:].split(' ', 1)
+            families.setdefault(name, {'samples': []})['help'] = description
+            continue
+        if line.startswith('# TYPE '):
+            name, kind = line[7:].split(' ')
+            assert kind in ('counter', 'gauge', 'histogram')
+            assert 'type' not in families.setdefault(name, {'samples': []})
+            families[name]['type'] = kind
+            continue
+        match = SAMPLE.fullmatch(line)
+        assert match, line
+        name, labels, value = match.groups()
+        pairs = LABEL.findall(labels or '')
+        assert ','.join(f'{key}="{val}"' for key, val in pairs) == (labels or ''), line
+        family = name if name in families else re.sub(r'_(bucket|sum|count)$', '', name)
+        assert families[family].get('type'), line
+        if family != name:
+            assert families[family]['type'] == 'histogram', line
+        labels = {key: re.sub(r'\\(.)', lambda m: '\n' if m.group(1) == 'n' else m.group(1), val)
+                  for key, val in pairs}
+        families[family]['samples'].append((name, labels, float(value)))
+    return families
+
+def check_histogram(family):
+    """Buckets of each series are cumulative, end at +Inf and agree with _count"""
+    series = {}
+    for name, labels, value in family['samples']:
+        key = tuple(sorted((k, v) for k, v in labels.items() if k != 'le'))
+        series.setdefault(key, {'buckets': []})
+        if name.endswith('_bucket'):
+            series[key]['buckets'].append((float(labels['le']), value))
+        else:
+            series[key][name.rsplit('_', 1)[1]] = value
+    for parts in series.values():
+        bounds = [bound for bound, _ in parts['buckets']]
+        counts = [count for _, count in parts['buckets']]
+        assert bounds == sorted(bounds) and bounds[-1] == float('inf')
+        assert counts == sorted(counts)
+        assert parts['count'] == counts[-1]
+    return series
+
+
+def test_counters_and_gauges_render_one_sample_per_series():
+    registry = Registry()
+    counter = registry.register(Counter('test_requests_total', 'Requests', ('route', 'status')))
+    gauge = registry.register(Gauge('test_open_streams', 'Streams', function=lambda: 3))
+    counter.inc(route='/b', status=200)
+    counter.inc(2, route='/a', status=200)
+    counter.inc(route='/a', status=200)
+    counter.inc(route='say "hi"\\\n', status=500)
+
+    families = parse(registry.render())
+
+    assert families['test_requests_total']['type'] == 'counter'
+    assert families['test_requests_total']['samples'] == [
+        ('test_requests_total', {'route': '/a', 'status': '200'}, 3),
+        ('test_requests_total', {'route': '/b', 'status': '200'}, 1),
+        ('test_requests_total', {'route': 'say "hi"\\\n', 'status': '500'}, 1)]
+    assert families['test_open_streams'] == {'help': 'Streams', 'type': 'gauge',
+                                             'samples': [('test_open_streams', {}, 3)]}
+    gauge.function = lambda: 1
+    assert parse(registry.render())['test_open_streams']['samples'] == [('test_open_streams', {}, 1)]
+
+def test_a_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    histogram = registry.register(Histogram('test_seconds', 'Durations', ('op',), buckets=(1, 0.1)))
+    for value in (0.05, 0.1, 0.5, 5):
+        histogram.observe(value, op='save')
+    with histogram.time(op='load'):
+        pass
+
+    family = parse(registry.render())['test_seconds']
+
+    assert family['type'] == 'histogram'
+    series = check_histogram(family)
+    assert series[(('op', 'save'),)] == {'buckets': [(0.1, 2), (1, 3), (float('inf'), 4)], 'sum': 5.65, 'count': 4}
+    assert series[(('op', 'load'),)]['count'] == 1
+    assert ('test_seconds_bucket', {'op': 'save', 'le': '+Inf'}, 4) in family['samples']
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(app, 'METRICS_TOKEN', None)
+    return app.app.test_client()
+
+def sign_in(client, role):
+    with client.session_transaction() as session:
+        session['user'] = {'email': f'{role}@example.com', 'name': role, 'role': role, 'schedule': 'general'}
+
+def test_the_endpoint_renders_request_metrics(client):
+    sign_in(client, 'admin')
+    client.get('/api/test')
+
+    response = client.get('/api/admin/metrics')
+
+    assert response.status_code == 200
+    assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+    families = parse(response.get_data(as_text=True))
+    assert any(labels == {'route': '/api/test', 'method': 'GET', 'status': '200'} and value >= 1
+               for _, labels, value in families['workholic_http_requests_total']['samples'])
+    series = check_histogram(families['workholic_http_request_duration_seconds'])
+    assert series[(('method', 'GET'), ('route', '/api/test'))]['count'] >= 1
+    for name in ('workholic_http_requests_in_flight', 'workholic_event_subscribers',
+                 'workholic_storage_operation_duration_seconds', 'workholic_storage_bytes_written_total'):
+        assert name in families
+
+@pytest.mark.parametrize('role', [None, 'employee'])
+def test_only_admins_may_read_the_metrics(client, role):
+    if role:
+        sign_in(client, role)
+    response = client.get('/api/admin/metrics', headers={'Authorization': 'Bearer None'})
+    assert response.status_code == 401
+    assert response.get_json() == {'success': False, 'message': 'Unauthorized'}
+
+def test_a_scraper_can_use_the_bearer_token(client, monkeypatch):
+    monkeypatch.setattr(app, 'METRICS_TOKEN', 's3cret')
+
+    assert client.get('/api/admin/metrics', headers={'Authorization': 'Bearer s3cret'}).status_code == 200
+    for header in ('Bearer wrong', 'Bearer s3cret ', 's3cret', 'Basic s3cret', ''):
+        assert client.get('/api/admin/metrics', headers={'Authorization': header}).status_code == 401
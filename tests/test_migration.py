@@ -0,0 +1,89 @@
+"""One-time migration of stores written by older versions"""
+
+import os
+from datetime import datetime
+
+import openpyxl
+
+from conftest import excel_repository, write_baseline_workbook, write_legacy_database
+from storage import SQLiteRepository, _is_outdated
+
+EMPLOYEE = {'email': 'anna@example.com', 'name': 'Anna', 'role': 'employee', 'schedule': 'general',
+            'password': 'secret'}
+
+# As the first release stored them: ISO text, from browsers with a 'Z' suffix
+BASELINE = [
+    {'email': 'anna@example.com', 'date': '2025-01-30', 'clockIn': '2025-01-30T10:31:12.345Z',
+     'clockOut': '2025-01-30T19:02:00.000Z', 'status': 'FD',
+     'breaks': [{'start': '2025-01-30T13:00:00.000Z', 'end': '2025-01-30T13:45:30.999Z'}]},
+    {'email': 'anna@example.com', 'date': '2025-03-03', 'clockIn': '2025-03-03T10:29:59.5',
+     'clockOut': '', 'status': 'HD', 'breaks': [{'start': '2025-03-03T14:00:00', 'end': None}]},
+    {'email': 'anna@example.com', 'date': '2025-03-04', 'clockIn': '', 'clockOut': '', 'status': 'A',
+     'breaks': []},
+]
+
+# The same records once migrated: naive datetimes, wall-clock time kept, to the millisecond
+MIGRATED = [
+    {'email': 'anna@example.com', 'date': '2025-01-30', 'clockIn': datetime(2025, 1, 30, 10, 31, 12, 345000),
+     'clockOut': datetime(2025, 1, 30, 19, 2), 'status': 'FD',
+     'breaks': [{'start': datetime(2025, 1, 30, 13, 0), 'end': datetime(2025, 1, 30, 13, 45, 30, 999000)}]},
+    {'email': 'anna@example.com', 'date': '2025-03-03', 'clockIn': datetime(2025, 3, 3, 10, 29, 59, 500000),
+     'clockOut': None, 'status': 'HD', 'breaks': [{'start': datetime(2025, 3, 3, 14, 0), 'end': None}]},
+    {'email': 'anna@example.com', 'date': '2025-03-04', 'clockIn': None, 'clockOut': None, 'status': 'A',
+     'breaks': []},
+]
+
+
+def clock_cells(repository):
+    """Headers and clock values of the Attendance sheet in the workbook and every archived month"""
+    headers, cells = [], []
+    paths = [repository.path] + [repository.archive.path(month) for month in repository.archive.months()]
+    for path in paths:
+        workbook = openpyxl.load_workbook(path, read_only=True)
+        try:
+            rows = list(workbook['Attendance'].iter_rows(values_only=True))
+        finally:
+            workbook.close()
+        headers.append(rows[0])
+        cells += [value for row in rows[1:] for value in row[2:4] if value is not None]
+    return headers, cells
+
+
+def test_a_baseline_workbook_is_migrated_to_datetime_cells(tmp_path):
+    repository = excel_repository(str(tmp_path))
+    write_baseline_workbook(repository.path, employees=[EMPLOYEE], attendance=BASELINE)
+    assert _is_outdated(repository.path)
+    before = repository.load()
+    assert before['attendance'] == MIGRATED
+
+    assert repository.migrate()
+
+    headers, cells = clock_cells(repository)
+    assert not any('Breaks' in header for header in headers)
+    assert len(cells) == 3 and all(isinstance(value, datetime) for value in cells)
+    after = excel_repository(str(tmp_path)).load()
+    assert after == before
+    assert not repository.migrate()
+
+def test_archived_months_are_migrated_too(tmp_path, monkeypatch):
+    repository = excel_repository(str(tmp_path))
+    write_baseline_workbook(repository.path, employees=[EMPLOYEE], attendance=BASELINE[1:])
+    os.makedirs(repository.archive.directory)
+    write_baseline_workbook(repository.archive.path('2025-01'), attendance=BASELINE[:1])
+
+    assert repository.migrate()
+
+    assert not _is_outdated(repository.archive.path('2025-01'))
+    assert excel_repository(str(tmp_path)).load()['attendance'] == MIGRATED
+
+def test_a_version_0_database_is_migrated_to_epoch_integers(tmp_path):
+    path = str(tmp_path / 'workholic.db')
+    write_legacy_database(path, BASELINE)
+
+    repository = SQLiteRepository(path)
+
+    assert repository.list_attendance() == MIGRATED
+    conn = repository._connect()
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == SQLiteRepository.VERSION
+    assert {row[0] for row in conn.execute('SELECT typeof(clock_in) FROM attendance')} == {'integer', 'null'}
+    assert SQLiteRepository(path).list_attendance() == MIGRATED
@@ -0,0 +1,64 @@
+"""Leaderboard ranking: top-K and single ranks against a full sort"""
+
+import random
+
+import pytest
+
+from conftest import reopen
+from ledger import new_leaderboard_entry
+
+
+def entry(email, points):
+    return {**new_leaderboard_entry(email, email.split('@')[0]), 'totalPoints': points, 'attendancePoints': points}
+
+def expected_ranks(entries):
+    ordered = sorted(entries, key=lambda item: (-item['totalPoints'], item['email']))
+    return {item['email']: rank for rank, item in enumerate(ordered, 1)}
+
+def assert_ranks(repository, entries):
+    expected = expected_ranks(entries)
+    for email, rank in expected.items():
+        assert repository.leaderboard_rank(email) == rank
+    top = repository.leaderboard_top(5)
+    assert [(item['email'], item['rank']) for item in top] == sorted(expected.items(), key=lambda item: item[1])[:5]
+
+
+def test_ranks_match_a_full_sort_with_ties_broken_by_email(repo):
+    randomizer = random.Random(8)
+    entries = {f'user{i:02d}@example.com': entry(f'user{i:02d}@example.com', randomizer.randint(-3, 6))
+               for i in range(30)}
+    repo.put_leaderboard_entries(list(entries.values()))
+    assert_ranks(repo, entries.values())
+
+    for _ in range(40):
+        email = randomizer.choice(sorted(entries))
+        entries[email] = entry(email, randomizer.randint(-3, 6))
+        repo.put_leaderboard_entry(entries[email])
+        assert repo.leaderboard_rank(email) == expected_ranks(entries.values())[email]
+    assert_ranks(repo, entries.values())
+
+def test_an_unranked_email_has_no_rank(repo):
+    repo.put_leaderboard_entry(entry('anna@example.com', 3))
+    assert repo.leaderboard_rank('nobody@example.com') is None
+    assert repo.leaderboard_top(10)[0]['rank'] == 1
+
+def test_ranks_follow_writes_from_another_process(repo):
+    repo.put_leaderboard_entries([entry('anna@example.com', 5), entry('ben@example.com', 3)])
+    assert repo.leaderboard_rank('ben@example.com') == 2
+
+    reopen(repo).put_leaderboard_entry(entry('ben@example.com', 9))
+    assert repo.leaderboard_rank('ben@example.com') == 1
+    assert repo.leaderboard_rank('anna@example.com') == 2
+
+def test_a_transaction_ranks_its_own_uncommitted_changes(sqlite_repo):
+    sqlite_repo.put_leaderboard_entries([entry('anna@example.com', 5), entry('ben@example.com', 3)])
+    assert sqlite_repo.leaderboard_rank('ben@example.com') == 2
+
+    with pytest.raises(RuntimeError):
+        with sqlite_repo.transaction():
+            sqlite_repo.put_leaderboard_entry(entry('ben@example.com', 9))
+            assert sqlite_repo.leaderboard_rank('ben@example.com') == 1
+            raise RuntimeError('roll back')
+
+    # The rolled back change was never cached
+    assert sqlite_repo.leaderboard_rank('ben@example.com') == 2
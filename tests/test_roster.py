@@ -0,0 +1,191 @@
+"""Roster import: reading CSV/XLSX rosters, validation, and the script and endpoint that write them"""
+
+import io
+
+import pytest
+from openpyxl import Workbook
+
+import app
+import import_users
+from roster import plan_import, read_roster
+from schedules import DEFAULT_SCHEDULES, ScheduleRegistry
+
+SCHEDULES = list(DEFAULT_SCHEDULES)
+
+ANNA = {'email': 'anna@example.com', 'name': 'Anna', 'role': 'employee', 'schedule': 'general', 'password': 'old'}
+
+
+def csv_roster(*lines):
+    return io.BytesIO(('\r\n'.join(lines) + '\r\n').encode('utf-8-sig'))
+
+def rows(*values):
+    """Roster rows numbered as read_roster numbers them, the header being row 1"""
+    return [(number, dict(zip(('email', 'name', 'role', 'schedule', 'password'), row)))
+            for number, row in enumerate(values, 2)]
+
+@pytest.fixture
+def store(repo, monkeypatch):
+    """The app, the script and the roster wired to a test repository holding Anna and the default schedules"""
+    for name, definition in DEFAULT_SCHEDULES.items():
+        repo.put_schedule({'name': name, 'definition': definition})
+    repo.put_employee(ANNA)
+    registry = ScheduleRegistry(repo)
+    for module in (app, import_users):
+        monkeypatch.setattr(module, 'repository', repo)
+        monkeypatch.setattr(module, 'schedule_registry', registry)
+    return repo
+
+
+def test_a_csv_roster_is_read_by_column_name():
+    roster = csv_roster('E-mail ID,Name,EMAIL,Notes,Role', ',Skipped,ben@example.com, new hire ,admin',
+                        ',,,,', ' carl@example.com ,Carl,carl@example.com,,')
+    # Only known columns are kept, blank rows are skipped and row numbers count the header
+    assert read_roster(roster, 'Roster.CSV') == [
+        (2, {'name': 'Skipped', 'email': 'ben@example.com', 'role': 'admin'}),
+        (4, {'name': 'Carl', 'email': 'carl@example.com', 'role': ''})]
+
+def test_a_workbook_roster_prefers_the_employees_sheet():
+    workbook = Workbook()
+    workbook.active.append(['Something else'])
+    sheet = workbook.create_sheet('Employees')
+    sheet.append(['Email', 'Name', 'Password'])
+    sheet.append(['ben@example.com', 'Ben', 1234.0])
+    sheet.append([None, None, None])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    buffer.seek(0)
+
+    assert read_roster(buffer, 'roster.xlsx') == [(2, {'email': 'ben@example.com', 'name': 'Ben', 'password': '1234'})]
+
+@pytest.mark.parametrize('content, filename, message', [
+    (b'', 'roster.csv', 'Roster is empty'),
+    (b'Name,Role\r\nBen,admin\r\n', 'roster.csv', 'Roster needs an Email column'),
+    (b'email\r\n', 'roster.txt', 'Roster must be a .csv or .xlsx file'),
+])
+def test_unreadable_rosters_are_explained(content, filename, message):
+    with pytest.raises(ValueError, match=message):
+        read_roster(io.BytesIO(content), filename)
+
+
+def test_each_invalid_row_is_reported(store):
+    users, results = plan_import(rows(
+        ('ben@example.com', 'Ben', 'admin', 'vinay', 'pw'),
+        ('', 'No email', '', '', ''),
+        ('ben', '', '', '', ''),
+        ('ben@', '', '', '', ''),
+        ('b en@example.com', '', '', '', ''),
+        ('ben@@example.com', '', '', '', ''),
+        ('ben@example.com', 'Ben again', '', '', ''),
+        ('anna@example.com', 'Anna', '', '', ''),
+        ('carl@example.com', '', 'manager', '', ''),
+        ('dina@example.com', '', '', 'nights', ''),
+        ('erin@example.com', '', '', '', ''),
+    ), store, SCHEDULES)
+
+    assert [(result['row'], result['action'], result.get('message')) for result in results] == [
+        (2, 'create', None),
+        (3, 'error', 'Invalid email'),
+        (4, 'error', 'Invalid email'),
+        (5, 'error', 'Invalid email'),
+        (6, 'error', 'Invalid email'),
+        (7, 'error', 'Invalid email'),
+        (8, 'error', 'Duplicate of row 2'),
+        (9, 'error', 'User already exists'),
+        (10, 'error', 'Unknown role: manager'),
+        (11, 'error', 'Unknown schedule: nights'),
+        (12, 'create', None),
+    ]
+    assert users == [
+        {'email': 'ben@example.com', 'name': 'Ben', 'role': 'admin', 'schedule': 'vinay', 'password': 'pw'},
+        {'email': 'erin@example.com', 'name': '', 'role': 'employee', 'schedule': 'general', 'password': None}]
+
+def test_updates_replace_only_the_filled_in_columns(store):
+    users, results = plan_import(rows(('anna@example.com', '', 'admin', '', '')), store, SCHEDULES,
+                                 update_existing=True)
+
+    assert [result['action'] for result in results] == ['update']
+    assert users == [{**ANNA, 'role': 'admin'}]
+    # Planning alone writes nothing
+    assert store.get_employee('anna@example.com') == ANNA
+
+
+def write_csv(path, *lines):
+    path.write_bytes(csv_roster(*lines).getvalue())
+    return str(path)
+
+def test_the_script_imports_a_valid_roster_in_one_write(store, tmp_path, capsys):
+    path = write_csv(tmp_path / 'roster.csv', 'Email,Name,Schedule', 'ben@example.com,Ben,vinay',
+                     'anna@example.com,Anna K,')
+
+    assert import_users.import_users(path, update_existing=True)
+
+    assert 'Imported' in capsys.readouterr().out
+    assert store.get_employee('ben@example.com')['schedule'] == 'vinay'
+    assert store.get_employee('anna@example.com') == {**ANNA, 'name': 'Anna K'}
+
+def test_the_script_writes_nothing_if_any_row_fails(store, tmp_path, capsys):
+    path = write_csv(tmp_path / 'roster.csv', 'Email,Name', 'ben@example.com,Ben', 'anna@example.com,Anna K')
+
+    assert not import_users.import_users(path)
+
+    output = capsys.readouterr().out
+    assert 'Row 3 (anna@example.com): User already exists' in output
+    assert 'nothing was imported' in output
+    assert store.get_employee('ben@example.com') is None
+    assert store.get_employee('anna@example.com') == ANNA
+
+def test_a_dry_run_writes_nothing(store, tmp_path, capsys):
+    path = write_csv(tmp_path / 'roster.csv', 'Email,Name', 'ben@example.com,Ben', 'anna@example.com,Anna K')
+
+    assert import_users.import_users(path, update_existing=True, dry_run=True)
+
+    assert 'Would import' in capsys.readouterr().out
+    assert store.get_employee('ben@example.com') is None
+    assert store.get_employee('anna@example.com') == ANNA
+
+def test_the_script_reports_an_unreadable_file(store, tmp_path, capsys):
+    assert not import_users.import_users(str(tmp_path / 'missing.csv'))
+    assert 'Could not read' in capsys.readouterr().out
+
+
+@pytest.fixture
+def client(store):
+    client = app.app.test_client()
+    with client.session_transaction() as session:
+        session['user'] = {'email': 'admin@example.com', 'name': 'Admin', 'role': 'admin', 'schedule': 'general'}
+    return client
+
+def upload(client, content, **form):
+    return client.post('/api/admin/users/import', content_type='multipart/form-data',
+                       data={'file': (io.BytesIO(content), 'roster.csv'), **form}).get_json()
+
+def test_the_endpoint_imports_an_uploaded_roster(client, store):
+    roster = b'Email,Name,Role\r\nben@example.com,Ben,\r\nanna@example.com,,admin\r\n'
+
+    preview = upload(client, roster, update='true', dryRun='true')
+    assert (preview['success'], preview['created'], preview['updated'], preview['dryRun']) == (True, 1, 1, True)
+    assert store.get_employee('ben@example.com') is None
+
+    body = upload(client, roster, update='true')
+
+    assert (body['success'], body['created'], body['updated'], body['errors']) == (True, 1, 1, 0)
+    assert store.get_employee('ben@example.com')['name'] == 'Ben'
+    assert store.get_employee('anna@example.com') == {**ANNA, 'role': 'admin'}
+
+def test_the_endpoint_reports_failed_rows_and_writes_nothing(client, store):
+    body = upload(client, b'Email,Name\r\nben@example.com,Ben\r\nanna@example.com,Anna\r\n')
+
+    assert not body['success']
+    assert body['message'] == '1 row(s) failed validation; nothing was imported'
+    assert [(result['row'], result['action']) for result in body['results']] == [(2, 'create'), (3, 'error')]
+    assert store.get_employee('ben@example.com') is None
+
+def test_the_endpoint_needs_a_file_and_an_admin(client):
+    no_file = client.post('/api/admin/users/import', data={}, content_type='multipart/form-data').get_json()
+    assert no_file == {'success': False, 'message': 'No roster file uploaded'}
+    assert upload(client, b'Name\r\nBen\r\n') == {'success': False,
+                                                    'message': 'Could not read roster: Roster needs an Email column'}
+
+    with client.session_transaction() as session:
+        session['user'] = {'email': 'anna@example.com', 'name': 'Anna', 'role': 'employee', 'schedule': 'general'}
+    assert upload(client, b'Email\r\nben@example.com\r\n') == {'success': False, 'message': 'Unauthorized'}
@@ -0,0 +1,132 @@
+"""Schedule definitions: validation, compiled day rules and the admin endpoints"""
+
+from datetime import date
+
+import pytest
+
+import app
+from schedules import DEFAULT_SCHEDULES, CompiledSchedule, DayRule, ScheduleRegistry, validate_definition
+
+GENERAL = CompiledSchedule(DEFAULT_SCHEDULES['general'])
+SHREYAS = CompiledSchedule(DEFAULT_SCHEDULES['shreyas'])
+
+WEEKDAY = DayRule(True, 10 * 60 + 30, 19 * 60, 60)
+SATURDAY = DayRule(True, 10 * 60, 13 * 60, 15)
+OFF = WEEKDAY._replace(working=False)
+
+
+@pytest.mark.parametrize('day, rule', [
+    (date(2025, 3, 3), WEEKDAY),     # Monday
+    (date(2025, 3, 7), WEEKDAY),     # Friday
+    (date(2025, 3, 1), SATURDAY),    # 1st Saturday
+    (date(2025, 3, 8), OFF),         # 2nd Saturday
+    (date(2025, 3, 15), SATURDAY),   # 3rd Saturday
+    (date(2025, 3, 29), OFF),        # 5th Saturday
+    (date(2025, 3, 2), OFF),         # Sunday
+    (date(2024, 2, 29), WEEKDAY),    # leap day
+])
+def test_working_saturdays_are_the_nth_of_the_month(day, rule):
+    assert GENERAL.rule_for(day) == rule
+
+def test_rules_carry_across_the_year_boundary():
+    assert GENERAL.rule_for(date(2025, 12, 27)) == OFF        # 4th Saturday
+    assert GENERAL.rule_for(date(2025, 12, 31)) == WEEKDAY
+    assert GENERAL.rule_for(date(2026, 1, 1)) == WEEKDAY
+    assert GENERAL.rule_for(date(2026, 1, 3)) == SATURDAY     # 1st Saturday of the new year
+
+def test_a_day_override_and_a_weekend_off():
+    assert SHREYAS.rule_for(date(2025, 3, 6)) == DayRule(True, 16 * 60 + 30, 19 * 60, 15)
+    assert SHREYAS.rule_for(date(2025, 3, 7)) == DayRule(True, 12 * 60, 18 * 60, 45)
+    assert not SHREYAS.rule_for(date(2025, 3, 1)).working
+    assert not SHREYAS.rule_for(date(2025, 3, 2)).working
+
+def test_a_day_set_off_is_not_worked():
+    schedule = CompiledSchedule({**DEFAULT_SCHEDULES['general'], 'wednesday': 'off'})
+    assert schedule.rule_for(date(2025, 3, 5)) == OFF
+    assert schedule.rule_for(date(2025, 3, 6)) == WEEKDAY
+
+@pytest.mark.parametrize('definition, message', [
+    ({'weekdays': {'start': 'aa', 'end': '19:00'}}, "weekdays: 'aa' is not a time of day in HH:MM format"),
+    ({'weekdays': {'start': '10:30', 'end': '24:00'}}, "weekdays: '24:00' is not a time of day"),
+    ({'weekdays': {'start': '10:30', 'end': '19:00'}, 'friday': {'start': '09:60', 'end': '18:00'}},
+     "friday: '09:60' is not a time of day"),
+    ({'weekdays': {'start': '10:30', 'end': 1900}}, "weekdays: 1900 is not a time of day"),
+    ({'weekdays': {'start': '19:00', 'end': '10:30'}}, 'weekdays: end 10:30 is not after start 19:00'),
+    ({'weekdays': {'start': '10:30', 'end': '19:00', 'breakDuration': 'an hour'}},
+     "weekdays: breakDuration 'an hour' is not a number of minutes"),
+    ({'weekdays': {'start': '10:30'}}, 'weekdays: working hours need start, end and breakDuration'),
+    ({'saturday': 'off'}, '(weekdays is required)'),
+    ({'weekdays': {'start': '10:30', 'end': '19:00'}, 'saturday': 'closed'}, "saturday: working hours need"),
+    ({'weekdays': {'start': '10:30', 'end': '19:00'}, 'workingSaturdays': [6]}, 'week numbers from 1 to 5'),
+    ('general', 'A schedule must be an object'),
+])
+def test_invalid_definitions_are_explained(definition, message):
+    with pytest.raises(ValueError) as error:
+        validate_definition(definition)
+    assert message in str(error.value)
+
+def test_every_default_schedule_is_valid():
+    for definition in DEFAULT_SCHEDULES.values():
+        validate_definition(definition)
+
+
+@pytest.fixture
+def client(repo, monkeypatch):
+    """A test client signed in as an admin, on a repository holding the default schedules"""
+    for name, definition in DEFAULT_SCHEDULES.items():
+        repo.put_schedule({'name': name, 'definition': definition})
+    repo.put_employee({'email': 'anna@example.com', 'name': 'Anna', 'role': 'employee', 'schedule': 'shreyas',
+                       'password': 'x'})
+    monkeypatch.setattr(app, 'repository', repo)
+    monkeypatch.setattr(app, 'schedule_registry', ScheduleRegistry(repo))
+    client = app.app.test_client()
+    with client.session_transaction() as session:
+        session['user'] = {'email': 'admin@example.com', 'name': 'Admin', 'role': 'admin', 'schedule': 'general'}
+    return client
+
+def test_an_updated_schedule_applies_to_the_next_lookup(client, repo):
+    app.schedule_registry.rule_for('vinay', date(2025, 3, 3))
+    definition = {'weekdays': {'start': '09:00', 'end': '17:00', 'breakDuration': 30}, 'workingSaturdays': []}
+
+    response = client.post('/api/admin/schedules/update', json={'name': ' vinay ', 'definition': definition})
+
+    assert response.get_json() == {'success': True}
+    assert repo.get_schedule('vinay')['definition'] == definition
+    assert app.schedule_registry.rule_for('vinay', date(2025, 3, 3)) == DayRule(True, 9 * 60, 17 * 60, 30)
+    assert not app.schedule_registry.rule_for('vinay', date(2025, 3, 1)).working
+
+def test_an_invalid_schedule_is_rejected_with_the_reason(client, repo):
+    response = client.post('/api/admin/schedules/update', json={
+        'name': 'late', 'definition': {'weekdays': {'start': 'aa', 'end': '19:00'}}})
+
+    body = response.get_json()
+    assert not body['success']
+    assert body['message'] == "weekdays: 'aa' is not a time of day in HH:MM format (00:00 to 23:59)"
+    assert repo.get_schedule('late') is None
+
+def test_a_schedule_needs_a_name(client):
+    response = client.post('/api/admin/schedules/update', json={'name': ' ', 'definition': DEFAULT_SCHEDULES['general']})
+    assert response.get_json() == {'success': False, 'message': 'Schedule name is required'}
+
+def test_only_unassigned_schedules_can_be_deleted(client, repo):
+    def delete(name):
+        return client.post('/api/admin/schedules/delete', json={'name': name}).get_json()
+
+    assert delete('general') == {'success': False, 'message': 'The general schedule cannot be deleted'}
+    assert delete('shreyas') == {'success': False, 'message': 'Schedule is assigned to users'}
+    assert delete('nobody') == {'success': False, 'message': 'Schedule not found'}
+    assert delete('vinay') == {'success': True}
+    assert repo.get_schedule('vinay') is None
+    assert repo.get_schedule('shreyas') is not None
+    # A user still on a deleted schedule falls back to general
+    assert app.schedule_registry.rule_for('vinay', date(2025, 3, 3)) == WEEKDAY
+
+def test_schedule_changes_need_an_admin(client, repo):
+    with client.session_transaction() as session:
+        session['user'] = {'email': 'anna@example.com', 'name': 'Anna', 'role': 'employee', 'schedule': 'shreyas'}
+
+    update = client.post('/api/admin/schedules/update', json={'name': 'x', 'definition': DEFAULT_SCHEDULES['general']})
+    delete = client.post('/api/admin/schedules/delete', json={'name': 'vinay'})
+
+    assert update.get_json() == delete.get_json() == {'success': False, 'message': 'Unauthorized'}
+    assert repo.get_schedule('x') is None and repo.get_schedule('vinay') is not None
@@ -0,0 +1,84 @@
+"""Binary snapshots of the workbook's parsed collections"""
+
+import os
+
+import pytest
+
+import snapshot
+import storage
+from conftest import excel_repository
+from snapshot import decode_snapshot, encode_snapshot, read_snapshot, write_snapshot
+from storage import _file_signature, empty_data, write_workbook
+
+SIGNATURE = (1234, 1700000000000000000, 6275)
+COLLECTIONS = {'employees': [{'email': 'anna@example.com', 'name': 'Anna'}], 'attendance': []}
+EMPLOYEE = {'email': 'anna@example.com', 'name': 'Anna', 'role': 'employee', 'schedule': 'general',
+            'password': 'secret'}
+
+
+def test_a_snapshot_round_trips():
+    assert decode_snapshot(encode_snapshot(COLLECTIONS, SIGNATURE), SIGNATURE) == COLLECTIONS
+
+@pytest.mark.parametrize('damage', [
+    lambda blob: blob[:-1] + bytes([blob[-1] ^ 1]),
+    lambda blob: blob[:-3],
+    lambda blob: blob[:10],
+    lambda blob: b'NOTSNP' + blob[6:],
+])
+def test_a_damaged_snapshot_is_ignored(damage):
+    assert decode_snapshot(damage(encode_snapshot(COLLECTIONS, SIGNATURE)), SIGNATURE) is None
+
+def test_a_snapshot_of_another_workbook_or_version_is_ignored(monkeypatch):
+    blob = encode_snapshot(COLLECTIONS, SIGNATURE)
+    assert decode_snapshot(blob, (1234, 1700000000000000001, 6275)) is None
+    monkeypatch.setattr(snapshot, 'VERSION', snapshot.VERSION + 1)
+    assert decode_snapshot(blob, SIGNATURE) is None
+
+def test_write_snapshot_leaves_a_complete_file_with_the_given_mode(tmp_path):
+    path = str(tmp_path / 'workholic-data.xlsx.snapshot')
+    temp_path = write_snapshot(path, COLLECTIONS, SIGNATURE, 0o640)
+
+    assert os.path.dirname(temp_path) == str(tmp_path)
+    assert os.stat(temp_path).st_mode & 0o777 == 0o640
+    os.replace(temp_path, path)
+    assert read_snapshot(path, SIGNATURE) == COLLECTIONS
+    assert read_snapshot(str(tmp_path / 'missing'), SIGNATURE) is None
+
+
+def test_a_cold_load_reads_the_snapshot_instead_of_the_workbook(excel_repo, tmp_path, monkeypatch):
+    excel_repo.save({**empty_data(), 'employees': [EMPLOYEE]})
+    assert os.path.exists(excel_repo.snapshot_path)
+
+    def no_parsing(source, name):
+        raise AssertionError(f'parsed the {name} sheet')
+
+    monkeypatch.setattr(storage, 'iter_sheet', no_parsing)
+    assert excel_repository(str(tmp_path)).list_employees() == [EMPLOYEE]
+
+def test_a_stale_snapshot_falls_back_to_the_workbook(excel_repo, tmp_path):
+    excel_repo.save({**empty_data(), 'employees': [EMPLOYEE]})
+    # Edited by hand: the workbook no longer matches the snapshot next to it
+    write_workbook({**empty_data(), 'employees': [{**EMPLOYEE, 'name': 'Anna B.'}]}, excel_repo.path)
+
+    assert excel_repository(str(tmp_path)).get_employee('anna@example.com')['name'] == 'Anna B.'
+
+def test_a_corrupt_snapshot_falls_back_to_the_workbook(excel_repo, tmp_path):
+    excel_repo.save({**empty_data(), 'employees': [EMPLOYEE]})
+    with open(excel_repo.snapshot_path, 'r+b') as snapshot_file:
+        snapshot_file.seek(-1, os.SEEK_END)
+        last = snapshot_file.read(1)
+        snapshot_file.seek(-1, os.SEEK_END)
+        snapshot_file.write(bytes([last[0] ^ 1]))
+
+    assert excel_repository(str(tmp_path)).list_employees() == [EMPLOYEE]
+
+def test_the_snapshot_gets_the_workbook_permissions(excel_repo):
+    os.chmod(excel_repo.path, 0o640)
+    excel_repo.save({**empty_data(), 'employees': [EMPLOYEE]})
+    assert os.stat(excel_repo.snapshot_path).st_mode & 0o777 == 0o640
+
+    excel_repo.put_employee({**EMPLOYEE, 'name': 'Anna B.'})
+    excel_repo.compact()
+    assert os.stat(excel_repo.path).st_mode & 0o777 == 0o640
+    assert os.stat(excel_repo.snapshot_path).st_mode & 0o777 == 0o640
+    assert snapshot.is_current(excel_repo.snapshot_path, _file_signature(excel_repo.path))
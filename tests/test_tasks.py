@@ -0,0 +1,119 @@
+"""Task awards: the batch endpoint, its clamping and its single write"""
+
+import json
+
+import pytest
+
+import app
+from ledger import new_leaderboard_entry, opening_entry, rebuild_leaderboard, verify_leaderboard
+from schedules import ScheduleRegistry
+from storage import SQLiteRepository
+
+BATCH = '/api/admin/update-tasks/batch'
+
+
+def employee(email, name):
+    return {'email': email, 'name': name, 'role': 'employee', 'schedule': 'general', 'password': 'x'}
+
+@pytest.fixture
+def store(repo, monkeypatch):
+    repo.put_employees([employee('anna@example.com', 'Anna'), employee('ben@example.com', 'Ben')])
+    repo.put_leaderboard_entry({**new_leaderboard_entry('anna@example.com', 'Anna'), 'smallTasks': 1, 'totalPoints': 1})
+    monkeypatch.setattr(app, 'repository', repo)
+    monkeypatch.setattr(app, 'schedule_registry', ScheduleRegistry(repo))
+    return repo
+
+@pytest.fixture
+def client(store):
+    client = app.app.test_client()
+    with client.session_transaction() as session:
+        session['user'] = {'email': 'admin@example.com', 'name': 'Admin', 'role': 'admin', 'schedule': 'general'}
+    return client
+
+def award(client, *awards):
+    return client.post(BATCH, json={'awards': list(awards)}).get_json()
+
+def counters(repository, email):
+    entry = repository.get_leaderboard_entry(email)
+    return {field: entry[field] for field in ('smallTasks', 'regularTasks', 'bigTasks', 'totalPoints')}
+
+
+def test_each_invalid_award_is_reported_and_the_rest_applied(client, store):
+    body = award(client,
+                 {'email': 'ben@example.com', 'taskType': 'big', 'count': 2},
+                 {'email': 'ben@example.com', 'taskType': 'huge', 'count': 1},
+                 {'email': 'ben@example.com', 'taskType': 'small', 'count': 'two'},
+                 {'email': '', 'taskType': 'small', 'count': 1},
+                 {'email': 'nobody@example.com', 'taskType': 'small', 'count': 1},
+                 'not an award',
+                 {'email': 'anna@example.com', 'taskType': 'regular', 'count': '3'})
+
+    assert (body['success'], body['applied'], body['failed']) == (True, 2, 5)
+    assert [(result['email'], result['success'], result.get('message')) for result in body['results']] == [
+        ('ben@example.com', True, None),
+        ('ben@example.com', False, 'Invalid task type'),
+        ('ben@example.com', False, 'Invalid count'),
+        ('', False, 'Invalid email'),
+        ('nobody@example.com', False, 'Employee not found'),
+        (None, False, 'Invalid email'),
+        ('anna@example.com', True, None),
+    ]
+    assert counters(store, 'ben@example.com') == {'smallTasks': 0, 'regularTasks': 0, 'bigTasks': 2, 'totalPoints': 6}
+    assert store.get_leaderboard_entry('ben@example.com')['name'] == 'Ben'
+    assert counters(store, 'anna@example.com') == {'smallTasks': 1, 'regularTasks': 3, 'bigTasks': 0, 'totalPoints': 7}
+    assert store.get_leaderboard_entry('nobody@example.com') is None
+
+@pytest.mark.parametrize('counts, expected', [
+    ((-3, 2), 2),   # clamped to 0 first, then 2 more
+    ((2, -3), 0),   # 3, then clamped to 0
+    ((-1, -1, 4), 4),
+])
+def test_awards_are_clamped_at_zero_in_order(client, store, counts, expected):
+    body = award(client, *[{'email': 'anna@example.com', 'taskType': 'small', 'count': count} for count in counts])
+
+    assert body['applied'] == len(counts)
+    assert counters(store, 'anna@example.com') == {'smallTasks': expected, 'regularTasks': 0, 'bigTasks': 0,
+                                                   'totalPoints': expected}
+
+def test_the_ledger_replays_to_the_same_counters(client, store):
+    award(client, {'email': 'anna@example.com', 'taskType': 'small', 'count': -5},
+          {'email': 'ben@example.com', 'taskType': 'regular', 'count': 2},
+          {'email': 'anna@example.com', 'taskType': 'small', 'count': 1})
+
+    # Anna's counter predates the ledger; its opening balance is what the app records on startup
+    ledger = [opening_entry('anna@example.com', 'smallTasks', 1)] + list(store.iter_ledger())
+    rebuilt = rebuild_leaderboard(iter(ledger), {'anna@example.com': 'Anna', 'ben@example.com': 'Ben'})
+    assert verify_leaderboard(rebuilt, store.list_leaderboard()) == []
+    assert [(entry['email'], entry['count']) for entry in store.iter_ledger()] == [
+        ('anna@example.com', -5), ('ben@example.com', 2), ('anna@example.com', 1)]
+
+def test_the_batch_is_one_write(client, store):
+    awards = [{'email': email, 'taskType': 'small', 'count': 1}
+              for email in ('anna@example.com', 'ben@example.com', 'anna@example.com')]
+
+    if isinstance(store, SQLiteRepository):
+        statements = []
+        store._connect().set_trace_callback(statements.append)
+        award(client, *awards)
+        store._connect().set_trace_callback(None)
+        assert [s for s in statements if s.startswith(('BEGIN', 'COMMIT'))] == ['BEGIN IMMEDIATE', 'COMMIT']
+    else:
+        with open(store.journal_path, encoding='utf-8') as journal:
+            before = len(journal.readlines())
+        award(client, *awards)
+        with open(store.journal_path, encoding='utf-8') as journal:
+            lines = journal.readlines()[before:]
+        assert len(lines) == 1
+        entry = json.loads(lines[0])
+        assert entry['op'] == 'batch'
+        assert sorted(change['op'] for change in entry['data']) == ['leaderboard'] * 2 + ['ledger'] * 3
+
+def test_a_batch_needs_awards_and_an_admin(client):
+    assert client.post(BATCH, json={'awards': []}).get_json() == {
+        'success': False, 'message': 'awards must be a non-empty list'}
+    assert client.post(BATCH, data='nonsense').get_json()['success'] is False
+
+    with client.session_transaction() as session:
+        session['user'] = {'email': 'anna@example.com', 'name': 'Anna', 'role': 'employee', 'schedule': 'general'}
+    assert award(client, {'email': 'anna@example.com', 'taskType': 'big', 'count': 5}) == {
+        'success': False, 'message': 'Unauthorized'}
@@ -0,0 +1,47 @@
+"""Importing and exporting whole workbooks with excel_transfer.py"""
+
+import excel_transfer
+from conftest import write_baseline_workbook
+from ledger import new_leaderboard_entry, task_entry
+from storage import read_workbook
+
+EMPLOYEE = {'email': 'anna@example.com', 'name': 'Anna', 'role': 'employee', 'schedule': 'general',
+            'password': 'secret'}
+SCHEDULE = {'name': 'evening', 'definition': {'weekdays': {'start': '14:00', 'end': '22:00', 'breakDuration': 30}}}
+
+
+def test_an_older_workbook_has_no_schedules_or_ledger(tmp_path):
+    path = str(tmp_path / 'old.xlsx')
+    write_baseline_workbook(path, employees=[EMPLOYEE])
+
+    data = read_workbook(path)
+    assert 'schedules' not in data and 'ledger' not in data
+    assert data['employees'] == [EMPLOYEE]
+    assert read_workbook(path, ['employees'])['ledger'] == []
+
+def test_importing_an_older_workbook_keeps_the_ledger_and_schedules(repo, tmp_path, monkeypatch):
+    award = task_entry('anna@example.com', 'small', 2)
+    repo.put_many(employees=[EMPLOYEE], ledger=[award])
+    repo.put_schedule(SCHEDULE)
+    path = str(tmp_path / 'old.xlsx')
+    write_baseline_workbook(path, employees=[{**EMPLOYEE, 'name': 'Anna B.'}],
+                            leaderboard=[new_leaderboard_entry('anna@example.com', 'Anna B.')])
+
+    monkeypatch.setattr(excel_transfer, 'repository', repo)
+    assert excel_transfer.import_workbook(path)
+
+    assert repo.get_employee('anna@example.com')['name'] == 'Anna B.'
+    assert list(repo.iter_ledger()) == [award]
+    assert repo.list_schedules() == [SCHEDULE]
+
+def test_an_export_imports_back_unchanged(repo, tmp_path, monkeypatch):
+    award = task_entry('anna@example.com', 'small', 2)
+    repo.put_many(employees=[EMPLOYEE], ledger=[award])
+    repo.put_schedule(SCHEDULE)
+    monkeypatch.setattr(excel_transfer, 'repository', repo)
+    path = str(tmp_path / 'export.xlsx')
+    before = repo.load()
+
+    assert excel_transfer.export_workbook(path)
+    assert excel_transfer.import_workbook(path)
+    assert repo.load() == before
@@ -0,0 +1,66 @@
+"""
+Timestamps for WorkoHolic
+Clock and break times are naive local datetimes inside the app and its
+stores. They become ISO strings only in JSON (API responses, events, the
+journal), and are parsed back once, where such JSON or an older workbook
+is read.
+"""
+
+from datetime import datetime, timedelta
+
+EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+# Excel keeps times as fractional days, which only round-trip to the millisecond
+PRECISION_MICROSECONDS = 1000
+
+def parse_timestamp(value):
+    """Return a datetime, ISO string or empty value as a stored timestamp, or None
+
+    Strings from older clients may end in 'Z'; like the app always has,
+    the offset is dropped and the wall-clock time kept.
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    elif not isinstance(value, datetime):
+        raise TypeError(f'Not a timestamp: {value!r}')
+    return value.replace(tzinfo=None, microsecond=value.microsecond - value.microsecond % PRECISION_MICROSECONDS)
+
+def now():
+    """The current local time as a stored timestamp"""
+    return parse_timestamp(datetime.now())
+
+def format_timestamp(value):
+    """Stored timestamp -> ISO string for JSON, None stays None"""
+    return value.isoformat(timespec='milliseconds') if value is not None else None
+
+def to_epoch(value):
+    """Stored timestamp -> integer microseconds since EPOCH, None stays None"""
+    return (value - EPOCH) // _MICROSECOND if value is not None else None
+
+def from_epoch(value):
+    """Integer microseconds since EPOCH -> stored timestamp, None stays None"""
+    return EPOCH + timedelta(microseconds=value) if value is not None else None
+
+def parse_breaks(breaks):
+    return [{**brk, 'start': parse_timestamp(brk.get('start')), 'end': parse_timestamp(brk.get('end'))}
+            for brk in breaks or []]
+
+def parse_attendance(record):
+    """Return an attendance record with its clock and break times parsed"""
+    parsed = {
+        **record,
+        'clockIn': parse_timestamp(record.get('clockIn')),
+        'clockOut': parse_timestamp(record.get('clockOut'))
+    }
+    if 'breaks' in record:
+        parsed['breaks'] = parse_breaks(record['breaks'])
+    return parsed
+
+def json_default(value):
+    """default= for json.dumps: serialize stored timestamps as ISO strings"""
+    if isinstance(value, datetime):
+        return format_timestamp(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
@@ -6,6 +6,10 @@ import os
 # Add the project directory to the Python path
 sys.path.insert(0, '/home/yourusername/WorkoHolic')
 
+# PythonAnywhere runs a few sync workers, and every open live-update
+# stream would hold one of them; the dashboards poll instead
+os.environ.setdefault('WORKHOLIC_EVENT_STREAMS', '0')
+
 # Import the Flask app
 from app import app
 